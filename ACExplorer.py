@@ -11,6 +11,7 @@ import os
 import json
 import sys
 import subprocess
+import multiprocessing
 
 
 class App(QtWidgets.QApplication):
@@ -107,6 +108,7 @@ class App(QtWidgets.QApplication):
 		self.main_window.show()
 		self.load_game(self.game_select.currentText())
 		self.exec_()
+		self.pyUbiForge.thumbnails.shutdown(wait=True)
 
 	def translate_(self):
 		self.main_window.setWindowTitle(QtWidgets.QApplication.translate("MainWindow", "ACExplorer"))
@@ -188,6 +190,16 @@ class App(QtWidgets.QApplication):
 					'default': self.pyUbiForge.CONFIG.get('tempFilesMaxMemoryMB', 2048),
 					"min": 50
 				},
+				'Parsed Files Memory Buffer (MB)': {
+					'type': 'int_entry',
+					'default': self.pyUbiForge.CONFIG.get('parsedFilesMaxMemoryMB', 512),
+					"min": 0
+				},
+				'Thumbnail Cache (MB)': {
+					'type': 'int_entry',
+					'default': self.pyUbiForge.CONFIG.get('thumbnailCacheMB', 256),
+					"min": 1
+				},
 				'Style': {
 					'type': "select",
 					"options": [
@@ -202,6 +214,8 @@ class App(QtWidgets.QApplication):
 			self.pyUbiForge.CONFIG['dumpFolder'] = options['Default Output Folder']
 			self.pyUbiForge.CONFIG['logFile'] = options['Log File']
 			self.pyUbiForge.CONFIG['tempFilesMaxMemoryMB'] = options['Temporary Files Memory Buffer (MB)']
+			self.pyUbiForge.CONFIG['parsedFilesMaxMemoryMB'] = options['Parsed Files Memory Buffer (MB)']
+			self.pyUbiForge.CONFIG['thumbnailCacheMB'] = options['Thumbnail Cache (MB)']
 			if self._options['style'] != options['Style']:
 				self._options['style'] = options['Style']
 				self.load_style(self._options['style'])
@@ -235,19 +249,26 @@ class StatusBar(QtWidgets.QStatusBar, QtCore.QThread):
 
 class TreeView(QtWidgets.QTreeWidget):
 	"""This is the file tree used in the main application.
-	Wraps QTreeWidget and adds search functionality and a context menu
+	Wraps QTreeWidget and adds search functionality, a context menu and thumbnails of textures and models
 	"""
+	# emitted from the thumbnail threads with the key of the entry and the path of its thumbnail
+	thumbnail_ready = QtCore.Signal(object, str)
+
 	def __init__(self, py_ubi_forge: pyUbiForge, parent: QtWidgets.QWidget, icons: Dict[str, QtGui.QIcon]):
 		QtWidgets.QTreeWidget.__init__(self, parent)
 		self.icons = icons
 		self.pyUbiForge = py_ubi_forge
 		self._entries: Dict[Tuple[Union[None, str], Union[None, int], Union[None, int]], TreeViewEntry] = {}
 		self._game_identifier = None
+		self._thumbnails_requested = set()     # keys of the entries whose thumbnails have been requested
 		self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
 		self.customContextMenuRequested.connect(self.open_context_menu)
+		self.thumbnail_ready.connect(self.set_thumbnail)
+		self.itemExpanded.connect(self.request_thumbnails)
 
 	def load_game(self, game_identifier: str):
 		self._entries.clear()
+		self._thumbnails_requested.clear()
 		self.clear()
 		self._game_identifier = game_identifier
 		self.insert(game_identifier, icon=self.icons['directory'])
@@ -276,18 +297,43 @@ class TreeView(QtWidgets.QTreeWidget):
 		for forge_file_name, forge_file in self.pyUbiForge.forge_files.items():
 			for datafile_id in forge_file.new_datafiles:
 				for file_id, file_name in sorted(forge_file.datafiles[datafile_id].files.items(), key=lambda v: v[1].lower()):
+					file_type = self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id).file_type
 					self.insert(
 						file_name,
 						forge_file_name,
 						datafile_id,
 						file_id,
-						icon=self.icons.get(
-							self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id).file_type,
-							None
-						)
+						icon=self.icons.get(f'{file_type:08X}', None)
 					)
+				datafile_entry = self._entries[(forge_file_name, datafile_id, None)]
+				if datafile_entry.isExpanded():    # otherwise they are requested when it is expanded
+					self.request_thumbnails(datafile_entry)
 			forge_file.new_datafiles.clear()
 
+	def request_thumbnails(self, entry: 'TreeViewEntry'):
+		"""Make the thumbnails of the files in an expanded datafile entry in the background.
+		Each is shown on its entry when it is ready. Only the files the user can see are requested."""
+		if entry.depth != 3:
+			return
+		for index in range(entry.childCount()):
+			child: TreeViewEntry = entry.child(index)
+			key = (child.forge_file_name, child.datafile_id, child.file_id)
+			if key in self._thumbnails_requested:
+				continue
+			if self.pyUbiForge.thumbnails.supported(self.pyUbiForge.temp_files(child.file_id, child.forge_file_name, child.datafile_id).file_type):
+				self._thumbnails_requested.add(key)
+				future = self.pyUbiForge.thumbnails.request(child.file_id, child.forge_file_name, child.datafile_id)
+				future.add_done_callback(lambda f, key=key: self.thumbnail_ready.emit(key, '' if f.cancelled() else f.result() or ''))
+
+	def set_thumbnail(self, key: Tuple[str, int, int], path: str):
+		entry = self._entries.get(key, None)
+		if entry is None or not path:  # the game has been changed or there is no thumbnail
+			return
+		pixmap = QtGui.QPixmap(path)
+		if not pixmap.isNull():
+			entry.setIcon(0, QtGui.QIcon(pixmap))
+			entry.setToolTip(0, f'<img src="{path}">')
+
 	def mousePressEvent(self, event: QtGui.QMouseEvent):
 		entry: TreeViewEntry = self.itemAt(event.pos())
 		if entry is not None and entry.depth == 3 and entry.childCount() == 0:
@@ -572,5 +618,6 @@ class PluginOptionsScreen(QtWidgets.QDialog):
 
 
 if __name__ == "__main__":
+	multiprocessing.freeze_support()  # needed for the batch reader worker processes when frozen
 	app = App()
 	app.save()
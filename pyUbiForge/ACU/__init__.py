@@ -1,10 +1,14 @@
 import json
 import os
-from .getMaterialIDs_ import get_material_ids
+import numpy
+from .getMaterialIDs_ import get_material_ids, resolve_materials
 from . import forge
 
 game_identifier = 'ACU'
-file_types = json.load(open(f"{os.path.dirname(__file__)}/fileFormats.json"))
+file_types = {int(file_type, 16): name for file_type, name in json.load(open(f"{os.path.dirname(__file__)}/fileFormats.json")).items()}
+file_type_signatures = numpy.array(sorted(file_types), numpy.uint32)  # used to scan raw data for file types
+reader_registry = {int(file_type, 16): module_name for file_type, module_name in json.load(open(f"{os.path.dirname(__file__)}/readerRegistry.json")).items()}  # see misc.file_readers.save_reader_registry
 pre_header_length = 1
 file_id_datatype = 'Q'
 file_type_length = 4
+thumbnail_types = {0xA2B7E917: 'texture', 0x415D9568: 'model'}  # see misc.thumbnails
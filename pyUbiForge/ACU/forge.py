@@ -1,4 +1,5 @@
 import os
+import bisect
 from typing import Tuple, List
 import numpy
 from pyUbiForge.misc import decompress
@@ -67,14 +68,19 @@ class Forge(BaseForge):
 		forge_file.close()
 
 	@staticmethod
-	def _read_compressed_data_section(raw_data_chunk: FileObjectDataWrapper) -> Tuple[int, List[bytes]]:
-		"""This is a helper function used in decompression"""
+	def _read_compressed_block_table(raw_data_chunk: FileObjectDataWrapper) -> Tuple[int, int, List[Tuple[int, int, int]]]:
+		"""This is a helper function used in decompression
+
+		Reads the table of a compressed data section without decompressing anything.
+		Returns the compression type, the format version and (offset, compressed size, uncompressed size)
+		for each block where offset is the position of the compressed data in raw_data_chunk.
+		"""
 		raw_data_chunk.seek(2, 1)
 		compression_type = raw_data_chunk.read_uint_8()
 		raw_data_chunk.seek(3, 1)
 		format_version = raw_data_chunk.read_uint_8()
+		blocks = []
 		if format_version == 0:
-			uncompressed_data_list = []
 			comp_block_count = 1
 			while comp_block_count == 1:
 				try:
@@ -85,21 +91,94 @@ class Forge(BaseForge):
 				if comp_block_count != 1:
 					raise Exception('This file has a count not equal to 1. No example of this has been found yet. Please let the creator know where you found this.')
 				size_table = raw_data_chunk.read_numpy('<u4', comp_block_count * 8).reshape(-1, 2).astype(int)  # 'compressed_size', 'uncompressed_size'
-				for size in size_table:  # Could do this using numpy and then vectorise the decompression
+				for compressed_size, uncompressed_size in size_table:
 					raw_data_chunk.seek(4, 1)  # I think this is the hash of the data
-					uncompressed_data_list.append(decompress(compression_type, raw_data_chunk.read_bytes(size[0]), size[1]))
+					blocks.append((raw_data_chunk.file_object.tell(), int(compressed_size), int(uncompressed_size)))
+					raw_data_chunk.seek(int(compressed_size), 1)
 
 		elif format_version == 128:
 			comp_block_count = raw_data_chunk.read_uint_32()
 			size_table = raw_data_chunk.read_numpy('<u2', comp_block_count * 4).reshape(-1, 2).astype(int)  # 'uncompressed_size', 'compressed_size'
-			uncompressed_data_list = []
-			for size in size_table:  # Could do this using numpy and then vectorise the decompression
+			for uncompressed_size, compressed_size in size_table:
 				raw_data_chunk.seek(4, 1)  # I think this is the hash of the data
-				uncompressed_data_list.append(decompress(compression_type, raw_data_chunk.read_bytes(size[1]), size[0]))
+				blocks.append((raw_data_chunk.file_object.tell(), int(compressed_size), int(uncompressed_size)))
+				raw_data_chunk.seek(int(compressed_size), 1)
 		else:
 			raise Exception('Format version not known. Please let the creator know where you found this.')
 
-		return format_version, uncompressed_data_list
+		return compression_type, format_version, blocks
+
+	@staticmethod
+	def _decompress_block(raw_data_chunk: FileObjectDataWrapper, compression_type: int, block: Tuple[int, int, int]) -> bytes:
+		"""Decompress one block found by _read_compressed_block_table. The position of raw_data_chunk is not changed."""
+		offset, compressed_size, uncompressed_size = block
+		file_pointer = raw_data_chunk.file_object.tell()
+		raw_data_chunk.file_object.seek(offset)
+		compressed_data = raw_data_chunk.file_object.read(compressed_size)
+		raw_data_chunk.file_object.seek(file_pointer)
+		return decompress(compression_type, compressed_data, uncompressed_size)
+
+	@classmethod
+	def _read_compressed_data_section(cls, raw_data_chunk: FileObjectDataWrapper) -> Tuple[int, List[bytes]]:
+		"""This is a helper function used in decompression"""
+		compression_type, format_version, blocks = cls._read_compressed_block_table(raw_data_chunk)
+		return format_version, [cls._decompress_block(raw_data_chunk, compression_type, block) for block in blocks]
+
+	def _read_raw_datafile(self, datafile_id: int) -> FileObjectDataWrapper:
+		"""Read the compressed data of a datafile from the forge file."""
+		with open(os.path.join(self.pyUbiForge.CONFIG.game_folder(self.pyUbiForge.game_identifier), self.forge_file_name), 'rb', buffering=0) as forge_file:
+			forge_file.seek(self.datafiles[datafile_id].raw_data_offset)
+			return FileObjectDataWrapper.from_binary(self.pyUbiForge, forge_file.read(self.datafiles[datafile_id].raw_data_size))
+
+	def scan_datafile(self, datafile_id: int) -> List[Tuple[int, int, int, str]]:
+		"""Find the id, type, size and name of every file in a datafile without decompressing it.
+
+		This reads the same headers as decompress_datafile but only the compressed blocks containing the headers
+		are decompressed. The data of each file is skipped over so nothing is added to temp_files.
+		:return: list of (file_id, file_type, file_size, file_name)
+		"""
+		if datafile_id == 0 or datafile_id > 2 ** 40:
+			return []
+		datafile = self.datafiles[datafile_id]
+		raw_data_chunk = self._read_raw_datafile(datafile_id)
+		header = raw_data_chunk.read_bytes(8)
+		if header == b'\x33\xAA\xFB\x57\x99\xFA\x04\x10':  # if compressed
+			compression_type, format_version, blocks = self._read_compressed_block_table(raw_data_chunk)
+			if format_version == 0:
+				return [(datafile_id, datafile.file_type, sum(block[2] for block in blocks), datafile.file_name)]
+			sections = [(compression_type, blocks)]
+			if raw_data_chunk.read_bytes(8) == b'\x33\xAA\xFB\x57\x99\xFA\x04\x10':
+				compression_type, _, blocks = self._read_compressed_block_table(raw_data_chunk)
+				sections.append((compression_type, blocks))
+			else:
+				raise Exception('Compression Issue. Second compression block not found')
+			uncompressed_data = FileObjectDataWrapper(self.pyUbiForge, _LazyDecompressedData(raw_data_chunk, sections))
+		else:
+			raw_data_chunk.seek(0)
+			uncompressed_data = raw_data_chunk  # The file is not compressed
+
+		file_count = uncompressed_data.read_uint_16()
+		index_table = []
+		for _ in range(file_count):
+			index_table.append(uncompressed_data.read_struct('QIH'))  # file_id, data_size (file_size + header), extra16_count (for next line)
+			uncompressed_data.seek(index_table[-1][2] * 2, 1)
+		files = []
+		for index in range(file_count):
+			file_type, file_size, file_name_size = uncompressed_data.read_struct('3I')
+			file_id = index_table[index][0]
+			file_name = uncompressed_data.read_bytes(file_name_size).decode("utf-8")
+			check_byte = uncompressed_data.read_uint_8()
+			if check_byte == 1:
+				uncompressed_data.seek(3, 1)
+				unk_count = uncompressed_data.read_uint_32()
+				uncompressed_data.seek(12 * unk_count, 1)
+			elif check_byte != 0:
+				raise Exception('Either something has gone wrong or a new value has been found here')
+			uncompressed_data.seek(file_size, 1)
+			if file_name == '':
+				file_name = f'{file_id:016X}'
+			files.append((file_id, file_type, file_size, file_name))
+		return files
 
 	def decompress_datafile(self, datafile_id: int):
 		"""This is the decompression method
@@ -115,9 +194,7 @@ class Forge(BaseForge):
 			return
 		uncompressed_data_list = []
 
-		with open(os.path.join(self.pyUbiForge.CONFIG.game_folder(self.pyUbiForge.game_identifier), self.forge_file_name), 'rb', buffering=0) as forge_file:
-			forge_file.seek(self.datafiles[datafile_id].raw_data_offset)
-			raw_data_chunk = FileObjectDataWrapper.from_binary(self.pyUbiForge, forge_file.read(self.datafiles[datafile_id].raw_data_size))
+		raw_data_chunk = self._read_raw_datafile(datafile_id)
 		header = raw_data_chunk.read_bytes(8)
 		format_version = 128
 		if header == b'\x33\xAA\xFB\x57\x99\xFA\x04\x10':  # if compressed
@@ -194,3 +271,53 @@ class Forge(BaseForge):
 
 		if repoulate_tree:
 			self.new_datafiles.append(datafile_id)
+
+
+class _LazyDecompressedData:
+	"""A read only file object over the compressed blocks of a datafile that only decompresses the blocks that are read.
+
+	Used by Forge.scan_datafile to read the file headers without decompressing the file data in between.
+	"""
+	def __init__(self, raw_data_chunk: FileObjectDataWrapper, sections: List[Tuple[int, List[Tuple[int, int, int]]]]):
+		self._raw_data_chunk = raw_data_chunk
+		self._blocks = []  # (compression type, block)
+		self._block_starts = []  # position of the start of each block in the uncompressed data
+		self._length = 0
+		for compression_type, blocks in sections:
+			for block in blocks:
+				self._blocks.append((compression_type, block))
+				self._block_starts.append(self._length)
+				self._length += block[2]
+		self._decompressed = {}
+		self._file_pointer = 0
+
+	def tell(self) -> int:
+		return self._file_pointer
+
+	def seek(self, offset: int, whence: int = 0):
+		if whence == 0:
+			self._file_pointer = offset
+		elif whence == 1:
+			self._file_pointer += offset
+		elif whence == 2:
+			self._file_pointer = self._length + offset
+
+	def read(self, length: int = -1) -> bytes:
+		if length is None or length < 0:
+			length = self._length - self._file_pointer
+		end = min(self._file_pointer + length, self._length)
+		data = []
+		block_index = max(bisect.bisect_right(self._block_starts, self._file_pointer) - 1, 0)
+		while self._file_pointer < end:
+			if block_index not in self._decompressed:
+				compression_type, block = self._blocks[block_index]
+				self._decompressed[block_index] = Forge._decompress_block(self._raw_data_chunk, compression_type, block)
+			block_start = self._block_starts[block_index]
+			block_data = self._decompressed[block_index][self._file_pointer - block_start:end - block_start]
+			data.append(block_data)
+			self._file_pointer += len(block_data)
+			block_index += 1
+		return b''.join(data)
+
+	def close(self):
+		self._decompressed.clear()
@@ -1,4 +1,8 @@
+import copy
+from typing import Iterator, Tuple
 from pyUbiForge.misc import Material
+from pyUbiForge.misc.scanner import scan
+from pyUbiForge.misc.material_table import texture_maps
 
 
 def get_material_ids(py_ubi_forge, file_id: int) -> Material:
@@ -8,13 +12,50 @@ def get_material_ids(py_ubi_forge, file_id: int) -> Material:
 		return Material(f'{file_id:016X}', missing_no=True)
 
 	name = data.file_name
-	material_set_id = py_ubi_forge.read_file(data.file).material_set
+	material_file = py_ubi_forge.read_file.get(file_id, data.forge_file, data.datafile_id)
+	if material_file is None:
+		return Material(name, missing_no=True)
 
-	data = py_ubi_forge.temp_files(material_set_id)
-	if data is None:
-		py_ubi_forge.log.warn(__name__, f"Failed to find file {material_set_id:016X}")
+	material = py_ubi_forge.read_file.get(material_file.material_set)
+	if material is None:
 		return Material(name, missing_no=True)
 
-	material = py_ubi_forge.read_file(data.file)
+	material = copy.copy(material)  # the parsed texture set is shared with other materials
 	material.name = name
 	return material
+
+
+def _material_set_id(material) -> int:
+	return material.material_set
+
+
+def _texture_set_ids(texture_set) -> Material:
+	return Material(None, False, *(getattr(texture_set, texture_map) for texture_map in texture_maps))
+
+
+def resolve_materials(py_ubi_forge, processes: int = None) -> Iterator[Tuple[int, Material]]:
+	"""Yield (file_id, Material) for every material in the game that can be resolved.
+
+	The material files are found with the scanner and then they and their texture sets are read with
+	read_file.batch so the datafiles are decompressed once each. Used to build the material table in bulk.
+	"""
+	names = {record.file_id: record.file_name for record in scan(py_ubi_forge, [0x85C817C3])}
+	material_set_ids = {}
+	for item in py_ubi_forge.read_file.batch(names.keys(), summarise=_material_set_id, processes=processes):
+		if item.error is None and item.value:
+			material_set_ids[item.file_id] = item.value
+		else:
+			py_ubi_forge.log.warn(__name__, f'Failed reading material {item.file_id:016X}: {item.error}')
+
+	texture_sets = {}
+	for item in py_ubi_forge.read_file.batch(set(material_set_ids.values()), summarise=_texture_set_ids, processes=processes):
+		if item.error is None:
+			texture_sets[item.file_id] = item.value
+		else:
+			py_ubi_forge.log.warn(__name__, f'Failed reading texture set {item.file_id:016X}: {item.error}')
+
+	for file_id, material_set_id in material_set_ids.items():
+		if material_set_id in texture_sets:
+			material = copy.copy(texture_sets[material_set_id])
+			material.name = names[file_id]
+			yield file_id, material
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+from pyUbiForge.misc.plugins import BasePlugin
+from pyUbiForge.misc.schema import SchemaReader, read_schema
+from pyUbiForge.misc.scanner import scan
+from typing import Union, List
+
+
+class Plugin(BasePlugin):
+	"""Compares the compiled schema readers against reading the same fields one call at a time
+	(which is what a hand written reader does) for each file type that has a schema reader.
+	Up to "Files Per Type" files of each type are found with the scanner and only those are read."""
+	plugin_name = 'Benchmark Schema Readers'
+	plugin_level = 1
+	dev = True
+	_options = [
+		{
+			"Files Per Type": 100,
+			"Repeats": 10
+		}
+	]
+
+	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+		files_per_type = self._options[0].get("Files Per Type", 100)
+		repeats = self._options[0].get("Repeats", 10)
+
+		schema_readers = {}
+		for file_type in py_ubi_forge.game_functions.reader_registry:
+			try:
+				reader = py_ubi_forge.read_file.get_reader(file_type)
+			except Exception:
+				continue
+			if issubclass(reader, SchemaReader):
+				schema_readers[file_type] = reader
+
+		# find up to files_per_type files of each type without decompressing anything
+		file_ids = {file_type: [] for file_type in schema_readers}
+		for record in scan(py_ubi_forge, schema_readers.keys()):
+			if len(file_ids[record.file_type]) < files_per_type:
+				file_ids[record.file_type].append((record.file_id, record.forge_file_name, record.datafile_id))
+
+		results = {}
+		for file_type, files in file_ids.items():
+			reader = schema_readers[file_type]
+			result = results[f'{file_type:08X}'] = {'reader': reader.__module__, 'files': 0, 'compiled': 0.0, 'interpreted': 0.0}
+			for nested_file_id, forge_file_name, datafile_id in files:
+				data = py_ubi_forge.temp_files(nested_file_id, forge_file_name, datafile_id)
+				if data is None:
+					continue
+				file_wrapper = data.file
+				file_wrapper.read_bytes(py_ubi_forge.game_functions.pre_header_length)
+				file_wrapper.read_id()
+				file_wrapper.read_type()
+				start = file_wrapper.file_object.tell()
+				try:
+					for compiled in (True, False):
+						t = time.perf_counter()
+						for _ in range(repeats):
+							file_wrapper.seek(start)
+							read_schema(reader, py_ubi_forge, file_wrapper, compiled)
+						result['compiled' if compiled else 'interpreted'] += time.perf_counter() - t
+				except Exception as e:
+					py_ubi_forge.log.warn(__name__, f'Failed reading {data.file_name} {nested_file_id:016X} {e}')
+					continue
+				result['files'] += 1
+
+		for file_type, result in sorted(results.items(), key=lambda r: r[1]['interpreted'], reverse=True):
+			if result['files'] == 0:
+				continue
+			result['speedup'] = result['interpreted'] / result['compiled'] if result['compiled'] else None
+			py_ubi_forge.log.info(__name__, f"{file_type} {result['reader']}: {result['files']} files, compiled {result['compiled']:.4f}s, one call per field {result['interpreted']:.4f}s, speedup {result['speedup'] or 0:.2f}x")
+		with open(os.path.join(py_ubi_forge.CONFIG.get('dumpFolder', 'output'), f'{py_ubi_forge.game_identifier}_schema_benchmark.json'), 'w') as f:
+			json.dump(results, f, indent=4)
+		py_ubi_forge.log.info(__name__, 'Finished benchmarking schema readers')
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			return {
+				"Files Per Type": {
+					"type": "int_entry",
+					"default": self._options[0]["Files Per Type"],
+					"min": 1
+				},
+				"Repeats": {
+					"type": "int_entry",
+					"default": self._options[0]["Repeats"],
+					"min": 1
+				}
+			}
+		else:
+			self._options = options
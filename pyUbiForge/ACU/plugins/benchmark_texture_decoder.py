@@ -0,0 +1,44 @@
+from pyUbiForge.misc import bcn
+from pyUbiForge.misc.plugins import BasePlugin
+from typing import Union, List
+
+
+class Plugin(BasePlugin):
+	"""Decodes random data of every block compression format supported by misc.bcn and logs the speed
+	in megapixels per second."""
+	plugin_name = 'Benchmark Texture Decoder'
+	plugin_level = 1
+	dev = True
+	_options = [
+		{
+			"Size": 2048,
+			"Repeats": 3
+		}
+	]
+
+	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+		size = self._options[0].get("Size", 2048)
+		repeats = self._options[0].get("Repeats", 3)
+
+		for block_format in bcn.block_sizes:
+			py_ubi_forge.log.info(__name__, f'{block_format} {size}x{size}: {bcn.benchmark(block_format, size, size, repeats):.1f} MP/s')
+		py_ubi_forge.log.info(__name__, 'Finished benchmarking the texture decoder')
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			return {
+				"Size": {
+					"type": "int_entry",
+					"default": self._options[0]["Size"],
+					"min": 4
+				},
+				"Repeats": {
+					"type": "int_entry",
+					"default": self._options[0]["Repeats"],
+					"min": 1
+				}
+			}
+		else:
+			self._options = options
@@ -0,0 +1,11 @@
+from pyUbiForge.misc.plugins import BasePlugin
+
+
+class Plugin(BasePlugin):
+	plugin_name = 'Build Material Table'
+	plugin_level = 1
+
+	def run(self, py_ubi_forge, *_):
+		py_ubi_forge.material_table.build()
+		py_ubi_forge.material_table.save()
+		py_ubi_forge.temp_files.save()
@@ -0,0 +1,38 @@
+import os
+from pyUbiForge.misc import mesh
+from pyUbiForge.misc.plugins import BasePlugin
+from pyUbiForge.misc.scanner import scan
+from pyUbiForge.misc.texture_export import TextureExporter
+from typing import Union, List
+
+
+class Plugin(BasePlugin):
+	plugin_name = 'Export All Textures'
+	plugin_level = 1
+	_options = [
+		{
+			"Texture Type": 'DirectDraw Surface (.dds)'
+		}
+	]
+
+	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+
+		# TODO add select directory option
+		save_folder = os.path.join(py_ubi_forge.CONFIG.get('dumpFolder', 'output'), 'textures')
+		texture_ids = [record.file_id for record in scan(py_ubi_forge, [0xA2B7E917])]
+		py_ubi_forge.log.info(__name__, f'Found {len(texture_ids)} textures')
+		TextureExporter(py_ubi_forge, save_folder, mesh.texture_types[self._options[0]["Texture Type"]]).export(texture_ids)
+		py_ubi_forge.temp_files.save()
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			return {
+				"Texture Type": {
+					"type": "select",
+					"options": list(mesh.texture_types)
+				}
+			}
+		else:
+			self._options = options
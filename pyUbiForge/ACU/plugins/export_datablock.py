@@ -1,5 +1,6 @@
 from pyUbiForge.misc import mesh
 from pyUbiForge.misc.plugins import BasePlugin
+from pyUbiForge.misc.export_scheduler import ExportScheduler
 from pyUbiForge.ACU.type_readers.datablock import Reader as DataBlock
 from pyUbiForge.ACU.type_readers.entity import Reader as Entity
 from pyUbiForge.ACU.type_readers.visual import Reader as Visual
@@ -8,11 +9,20 @@ from pyUbiForge.ACU.type_readers.mesh_instance_data import Reader as MeshInstanc
 from typing import Union, List, Dict
 import numpy
 
+# the nested file types needed to find the meshes of an entity. Everything else is skipped when reading
+entity_projection = (
+	0x0984415E,  # entity
+	0x3F742D26,  # entity group
+	0xEC658D29,  # visual
+	0x01437462,  # LOD selector
+	0x536E963B  # mesh instance data
+)
+
 
 class Plugin(BasePlugin):
 	plugin_name = 'Export DataBlock'
 	plugin_level = 4
-	file_type = 'AC2BBF68'
+	file_type = 0xAC2BBF68
 	_options = [
 		{
 			"Export Method": 'Wavefront (.obj)',
@@ -37,58 +47,62 @@ class Plugin(BasePlugin):
 		data_block_name = data.file_name
 		data_block: DataBlock = py_ubi_forge.read_file(data.file)
 
-		if self._options[0]["Export Method"] == 'Wavefront (.obj)':
-			obj_handler = mesh.ObjMtl(py_ubi_forge, data_block_name, save_folder)
-			for data_block_entry_id in data_block.files:
+		export_method = self._options[0]["Export Method"]
+		if export_method in ('Wavefront (.obj)', 'Collada (.dae)', 'Binary glTF (.glb)'):
+			if export_method == 'Wavefront (.obj)':
+				obj_handler = mesh.ObjMtl(py_ubi_forge, data_block_name, save_folder)
+			elif export_method == 'Collada (.dae)':
+				obj_handler = mesh.Collada(py_ubi_forge, data_block_name, save_folder)
+			else:
+				obj_handler = mesh.Gltf(py_ubi_forge, data_block_name, save_folder)
+			obj_handler.mtl_handler.texture_type = mesh.texture_types[self._options[1]["Texture Type"]]
+			scheduler = ExportScheduler(py_ubi_forge)
+			instances: Dict[int, List[numpy.ndarray]] = {}  # model file id to the transformation matrices of each instance
+
+			def read_entity(data_block_entry_id: int):
 				data = py_ubi_forge.temp_files(data_block_entry_id)
 				if data is None:
 					py_ubi_forge.log.warn(__name__, f"Failed to find file {data_block_entry_id:016X}")
-					continue
-				if data.file_type in ('0984415E', '3F742D26'):  # entity and entity group
-					entity: Entity = py_ubi_forge.read_file(data.file)
+				elif data.file_type in (0x0984415E, 0x3F742D26):  # entity and entity group
+					return data, py_ubi_forge.read_file(data.file, projection=entity_projection)
+				else:
+					py_ubi_forge.log.info(__name__, f'File type "{data.file_type:08X}" is not currently supported. It has been skipped')
+
+			with scheduler.stage('entities'):
+				for data_block_entry_id, result in scheduler.map(read_entity, data_block.files):
+					if result is None:
+						continue
+					data, entity = result
+					entity: Entity
 					if entity is None:
 						py_ubi_forge.log.warn(__name__, f"Failed reading file {data.file_name} {data.file_id:016X}")
 						continue
 					for nested_file in entity.nested_files:
-						if nested_file.file_type == 'EC658D29':  # visual
+						if nested_file.file_type == 0xEC658D29:  # visual
 							nested_file: Visual
-							if '01437462' in nested_file.nested_files.keys():  # LOD selector
-								lod_selector: LODSelector = nested_file.nested_files['01437462']
+							if 0x01437462 in nested_file.nested_files.keys():  # LOD selector
+								lod_selector: LODSelector = nested_file.nested_files[0x01437462]
 								mesh_instance_data: MeshInstanceData = lod_selector.lod[self._options[0]['LOD']]
-							elif '536E963B' in nested_file.nested_files.keys():  # Mesh instance
-								mesh_instance_data: MeshInstanceData = nested_file.nested_files['536E963B']
+							elif 0x536E963B in nested_file.nested_files.keys():  # Mesh instance
+								mesh_instance_data: MeshInstanceData = nested_file.nested_files[0x536E963B]
 							else:
 								py_ubi_forge.log.warn(__name__, f"Could not find mesh instance data for {data.file_name} {data.file_id:016X}")
 								continue
 							if mesh_instance_data is None:
 								py_ubi_forge.log.warn(__name__, f"Failed to find file {data.file_name}")
 								continue
-							model_data = py_ubi_forge.temp_files(mesh_instance_data.mesh_id)
-							if model_data is None:
-								py_ubi_forge.log.warn(__name__, f"Failed to find file {mesh_instance_data.mesh_id:016X}")
-								continue
-							model: mesh.BaseModel = py_ubi_forge.read_file(model_data.file)
-							if model is None or model.vertices is None:
-								py_ubi_forge.log.warn(__name__, f"Failed reading model file {model_data.file_name} {model_data.file_id:016X}")
-								continue
 							transform = entity.transformation_matrix
 							if len(mesh_instance_data.transformation_matrix) == 0:
-								obj_handler.export(model, model_data.file_name, transform)
+								transforms = transform[numpy.newaxis]
 							else:
-								for trm in mesh_instance_data.transformation_matrix:
-									obj_handler.export(model, model_data.file_name, numpy.matmul(transform, trm))
-							py_ubi_forge.log.info(__name__, f'Exported {model_data.file_name}')
-				else:
-					py_ubi_forge.log.info(__name__, f'File type "{data.file_type}" is not currently supported. It has been skipped')
-			obj_handler.save_and_close()
-			py_ubi_forge.log.info(__name__, f'Finished exporting {data_block_name}.obj')
+								transforms = numpy.matmul(transform, numpy.array(mesh_instance_data.transformation_matrix))
+							instances.setdefault(mesh_instance_data.mesh_id, []).append(transforms)
+
+			# read the models, materials and textures in parallel and export all the instances of each model at once
+			scheduler.export_instances(obj_handler, instances)
+			scheduler.log_times()
+			py_ubi_forge.log.info(__name__, f'Finished exporting {data_block_name}')
 
-		# elif self._options[0]["Export Method"] == 'Collada (.dae)':
-		# 	obj_handler = mesh.Collada(py_ubi_forge, model_name, save_folder)
-		# 	obj_handler.export(file_id, forge_file_name, datafile_id)
-		# 	obj_handler.save_and_close()
-		# 	py_ubi_forge.log.info(__name__, f'Exported {file_id:016X}')
-		#
 		# elif self._options[0]["Export Method"] == 'Send to Blender (experimental)':
 		# 	model: mesh.BaseModel = py_ubi_forge.read_file(data.file)
 		# 	if model is not None:
@@ -104,7 +118,8 @@ class Plugin(BasePlugin):
 		if options is None or (isinstance(options, list) and len(options) == 0):
 			formats = [
 				'Wavefront (.obj)',
-				# 'Collada (.dae)',
+				'Collada (.dae)',
+				'Binary glTF (.glb)',
 				# 'Send to Blender (experimental)'
 			]
 			formats.remove(self._options[0]["Export Method"])
@@ -121,13 +136,11 @@ class Plugin(BasePlugin):
 			}
 		elif isinstance(options, list):
 			if len(options) == 1:
-				if options[0]["Export Method"] in ('Wavefront (.obj)', 'Collada (.dae)'):
+				if options[0]["Export Method"] in ('Wavefront (.obj)', 'Collada (.dae)', 'Binary glTF (.glb)'):
 					return {
 						"Texture Type": {
 							"type": "select",
-							"options": [
-								'DirectDraw Surface (.dds)'
-							]
+							"options": mesh.texture_type_options(options[0]["Export Method"])
 						}
 					}
 				else:
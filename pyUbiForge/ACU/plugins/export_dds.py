@@ -6,7 +6,7 @@ from typing import Union, List
 class Plugin(BasePlugin):
 	plugin_name = 'Export DDS'
 	plugin_level = 4
-	file_type = 'A2B7E917'
+	file_type = 0xA2B7E917
 
 	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
 		# TODO add select directory option
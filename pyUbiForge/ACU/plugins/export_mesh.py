@@ -1,15 +1,14 @@
-from pyUbiForge.misc import mesh
+from pyUbiForge.misc import mesh, blender_client
 from pyUbiForge.misc.plugins import BasePlugin
 from typing import Union, List, Dict
-from multiprocessing.connection import Client
-from PIL import Image, ImageDraw
+from PIL import Image
 import numpy
 
 
 class Plugin(BasePlugin):
 	plugin_name = 'Export Mesh'
 	plugin_level = 4
-	file_type = '415D9568'
+	file_type = 0x415D9568
 	_options = [
 		{
 			"Export Method": 'Wavefront (.obj)'
@@ -33,9 +32,10 @@ class Plugin(BasePlugin):
 		model_name = data.file_name
 
 		if self._options[0]["Export Method"] == 'Wavefront (.obj)':
-			model: mesh.BaseModel = py_ubi_forge.read_file(data.file)
+			model: mesh.BaseModel = py_ubi_forge.mesh_cache.get(data.file_id, data.forge_file, data.datafile_id)
 			if model is not None:
 				obj_handler = mesh.ObjMtl(py_ubi_forge, model_name, save_folder)
+				obj_handler.mtl_handler.texture_type = mesh.texture_types[self._options[1]["Texture Type"]]
 				obj_handler.export(model, model_name)
 				obj_handler.save_and_close()
 				py_ubi_forge.log.info(__name__, f'Exported {file_id:016X}')
@@ -44,43 +44,45 @@ class Plugin(BasePlugin):
 
 		elif self._options[0]["Export Method"] == 'Collada (.dae)':
 			obj_handler = mesh.Collada(py_ubi_forge, model_name, save_folder)
+			obj_handler.mtl_handler.texture_type = mesh.texture_types[self._options[1]["Texture Type"]]
+			obj_handler.export(file_id, forge_file_name, datafile_id)
+			obj_handler.save_and_close()
+			py_ubi_forge.log.info(__name__, f'Exported {file_id:016X}')
+
+		elif self._options[0]["Export Method"] == 'Binary glTF (.glb)':
+			obj_handler = mesh.Gltf(py_ubi_forge, model_name, save_folder)
+			obj_handler.mtl_handler.texture_type = mesh.texture_types[self._options[1]["Texture Type"]]
 			obj_handler.export(file_id, forge_file_name, datafile_id)
 			obj_handler.save_and_close()
 			py_ubi_forge.log.info(__name__, f'Exported {file_id:016X}')
 
 		elif self._options[0]["Export Method"] == 'Send to Blender (experimental)':
-			model: mesh.BaseModel = py_ubi_forge.read_file(data.file)
-			if model is not None:
-				c = Client(('localhost', 6163))
-				cols = [Image.new('RGB', (1024, 1024), (128, 0, 0)) for _ in range(len(model.bones))]
-				r = 5
+			model: mesh.BaseModel = py_ubi_forge.mesh_cache.get(data.file_id, data.forge_file, data.datafile_id)
+			if model is None:
+				py_ubi_forge.log.warn(__name__, f'Failed to export {file_id:016X}')
+				return
+			with blender_client.BlenderClient() as blender:
+				vertices = model.vertices
 				for mesh_index, m in enumerate(model.meshes):
-					c.send({
-						'type': 'MESH',
-						'verts': tuple(tuple(vert) for vert in model.vertices),
-						'faces': tuple(tuple(face) for face in model.faces[mesh_index][:m['face_count']])
-					})
-					for vtx in model.vert_table:
-						x, y = vtx['vt'].astype(numpy.float) / 2
-						for index, bone_index in enumerate(vtx['bn']):
-							if vtx['bw'][index] > 0:
-								draw = ImageDraw.Draw(cols[bone_index])
-								draw.ellipse((x - r, y - r, x + r, y + r), fill=(vtx['bw'][index], vtx['bw'][index], vtx['bw'][index]))
-				for index, im in enumerate(cols):
-					im.save(f'{save_folder}/{model_name}_{index}.png')
-					print(f'saved {save_folder}/{model_name}_{index}.png')
-
-				c.send({
-					'type': 'BONES',
-					'bone_id': [bone.bone_id for bone in model.bones],
-					'mat': [bone.transformation_matrix for bone in model.bones],
-				})
+					blender.send_mesh(f'{model_name}-{mesh_index}', vertices, model.faces[mesh_index][:m['face_count']])
+				if model.bones:
+					vert_table = getattr(model, 'vert_table', None)
+					if vert_table is not None:
+						for bone_index, image in blender_client.skin_weight_images(vert_table, len(model.bones)):
+							Image.fromarray(image, 'RGB').save(f'{save_folder}/{model_name}_{bone_index}.png')
+						py_ubi_forge.log.info(__name__, f'Saved {len(model.bones)} skin weight images')
+					blender.send_bones(
+						[bone.bone_id for bone in model.bones],
+						numpy.array([bone.transformation_matrix for bone in model.bones])
+					)
+			py_ubi_forge.log.info(__name__, f'Sent {file_id:016X} to Blender')
 
 	def options(self, options: Union[List[dict], None]) -> Union[Dict[str, dict], None]:
 		if options is None or (isinstance(options, list) and len(options) == 0):
 			formats = [
 				'Wavefront (.obj)',
 				'Collada (.dae)',
+				'Binary glTF (.glb)',
 				'Send to Blender (experimental)'
 			]
 			formats.remove(self._options[0]["Export Method"])
@@ -93,13 +95,11 @@ class Plugin(BasePlugin):
 			}
 		elif isinstance(options, list):
 			if len(options) == 1:
-				if options[0]["Export Method"] in ('Wavefront (.obj)', 'Collada (.dae)'):
+				if options[0]["Export Method"] in ('Wavefront (.obj)', 'Collada (.dae)', 'Binary glTF (.glb)'):
 					return {
 						"Texture Type": {
 							"type": "select",
-							"options": [
-								'DirectDraw Surface (.dds)'
-							]
+							"options": mesh.texture_type_options(options[0]["Export Method"])
 						}
 					}
 				else:
@@ -1,18 +1,28 @@
 from ..type_readers.minimap_textures import Reader as MMClass
-from ..type_readers.texture import Reader as TextureClass
+from pyUbiForge.misc import tile_stitcher
 from pyUbiForge.misc.plugins import BasePlugin
-from PIL import Image
-from io import BytesIO
-import struct
 from typing import Union, List
 
+output_formats = {
+	'PNG': 'png',
+	'Deep Zoom (.dzi)': 'deepzoom'
+}
+
 
 class Plugin(BasePlugin):
 	plugin_name = 'Export Minimap'
 	plugin_level = 4
-	file_type = 'EE568905'
+	file_type = 0xEE568905
+	_options = [
+		{
+			"Output Format": 'PNG'
+		}
+	]
 
 	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+		output_format = output_formats.get(self._options[0].get("Output Format", 'PNG'), 'png')
 		# TODO add select directory option
 		save_folder = py_ubi_forge.CONFIG.get('dumpFolder', 'output')
 
@@ -23,24 +33,21 @@ class Plugin(BasePlugin):
 		file_name = data.file_name
 
 		minimap_textures: MMClass = py_ubi_forge.read_file(data.file)
-		output_image = None
-		tile_width = tile_height = 128
-		for y in range(minimap_textures.width):
-			for x in range(minimap_textures.height):
-				texture_file_id = minimap_textures.image_ids[y * minimap_textures.height + x]
-				texture_data = py_ubi_forge.temp_files(texture_file_id)
-				if texture_data is None:
-					py_ubi_forge.log.warn(__name__, f"Failed to find file {texture_file_id:016X}")
-					continue
-				texture: TextureClass = py_ubi_forge.read_file(texture_data.file)
-				if output_image is None:
-					tile_width = struct.unpack('<I', texture.dwWidth)[0]
-					tile_height = struct.unpack('<I', texture.dwHeight)[0]
-					output_image = Image.new('RGBA', (tile_width * minimap_textures.width, tile_height * minimap_textures.height))
-				temp_image = Image.open(BytesIO(texture.dds_string))
-				output_image.paste(temp_image, (tile_width * x, tile_height * minimap_textures.height - tile_height * (y+1)))
-			py_ubi_forge.log.info(__name__, f'Written {y+1} row of {minimap_textures.width}')
-		if output_image is None:
+		# the tiles are stored in rows from the bottom of the map
+		tile_ids = [
+			minimap_textures.image_ids[y * minimap_textures.height: (y + 1) * minimap_textures.height]
+			for y in reversed(range(minimap_textures.width))
+		]
+		if tile_stitcher.stitch(py_ubi_forge, tile_ids, f'{save_folder}/{file_name}', output_format) is None:
 			py_ubi_forge.log.info(__name__, 'No Minimap to export')
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			return {
+				"Output Format": {
+					"type": "select",
+					"options": list(output_formats)
+				}
+			}
 		else:
-			output_image.save(f'{save_folder}/{file_name}.png')
+			self._options = options
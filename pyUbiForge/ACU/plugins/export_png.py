@@ -0,0 +1,35 @@
+from pyUbiForge.misc import texture
+from pyUbiForge.misc.plugins import BasePlugin
+from typing import Union, List
+
+
+class Plugin(BasePlugin):
+	"""Exports the texture as a PNG. If Max Size is not 0 the largest mip map no bigger than it is exported instead."""
+	plugin_name = 'Export PNG'
+	plugin_level = 4
+	file_type = 0xA2B7E917
+	_options = [
+		{
+			"Max Size": 0
+		}
+	]
+
+	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+		max_size = self._options[0].get("Max Size", 0) or None
+		# TODO add select directory option
+		save_folder = py_ubi_forge.CONFIG.get('dumpFolder', 'output')
+		texture.export_png(py_ubi_forge, file_id, save_folder, forge_file_name, datafile_id, max_size)
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			return {
+				"Max Size": {
+					"type": "int_entry",
+					"default": self._options[0]["Max Size"],
+					"min": 0
+				}
+			}
+		else:
+			self._options = options
@@ -50,7 +50,7 @@ class Plugin(BasePlugin):
 					temp_file = py_ubi_forge.temp_files(file_id, forge_file_name, datafile_id)
 					file_wrapper = temp_file.file
 					file_wrapper.seek(9)
-					file_type = file_wrapper.read_type()
+					file_type = f'{file_wrapper.read_type():08X}'
 					if file_id_hex not in dict_doc:
 						dict_doc[file_id_hex] = [temp_file.file_name, file_type, [], []]
 					elif dict_doc[file_id_hex][0] is None:
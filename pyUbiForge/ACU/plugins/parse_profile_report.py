@@ -0,0 +1,51 @@
+import os
+from pyUbiForge.misc.plugins import BasePlugin
+from pyUbiForge.misc.profiler import report_columns
+from typing import Union, List
+
+
+class Plugin(BasePlugin):
+	"""Saves the per file type statistics recorded while "profileReaders" is enabled in the config
+	as {game}_reader_profile.json and {game}_reader_profile.txt in the dump folder."""
+	plugin_name = 'Save Reader Profile'
+	plugin_level = 1
+	dev = True
+	_options = [
+		{
+			"Sort By": 'total_time',
+			"Clear After Saving": False
+		}
+	]
+
+	def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: Union[List[dict], None] = None):
+		if options is not None:
+			self._options = options     # should do some validation here
+		profiler = py_ubi_forge.read_file.profiler
+		if not profiler.enabled:
+			py_ubi_forge.log.warn(__name__, 'Reader profiling is disabled. Set "profileReaders" to true in the config to enable it')
+		save_path = os.path.join(py_ubi_forge.CONFIG.get('dumpFolder', 'output'), f'{py_ubi_forge.game_identifier}_reader_profile')
+		profiler.save_json(f'{save_path}.json')
+		report = profiler.report(self._options[0]["Sort By"])
+		with open(f'{save_path}.txt', 'w') as f:
+			f.write(report)
+		if self._options[0]["Clear After Saving"]:
+			profiler.clear()
+		py_ubi_forge.log.info(__name__, f'Saved reader profile to {save_path}.json and {save_path}.txt')
+
+	def options(self, options: Union[List[dict], None]):
+		if options is None or (isinstance(options, list) and len(options) == 0):
+			columns = list(report_columns.keys())
+			columns.remove(self._options[0]["Sort By"])
+			columns.insert(0, self._options[0]["Sort By"])
+			return {
+				"Sort By": {
+					"type": "select",
+					"options": columns
+				},
+				"Clear After Saving": {
+					"type": "check_box",
+					"default": self._options[0]["Clear After Saving"]
+				}
+			}
+		else:
+			self._options = options
@@ -17,7 +17,7 @@ class Plugin(BasePlugin):
 		if options is not None:
 			self._options = options     # should do some validation here
 
-		file_types = [file_type.upper() for file_type in self._options[0].get("File Types", "").split(';')]
+		file_types = [int(file_type, 16) for file_type in self._options[0].get("File Types", "").split(';') if file_type != '']
 
 		for file_id in py_ubi_forge.forge_files[forge_file_name].datafiles[datafile_id].files.keys():
 			data = py_ubi_forge.temp_files(file_id, forge_file_name, datafile_id)
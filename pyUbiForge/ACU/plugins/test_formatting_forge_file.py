@@ -35,7 +35,7 @@ class Plugin(BasePlugin):
 		if options is not None:
 			self._options = options     # should do some validation here
 
-		file_types = [file_type.upper() for file_type in self._options[0].get("File Types", "").split(';')]
+		file_types = [int(file_type, 16) for file_type in self._options[0].get("File Types", "").split(';') if file_type != '']
 
 		max_count = self._options[0].get("Format Count", 1000)
 		files_done = 0
@@ -3,7 +3,7 @@ from pyUbiForge.misc.file_readers import BaseReader
 
 
 class Reader(BaseReader):
-	file_type = '057DAA86'
+	file_type = 0x057DAA86
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		file_object_data_wrapper.read_bytes(1)
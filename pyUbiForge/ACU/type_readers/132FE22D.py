@@ -3,7 +3,7 @@ from pyUbiForge.misc.file_readers import BaseReader
 
 
 class Reader(BaseReader):
-	file_type = '132FE22D'
+	file_type = 0x132FE22D
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		# needs more work
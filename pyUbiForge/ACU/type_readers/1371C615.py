@@ -3,7 +3,7 @@ from pyUbiForge.misc.file_readers import BaseReader
 
 
 class Reader(BaseReader):
-	file_type = '1371C615'
+	file_type = 0x1371C615
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		file_object_data_wrapper.read_bytes(49)
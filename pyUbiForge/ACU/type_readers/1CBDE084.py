@@ -4,7 +4,7 @@ import numpy
 
 
 class Reader(BaseReader):
-	file_type = '1CBDE084'
+	file_type = 0x1CBDE084
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		file_object_data_wrapper.read_bytes(2)
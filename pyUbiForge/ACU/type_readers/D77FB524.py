@@ -4,7 +4,7 @@ from pyUbiForge.ACU.type_readers.entity import Reader as Entity
 
 
 class Reader(BaseReader):
-	file_type = 'D77FB524'
+	file_type = 0xD77FB524
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		file_object_data_wrapper.read_bytes(2)
@@ -4,7 +4,7 @@ import numpy
 
 
 class Reader(BaseReader):
-	file_type = '4AEC3476'
+	file_type = 0x4AEC3476
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		self.bounding_box = file_object_data_wrapper.read_numpy(numpy.float32, 24).reshape((3, 2))
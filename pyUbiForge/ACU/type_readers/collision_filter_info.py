@@ -1,10 +1,9 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Skip, Text
 
 
-class Reader(BaseReader):
-	file_type = '43EF99C2'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		file_object_data_wrapper.read_bytes(15)
-		file_object_data_wrapper.out_file_write('\n')
+class Reader(SchemaReader):
+	file_type = 0x43EF99C2
+	schema = (
+		Skip(15),
+		Text('\n'),
+	)
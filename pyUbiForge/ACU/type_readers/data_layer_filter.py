@@ -1,13 +1,9 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Array, Nested, Text
 
 
-class Reader(BaseReader):
-	file_type = 'DB1D406E'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		count1 = file_object_data_wrapper.read_uint_32()  # count
-		# more data follows this if count != 0
-		for _ in range(count1):
-			py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
-		file_object_data_wrapper.out_file_write('\n')
+class Reader(SchemaReader):
+	file_type = 0xDB1D406E
+	schema = (
+		Array('I', Nested()),  # more data follows this if count != 0
+		Text('\n'),
+	)
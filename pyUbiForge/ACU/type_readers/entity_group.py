@@ -4,7 +4,7 @@ import numpy
 
 
 class Reader(BaseReader):
-	file_type = '3F742D26'
+	file_type = 0x3F742D26
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		check_byte = file_object_data_wrapper.read_uint_8()  # checkbyte 03 to continue (other stuff to not? have seen 00 with data after)
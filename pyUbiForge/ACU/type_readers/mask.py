@@ -1,11 +1,9 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Array, Nested, Skip
 
 
-class Reader(BaseReader):
-	file_type = 'DF5D6C0E'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		file_object_data_wrapper.read_bytes(44)
-		for _ in range(3):
-			py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
+class Reader(SchemaReader):
+	file_type = 0xDF5D6C0E
+	schema = (
+		Skip(44),
+		Array(3, Nested())
+	)
@@ -1,9 +1,8 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Skip
 
 
-class Reader(BaseReader):
-	file_type = '92B95F74'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		file_object_data_wrapper.read_bytes(109)
+class Reader(SchemaReader):
+	file_type = 0x92B95F74
+	schema = (
+		Skip(109),
+	)
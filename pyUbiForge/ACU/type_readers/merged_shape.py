@@ -4,7 +4,7 @@ import numpy
 
 
 class Reader(BaseReader):
-	file_type = '2D675BA2'
+	file_type = 0x2D675BA2
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		count1 = file_object_data_wrapper.read_uint_32()  # possibly a count
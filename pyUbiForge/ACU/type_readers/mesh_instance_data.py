@@ -1,10 +1,10 @@
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.file_readers import BaseReader, SkippedFile
 import numpy
 
 
 class Reader(BaseReader):
-	file_type = '536E963B'
+	file_type = 0x536E963B
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		file_object_data_wrapper.read_bytes(1)
@@ -31,6 +31,6 @@ class Reader(BaseReader):
 		self.bounding_box = []
 		for _ in range(count3):
 			sub_file_container = py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
-			if sub_file_container.file_type == '4AEC3476':
+			if sub_file_container.file_type == 0x4AEC3476 and not isinstance(sub_file_container, SkippedFile):
 				self.bounding_box.append(sub_file_container.bounding_box)
 		file_object_data_wrapper.out_file_write('\n')
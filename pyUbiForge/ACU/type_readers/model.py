@@ -2,10 +2,175 @@ from pyUbiForge.misc.mesh import BaseModel
 from pyUbiForge.misc.file_readers import BaseReader
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
 import numpy
+from typing import Union, List
+
+
+# the layout of the vertex table for each vertex table width
+vert_table_dtypes = {
+	16: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('', numpy.int16, 2),  # not sure what this is
+		('vt', numpy.int16, 2)
+	]),
+	20: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16),  # not sure what this is
+		('vt', numpy.int16, 2)
+	]),
+	24: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2)
+	]),
+	28: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2),
+		('', numpy.int16, 2),  # not sure what this is
+	]),
+	32: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2),
+		('bn', numpy.uint8, 4),
+		('bw', numpy.uint8, 4)
+	]),
+	36: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2),
+		('', numpy.int16, 2),  # not sure what this is
+		('bn', numpy.uint8, 4),
+		('bw', numpy.uint8, 4)
+	]),
+	40: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2),
+		('bn', numpy.uint8, 8),
+		('bw', numpy.uint8, 8)
+	]),
+	48: numpy.dtype([
+		('v', numpy.int16, 3),
+		('sc', numpy.int16),
+		('n', numpy.int16, 3),
+		('', numpy.int16, 3),  # not sure what this is
+		('vt', numpy.int16, 2),
+		('', numpy.int16, 2),  # not sure what this is
+		('bn', numpy.uint8, 8),
+		('bw', numpy.uint8, 8),
+		('', numpy.int16, 2),  # not sure what this is
+	])
+}
+
+# texture coordinates are stored as fixed point with the v axis flipped
+texture_vertex_scale = numpy.array([1 / 2048, -1 / 2048], numpy.float32)
+
+
+def _block_faces(faces: numpy.ndarray, mesh_face_blocks: numpy.ndarray, face_counts: numpy.ndarray) -> List[numpy.ndarray]:
+	"""Split the face table into the faces of each mesh when the faces are stored in blocks of 64.
+
+	Each block starts from vertex 0 so each mesh is offset to follow on from the highest vertex used by the previous mesh.
+	The faces are converted to uint32 once and the offsets are added in one pass. The meshes returned are views.
+	"""
+	face_count = len(faces)
+	# the last block runs to the end of the face table
+	block_ends = numpy.minimum(numpy.append(numpy.cumsum(mesh_face_blocks.astype(numpy.int64) * 64)[:-1], face_count), face_count)
+	block_starts = numpy.concatenate(([0], block_ends[:-1]))
+	counts = numpy.minimum(face_counts[:len(block_starts)].astype(numpy.int64), block_ends - block_starts)  # strip the end of the block
+
+	# one spare row so that the end of the last block is a valid index for reduceat
+	faces_32 = numpy.zeros((face_count + 1, 3), numpy.uint32)
+	faces_32[:face_count] = faces
+	# the max of each used part of a block. reduceat is given the start and end of each block and every other result is kept
+	block_max = numpy.maximum.reduceat(
+		faces_32.ravel(),
+		numpy.stack((block_starts, block_starts + counts), axis=1).ravel() * 3
+	)[::2].astype(numpy.int64)
+	block_max[counts == 0] = -1  # an empty block does not move the offset on
+	offsets = numpy.concatenate(([0], numpy.cumsum(block_max + 1)[:-1])).astype(numpy.uint32)
+	faces_32.ravel()[:face_count * 3] += numpy.repeat(offsets, (block_ends - block_starts) * 3)
+	return [faces_32[start:start + count] for start, count in zip(block_starts, counts)]
+
+
+def _mesh_faces(faces: numpy.ndarray, starts: numpy.ndarray, counts: numpy.ndarray, offsets: numpy.ndarray) -> List[numpy.ndarray]:
+	"""Take counts[i] faces from starts[i] and add offsets[i] for each mesh.
+
+	The faces of every mesh are gathered into one uint32 array in one go and returned as a list of views.
+	"""
+	starts = numpy.asarray(starts, numpy.int64)
+	counts = numpy.clip(numpy.minimum(numpy.asarray(counts, numpy.int64), len(faces) - starts), 0, None)
+	ends = numpy.cumsum(counts)
+	face_index = numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - (ends - counts), counts)
+	mesh_faces = numpy.take(faces, face_index, axis=0).astype(numpy.uint32)
+	mesh_faces.ravel()[:] += numpy.repeat(numpy.asarray(offsets, numpy.uint32), counts * 3)
+	return numpy.split(mesh_faces, ends[:-1])
+
+
+def _dequantize_vertices(vert_table: numpy.ndarray) -> numpy.ndarray:
+	vertices = vert_table['v'].astype(numpy.float32)
+	vertices /= vert_table['sc'].astype(numpy.float32).reshape(-1, 1)
+	return vertices
+
+
+def _dequantize_texture_vertices(vert_table: numpy.ndarray) -> numpy.ndarray:
+	return numpy.multiply(vert_table['vt'], texture_vertex_scale, dtype=numpy.float32)
+
+
+def _dequantize_normals(vert_table: numpy.ndarray) -> Union[numpy.ndarray, None]:
+	if 'n' not in vert_table.dtype.names:
+		return None
+	normals = vert_table['n'].astype(numpy.float32)
+	length = numpy.linalg.norm(normals, axis=1, keepdims=True)
+	numpy.divide(normals, length, out=normals, where=length != 0)
+	return normals
 
 
 class Reader(BaseModel, BaseReader):
-	file_type = '415D9568'
+	"""The model reader.
+
+	When "compactModels" is enabled in the config only the int16 vertex table is kept and the
+	vertices, texture vertices and normals are converted to float32 each time they are accessed.
+	This is much smaller for models that are held in memory but callers should keep the returned
+	array rather than accessing the property repeatedly.
+	"""
+	file_type = 0x415D9568
+	vert_table = None
+	# used by models made from this one (such as in the mesh cache) that only keep the vertex table
+	dequantize_vertices = staticmethod(_dequantize_vertices)
+	dequantize_texture_vertices = staticmethod(_dequantize_texture_vertices)
+	dequantize_normals = staticmethod(_dequantize_normals)
+
+	@property
+	def vertices(self) -> numpy.ndarray:
+		if self._vertices is None and self.vert_table is not None:
+			return _dequantize_vertices(self.vert_table)
+		return self._vertices
+
+	@property
+	def texture_vertices(self) -> numpy.ndarray:
+		if self._texture_vertices is None and self.vert_table is not None:
+			return _dequantize_texture_vertices(self.vert_table)
+		return self._texture_vertices
+
+	@property
+	def normals(self) -> numpy.ndarray:
+		if self._normals is None and self.vert_table is not None:
+			return _dequantize_normals(self.vert_table)
+		return self._normals
 
 	def __init__(self, py_ubi_forge, model_file: FileObjectDataWrapper):
 		BaseModel.__init__(self)
@@ -35,7 +200,7 @@ class Reader(BaseModel, BaseReader):
 		model_file.read_bytes(1)
 
 		model_file.read_id()
-		if model_file.read_type() == "FC9E1595":  # this part should get moved to a different file technically
+		if model_file.read_type() == 0xFC9E1595:  # this part should get moved to a different file technically
 			model_file.read_bytes(4)
 			model_file.out_file_write('Typeswitch\n')
 			self.type_switch = model_file.read_bytes(1)
@@ -58,101 +223,20 @@ class Reader(BaseModel, BaseReader):
 				vert_table_length = model_file.read_uint_32()
 				self.vert_count = vert_table_length / vert_table_width
 
-				if vert_table_width == 16:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('', numpy.int16, 2),  # not sure what this is
-						('vt', numpy.int16, 2)
-					], vert_table_length)
-
-				elif vert_table_width == 20:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16),  # not sure what this is
-						('vt', numpy.int16, 2)
-					], vert_table_length)
-
-				elif vert_table_width == 24:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2)
-					], vert_table_length)
-
-				elif vert_table_width == 28:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2),
-						('', numpy.int16, 2),  # not sure what this is
-					], vert_table_length)
-
-				elif vert_table_width == 32:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2),
-						('bn', numpy.uint8, 4),
-						('bw', numpy.uint8, 4)
-					], vert_table_length)
-
-				elif vert_table_width == 36:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2),
-						('', numpy.int16, 2),  # not sure what this is
-						('bn', numpy.uint8, 4),
-						('bw', numpy.uint8, 4)
-					], vert_table_length)
-
-				elif vert_table_width == 40:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2),
-						('bn', numpy.uint8, 8),
-						('bw', numpy.uint8, 8)
-					], vert_table_length)
-
-				elif vert_table_width == 48:
-					vert_table = model_file.read_numpy([
-						('v', numpy.int16, 3),
-						('sc', numpy.int16),
-						('n', numpy.int16, 3),
-						('', numpy.int16, 3),  # not sure what this is
-						('vt', numpy.int16, 2),
-						('', numpy.int16, 2),  # not sure what this is
-						('bn', numpy.uint8, 8),
-						('bw', numpy.uint8, 8),
-						('', numpy.int16, 2),  # not sure what this is
-					], vert_table_length)
-				else:
+				vert_table_dtype = vert_table_dtypes.get(vert_table_width, None)
+				if vert_table_dtype is None:
 					py_ubi_forge.log.warn(__name__, f'Not yet implemented!\n\nvertTableWidth = {vert_table_width}')
 					raise Exception()
+				vert_table = model_file.read_numpy(vert_table_dtype, vert_table_length)
 
-				self._vertices = vert_table['v'].astype(numpy.float) / vert_table['sc'].reshape(-1, 1).astype(numpy.float)
-				# self._vertices *= numpy.sum(bounding_box2, 0) / numpy.amax(self.vertices, 0)
-				# for dim in range(3):
-				# 	self.vertices[:, dim] = numpy.interp(self.vertices[:, dim], (self.vertices[:, dim].min(), self.vertices[:, dim].max()), bounding_box2[:, dim])
-				self._texture_vertices = vert_table['vt'].astype(numpy.float) / 2048.0
-				self._texture_vertices[:, 1] *= -1
-				if 'n' in vert_table:
-					self._normals = vert_table['n'].astype(numpy.float)
 				self.vert_table = vert_table
+				if not py_ubi_forge.CONFIG.get('compactModels', False):
+					self._vertices = _dequantize_vertices(vert_table)
+					# self._vertices *= numpy.sum(bounding_box2, 0) / numpy.amax(self.vertices, 0)
+					# for dim in range(3):
+					# 	self.vertices[:, dim] = numpy.interp(self.vertices[:, dim], (self.vertices[:, dim].min(), self.vertices[:, dim].max()), bounding_box2[:, dim])
+					self._texture_vertices = _dequantize_texture_vertices(vert_table)
+					self._normals = _dequantize_normals(vert_table)
 
 				# # scale verticies based on bouding box
 				# model['modelBoundingBox'] = {}
@@ -213,16 +297,14 @@ class Reader(BaseModel, BaseReader):
 
 			if self._faces is not None:
 				if use_blocks == 1:
-					self._faces = numpy.split(self._faces, numpy.cumsum(mesh_face_blocks * 64)[:-1])
-					for index in range(len(self._faces)):
-						self._faces[index] = self._faces[index][:self.meshes['face_count'][index]]  # strip the end of the block
-						if index >= 1:
-							self._faces[index] += self._faces[index-1].max() + 1  # add the vertex offset (each block starts from 0)
+					self._faces = _block_faces(self._faces, mesh_face_blocks, self.meshes['face_count'])
 				else:
-					faces = self._faces
-					self._faces = []
-					for faces_used_x3, face_count, verts_used in zip(self.meshes['faces_used_x3'], self.meshes['face_count'], self.meshes['verts_used']):
-						self._faces.append(faces[int(faces_used_x3/3):int(faces_used_x3/3)+face_count] + verts_used)
+					self._faces = _mesh_faces(
+						self._faces,
+						self.meshes['faces_used_x3'].astype(numpy.int64) // 3,
+						self.meshes['face_count'],
+						self.meshes['verts_used']
+					)
 
 			model_file.out_file_write('Shadow Table\n')
 			shadow_count = model_file.read_uint_32()
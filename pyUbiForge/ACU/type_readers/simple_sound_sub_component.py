@@ -1,10 +1,8 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Array, Nested
 
 
-class Reader(BaseReader):
-	file_type = '4E7C39C3'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		for _ in range(2):
-			py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
+class Reader(SchemaReader):
+	file_type = 0x4E7C39C3
+	schema = (
+		Array(2, Nested()),
+	)
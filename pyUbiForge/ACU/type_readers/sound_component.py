@@ -1,12 +1,10 @@
-from pyUbiForge.misc.file_object import FileObjectDataWrapper
-from pyUbiForge.misc.file_readers import BaseReader
+from pyUbiForge.misc.schema import SchemaReader, Array, Nested, Skip
 
 
-class Reader(BaseReader):
-	file_type = 'E8134060'
-
-	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
-		file_object_data_wrapper.read_bytes(2)
-		for _ in range(3):
-			py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
-		file_object_data_wrapper.read_bytes(10)  # wrong but needs more examples
+class Reader(SchemaReader):
+	file_type = 0xE8134060
+	schema = (
+		Skip(2),
+		Array(3, Nested()),
+		Skip(10)  # wrong but needs more examples
+	)
@@ -5,9 +5,25 @@ from pyUbiForge.misc import BaseTexture
 from pyUbiForge.misc.file_readers import BaseReader
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
 
+# imgDXT to the DDS fourCC and the DXGI format written in the DX10 header (None if there is no DX10 header)
+# 8 is BC7. 9 and 16 are the single and two channel formats (BC4 and BC5) used for masks and normal maps
+dxt_formats = {
+	0: (b'DXT1', None),
+	1: (b'DXT1', None),
+	2: (b'DXT1', None),
+	3: (b'DXT1', None),
+	4: (b'DXT3', None),
+	5: (b'DXT5', None),
+	6: (b'DXT5', None),
+	7: (b'DXT1', None),
+	8: (b'DX10', 98),   # DXGI_FORMAT_BC7_UNORM
+	9: (b'DX10', 80),   # DXGI_FORMAT_BC4_UNORM
+	16: (b'DX10', 83)   # DXGI_FORMAT_BC5_UNORM
+}
+
 
 class Reader(BaseTexture, BaseReader):
-	file_type = 'A2B7E917'
+	file_type = 0xA2B7E917
 
 	def __init__(self, py_ubi_forge, texture_file: FileObjectDataWrapper):
 		BaseTexture.__init__(self, py_ubi_forge)
@@ -36,7 +52,7 @@ class Reader(BaseTexture, BaseReader):
 		self.dwMipMapCount = texture_file.read_bytes(4)
 		texture_file.seek(84, 1)  # 24 of other data followed by "CompiledTextureMap" which duplicates most of the data
 		self.dwPitchOrLinearSize = texture_file.read_bytes(4)
-		self.buffer = texture_file.read_bytes(struct.unpack('<I', self.dwPitchOrLinearSize)[0])
+		self.buffer = texture_file.read_view(struct.unpack('<I', self.dwPitchOrLinearSize)[0])  # not copied as often only one mip map is used
 		self.dwReserved = b'\x00\x00\x00\x00'*11
 
 		self.ddspf = b''  # (pixel format)
@@ -45,22 +61,15 @@ class Reader(BaseTexture, BaseReader):
 			self.ddspf += b'\x40\x00\x00\x00'
 		else:
 			self.ddspf += b'\x04\x00\x00\x00'
-		# if imgDXT in [0, 7]:
-		# 	self.ddspf += b'DXT1'
-		if self.imgDXT in [0, 1, 2, 3, 7]:  # dwFourCC
-			self.ddspf += b'DXT1'
-		elif self.imgDXT == 4:
-			self.ddspf += b'DXT3'
-		elif self.imgDXT in [5, 6]:
-			self.ddspf += b'DXT5'
-		elif self.imgDXT in [8, 9, 16]:
-			self.ddspf += b'DX10'
-		else:
+		if self.imgDXT not in dxt_formats:
 			raise Exception(f'imgDXT: "{self.imgDXT}" is not currently supported')
+		four_cc, dxgi_format = dxt_formats[self.imgDXT]
+		self.ddspf += four_cc  # dwFourCC
 
 		self.ddspf += b'\x00\x00\x00\x00' * 5  # dwRGBBitCount, dwRBitMask, dwGBitMask, dwBBitMask, dwABitMask
-		if self.imgDXT == 8:
-			self.DXT10Header = b'\x62\x00\x00\x00\x03\x00\x00\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00'
+		if dxgi_format is not None:
+			# dxgiFormat, resourceDimension (texture 2D), miscFlag, arraySize, miscFlags2
+			self.DXT10Header = struct.pack('<5I', dxgi_format, 3, 0, 1, 0)
 		else:
 			self.DXT10Header = b''
 		self.dwCaps = b'\x08\x10\x40\x00'
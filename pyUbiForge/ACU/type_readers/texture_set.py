@@ -4,7 +4,7 @@ from pyUbiForge.misc import Material
 
 
 class Reader(BaseReader, Material):
-	file_type = 'D70E6670'
+	file_type = 0xD70E6670
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		Material.__init__(self, None)
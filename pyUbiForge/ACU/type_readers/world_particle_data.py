@@ -3,7 +3,7 @@ from pyUbiForge.misc.file_readers import BaseReader
 
 
 class Reader(BaseReader):
-	file_type = '5730D30E'
+	file_type = 0x5730D30E
 
 	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
 		py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
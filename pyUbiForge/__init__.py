@@ -33,6 +33,9 @@ class _PyUbiForgeMain:
 		self._temp_files = misc_.TempFilesContainer(self)
 		self._right_click_plugins = misc_.plugins.PluginHandler(self)
 		self._read_file = misc_.file_readers.FileReaderHandler(self)
+		self._mesh_cache = misc_.mesh_cache.MeshCache(self)
+		self._material_table = misc_.material_table.MaterialTable(self)
+		self._thumbnails = misc_.thumbnails.ThumbnailCache(self)
 		self._forge_files = {}  # _forge_files is a dictionary mapping from str name of the forge file to a Forge class.
 
 	@property
@@ -73,6 +76,21 @@ class _PyUbiForgeMain:
 		"""Returns a class containing the code to read data from the files."""
 		return self._read_file
 
+	@property
+	def mesh_cache(self) -> misc_.mesh_cache.MeshCache:
+		"""Returns the class that caches decoded models on disk. Use this to get models that are going to be exported."""
+		return self._mesh_cache
+
+	@property
+	def material_table(self) -> misc_.material_table.MaterialTable:
+		"""Returns the table of the texture ids used by each material. Use this to resolve materials."""
+		return self._material_table
+
+	@property
+	def thumbnails(self) -> misc_.thumbnails.ThumbnailCache:
+		"""Returns the class that makes and caches thumbnails of textures and models for the file tree."""
+		return self._thumbnails
+
 	@property
 	def game_identifier(self) -> Union[str, None]:
 		"""Returns the game identifier for the game currently loaded.
@@ -96,21 +114,26 @@ class _PyUbiForgeMain:
 	def game_identifiers(self) -> List[str]:
 		return list(self._games.keys())
 
-	def load_game(self, game_identifier: str):
+	def load_game(self, game_identifier: str, forge_file_names: List[str] = None):
 		"""Call this with the identifier of the game you want to load.
 
 		This needs to be run after startup as no game is loaded to begin with
 		This is also what you should call if you want to switch between games.
 		Valid identifiers are defined in games at the top of this file.
+		If forge_file_names is given only those forge files are loaded.
 		"""
 		self.log.info(__name__, 'Loading Game Files.')
 		self.temp_files.clear()
+		self.mesh_cache.clear()
+		self.material_table.save()  # while game_functions is still the old game
+		self.material_table.clear()
+		self.thumbnails.clear()
 		if game_identifier in self._games:
 			self._game_functions = self._games.get(game_identifier)
 			self._forge_files = {}
 			if os.path.isdir(self.CONFIG.game_folder(game_identifier)):
 				for forge_file_name in os.listdir(self.CONFIG.game_folder(game_identifier)):
-					if forge_file_name.endswith('.forge'):
+					if forge_file_name.endswith('.forge') and (forge_file_names is None or forge_file_name in forge_file_names):
 						self._forge_files[forge_file_name] = self.game_functions.forge.Forge(
 								self,
 								os.path.join(self.CONFIG.game_folder(game_identifier), forge_file_name),
@@ -119,12 +142,14 @@ class _PyUbiForgeMain:
 						yield forge_file_name
 
 			self.temp_files.load()
+			self.material_table.load()
 		self.log.info(__name__, 'Finished Loading Game Files.')
 
 	def save(self):
-		"""Call this method to save the config file and light dictioary back to disk."""
+		"""Call this method to save the config file, light dictioary and material table back to disk."""
 		self.CONFIG.save()
 		self.temp_files.save()
+		self.material_table.save()
 
 
 main: _PyUbiForgeMain = _PyUbiForgeMain()
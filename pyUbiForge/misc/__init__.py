@@ -3,4 +3,4 @@ from .log import Logger
 from .decompress_ import decompress
 from .tempFiles2 import TempFilesContainer
 from .config_ import Config
-from . import file_object, mesh, plugins, file_readers
+from . import bcn, blender_client, file_object, mesh, plugins, file_readers, schema, profiler, scanner, mesh_cache, export_scheduler, material_table, texture_export, thumbnails, tile_stitcher
@@ -0,0 +1,365 @@
+"""
+	Decoder for block compressed (BCn) textures.
+
+	Textures in the game are stored as DDS data compressed in 4x4 pixel blocks. Every block of a format has the
+	same size and is independent of the others so each format is decoded here for all of the blocks at once with
+	numpy rather than one block at a time. The result is an RGBA array that can be saved as a PNG or pasted into
+	another image without going through texconv or PIL's DDS loader.
+
+	Supported formats:
+		BC1 (DXT1)	8 bytes per block. Two RGB565 colours and 2 bit indices. 1 bit alpha
+		BC2 (DXT3)	16 bytes per block. Explicit 4 bit alpha followed by a BC1 colour block
+		BC3 (DXT5)	16 bytes per block. Interpolated alpha followed by a BC1 colour block
+		BC4			8 bytes per block. One interpolated channel, decoded as grey
+		BC5			16 bytes per block. Two interpolated channels, decoded as red and green
+		BC7			16 bytes per block. 8 modes with up to 3 subsets each with their own RGB(A) endpoints
+
+	>>>	pixels = decode(texture.buffer, width, height, 'BC7')    # numpy.uint8 array with shape (height, width, 4)
+
+	The buffer of a texture contains every mip map one after the other. mip_levels gives where each one is so that
+	a small preview can be decoded from only the bytes of a small mip map.
+
+	Only the unsigned normalised variants are supported. BC6H is not used by the game.
+"""
+
+import time
+import numpy
+from typing import Dict, Callable, List, Tuple, Union
+
+block_sizes = {'BC1': 8, 'BC2': 16, 'BC3': 16, 'BC4': 8, 'BC5': 16, 'BC7': 16}
+
+# DDS pixel format fourCC to format
+four_cc_formats = {b'DXT1': 'BC1', b'DXT2': 'BC2', b'DXT3': 'BC2', b'DXT4': 'BC3', b'DXT5': 'BC3', b'ATI1': 'BC4', b'BC4U': 'BC4', b'ATI2': 'BC5', b'BC5U': 'BC5'}
+# DXGI_FORMAT in the DX10 header to format
+dxgi_formats = {70: 'BC1', 71: 'BC1', 72: 'BC1', 73: 'BC2', 74: 'BC2', 75: 'BC2', 76: 'BC3', 77: 'BC3', 78: 'BC3', 79: 'BC4', 80: 'BC4', 82: 'BC5', 83: 'BC5', 97: 'BC7', 98: 'BC7', 99: 'BC7'}
+
+# the number of blocks decoded at once. BC7 uses about 1KB of working memory per block
+decode_chunk_blocks = 16384
+
+_pixel_shift = numpy.arange(16, dtype=numpy.uint64)
+
+
+def _lookup(palette: numpy.ndarray, indices: numpy.ndarray) -> numpy.ndarray:
+	"""Look up indices (N, 16) in the palette of each block (N, K) or (N, K, 4). Each RGBA colour is looked up as one uint32
+	with numpy.take on the flattened palettes which is several times faster than the equivalent fancy indexing."""
+	palette = numpy.ascontiguousarray(palette, numpy.uint8)
+	flat = palette.view('<u4').reshape(-1) if palette.ndim == 3 else palette.reshape(-1)
+	indices = indices.astype(numpy.intp) + numpy.arange(len(palette), dtype=numpy.intp)[:, numpy.newaxis] * palette.shape[1]
+	pixels = flat.take(indices)
+	return pixels.view(numpy.uint8).reshape(len(palette), 16, 4) if palette.ndim == 3 else pixels
+
+
+def _expand_565(colours: numpy.ndarray) -> numpy.ndarray:
+	"""uint16 RGB565 colours to an int32 array of RGBA with an extra last axis."""
+	colours = colours.astype(numpy.int32)
+	rgba = numpy.empty(colours.shape + (4,), numpy.int32)
+	rgba[..., 0] = (colours >> 11) & 31
+	rgba[..., 1] = (colours >> 5) & 63
+	rgba[..., 2] = colours & 31
+	rgba[..., 0] = (rgba[..., 0] << 3) | (rgba[..., 0] >> 2)
+	rgba[..., 1] = (rgba[..., 1] << 2) | (rgba[..., 1] >> 4)
+	rgba[..., 2] = (rgba[..., 2] << 3) | (rgba[..., 2] >> 2)
+	rgba[..., 3] = 255
+	return rgba
+
+
+def _bc1_colour(blocks: numpy.ndarray, always_four_colours: bool = False) -> numpy.ndarray:
+	"""Decode the 8 byte BC1 colour blocks to (N, 16, 4) uint8 RGBA."""
+	endpoints = numpy.ascontiguousarray(blocks[:, :4]).view('<u2')
+	palette = numpy.empty((len(blocks), 4, 4), numpy.int32)
+	palette[:, :2] = _expand_565(endpoints)
+	e0 = palette[:, 0]
+	e1 = palette[:, 1]
+	four_colours = (endpoints[:, 0] > endpoints[:, 1])[:, numpy.newaxis]
+	if always_four_colours:
+		four_colours[:] = True
+	palette[:, 2] = numpy.where(four_colours, (2 * e0 + e1) // 3, (e0 + e1) // 2)
+	palette[:, 3] = numpy.where(four_colours, (e0 + 2 * e1) // 3, 0)
+	palette[:, 2:, 3] = 255
+	palette[:, 3, 3] = numpy.where(four_colours[:, 0], 255, 0)
+	indices = (numpy.ascontiguousarray(blocks[:, 4:8]).view('<u4') >> (_pixel_shift.astype(numpy.uint32) * 2)) & 3
+	return _lookup(palette, indices)
+
+
+def _bc4_channel(blocks: numpy.ndarray) -> numpy.ndarray:
+	"""Decode the 8 byte interpolated single channel blocks used by BC3 alpha, BC4 and BC5 to (N, 16) uint8."""
+	a0 = blocks[:, 0:1].astype(numpy.int32)
+	a1 = blocks[:, 1:2].astype(numpy.int32)
+	i = numpy.arange(1, 7, dtype=numpy.int32)
+	palette = numpy.empty((len(blocks), 8), numpy.int32)
+	palette[:, 0:1] = a0
+	palette[:, 1:2] = a1
+	palette[:, 2:] = numpy.where(
+		a0 > a1,
+		((7 - i) * a0 + i * a1) // 7,
+		numpy.concatenate([((5 - i[:4]) * a0 + i[:4] * a1) // 5, numpy.zeros_like(a0), numpy.full_like(a0, 255)], axis=1)
+	)
+	bits = (numpy.ascontiguousarray(numpy.pad(blocks[:, 2:8], ((0, 0), (0, 2)))).view('<u8'))
+	indices = (bits >> (_pixel_shift * 3)) & 7
+	return _lookup(palette, indices)
+
+
+def decode_bc1(blocks: numpy.ndarray) -> numpy.ndarray:
+	return _bc1_colour(blocks)
+
+
+def decode_bc2(blocks: numpy.ndarray) -> numpy.ndarray:
+	pixels = _bc1_colour(blocks[:, 8:], True)
+	alpha = numpy.ascontiguousarray(blocks[:, :8]).view('<u8')
+	pixels[:, :, 3] = ((alpha >> (_pixel_shift * 4)) & 15).astype(numpy.uint8) * 17
+	return pixels
+
+
+def decode_bc3(blocks: numpy.ndarray) -> numpy.ndarray:
+	pixels = _bc1_colour(blocks[:, 8:], True)
+	pixels[:, :, 3] = _bc4_channel(blocks[:, :8])
+	return pixels
+
+
+def decode_bc4(blocks: numpy.ndarray) -> numpy.ndarray:
+	pixels = numpy.empty((len(blocks), 16, 4), numpy.uint8)
+	pixels[:, :, :3] = _bc4_channel(blocks)[:, :, numpy.newaxis]
+	pixels[:, :, 3] = 255
+	return pixels
+
+
+def decode_bc5(blocks: numpy.ndarray) -> numpy.ndarray:
+	pixels = numpy.zeros((len(blocks), 16, 4), numpy.uint8)
+	pixels[:, :, 0] = _bc4_channel(blocks[:, :8])
+	pixels[:, :, 1] = _bc4_channel(blocks[:, 8:])
+	pixels[:, :, 3] = 255
+	return pixels
+
+
+# BC7 modes. (subsets, partition bits, rotation bits, index selection bits, colour bits, alpha bits, p-bits per endpoint, p-bits per subset, index bits, secondary index bits)
+bc7_modes = (
+	(3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+	(2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+	(3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+	(2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+	(1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+	(1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+	(1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+	(2, 6, 0, 0, 5, 5, 1, 0, 2, 0)
+)
+
+# the subset of each pixel for the 64 two subset partitions. Bit n is the subset of pixel n
+_bc7_partitions_2 = (
+	0xCCCC, 0x8888, 0xEEEE, 0xECC8, 0xC880, 0xFEEC, 0xFEC8, 0xEC80, 0xC800, 0xFFEC, 0xFE80, 0xE800, 0xFFE8, 0xFF00, 0xFFF0, 0xF000,
+	0xF710, 0x008E, 0x7100, 0x08CE, 0x008C, 0x7310, 0x3100, 0x8CCE, 0x088C, 0x3110, 0x6666, 0x366C, 0x17E8, 0x0FF0, 0x718E, 0x399C,
+	0xAAAA, 0xF0F0, 0x5A5A, 0x33CC, 0x3C3C, 0x55AA, 0x9696, 0xA55A, 0x73CE, 0x13C8, 0x324C, 0x3BDC, 0x6996, 0xC33C, 0x9966, 0x0660,
+	0x0272, 0x04E4, 0x4E40, 0x2720, 0xC936, 0x936C, 0x39C6, 0x639C, 0x9336, 0x9CC6, 0x817E, 0xE718, 0xCCF0, 0x0FCC, 0x7744, 0xEE22
+)
+# the subset of each pixel for the 64 three subset partitions. Bits 2n and 2n+1 are the subset of pixel n
+_bc7_partitions_3 = (
+	0xAA685050, 0x6A5A5040, 0x5A5A4200, 0x5450A0A8, 0xA5A50000, 0xA0A05050, 0x5555A0A0, 0x5A5A5050,
+	0xAA550000, 0xAA555500, 0xAAAA5500, 0x90909090, 0x94949494, 0xA4A4A4A4, 0xA9A59450, 0x2A0A4250,
+	0xA5945040, 0x0A425054, 0xA5A5A500, 0x55A0A0A0, 0xA8A85454, 0x6A6A4040, 0xA4A45000, 0x1A1A0500,
+	0x0050A4A4, 0xAAA59090, 0x14696914, 0x69691400, 0xA08585A0, 0xAA821414, 0x50A4A450, 0x6A5A0200,
+	0xA9A58000, 0x5090A0A8, 0xA8A09050, 0x24242424, 0x00AA5500, 0x24924924, 0x24499224, 0x50A50A50,
+	0x500AA550, 0xAAAA4444, 0x66660000, 0xA5A0A5A0, 0x50A050A0, 0x69286928, 0x44AAAA44, 0x66666600,
+	0xAA444444, 0x54A854A8, 0x95809580, 0x96969600, 0xA85454A8, 0x80959580, 0xAA141414, 0x96960000,
+	0xAAAA1414, 0xA05050A0, 0xA0A5A5A0, 0x96000000, 0x40804080, 0xA9A8A9A8, 0xAAAAAA44, 0x2A4A5254
+)
+# the anchor pixel of the second subset of the two subset partitions
+_bc7_anchors_2 = (
+	15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+	15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+	15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+	6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15
+)
+# the anchor pixels of the second and third subsets of the three subset partitions
+_bc7_anchors_3 = (
+	(3, 15), (3, 8), (15, 8), (15, 3), (8, 15), (3, 15), (15, 3), (15, 8),
+	(8, 15), (8, 15), (6, 15), (6, 15), (6, 15), (5, 15), (3, 15), (3, 8),
+	(3, 15), (3, 8), (8, 15), (15, 3), (3, 15), (3, 8), (6, 15), (10, 8),
+	(5, 3), (8, 15), (8, 6), (6, 10), (8, 15), (5, 15), (15, 10), (15, 8),
+	(8, 15), (15, 3), (3, 15), (5, 10), (6, 10), (10, 8), (8, 9), (15, 10),
+	(15, 6), (3, 15), (15, 8), (5, 15), (15, 3), (15, 6), (15, 6), (15, 8),
+	(3, 15), (15, 3), (5, 15), (5, 15), (5, 15), (8, 15), (5, 15), (10, 15),
+	(5, 15), (10, 15), (8, 15), (13, 15), (15, 3), (12, 15), (3, 15), (3, 8)
+)
+
+# subset count to (partition, pixel) subset table and (partition, subset) anchor pixel table
+_bc7_subsets = {
+	1: numpy.zeros((1, 16), numpy.intp),
+	2: ((numpy.array(_bc7_partitions_2, numpy.uint32)[:, numpy.newaxis] >> numpy.arange(16, dtype=numpy.uint32)) & 1).astype(numpy.intp),
+	3: ((numpy.array(_bc7_partitions_3, numpy.uint32)[:, numpy.newaxis] >> (numpy.arange(16, dtype=numpy.uint32) * 2)) & 3).astype(numpy.intp)
+}
+_bc7_anchors = {
+	1: numpy.zeros((1, 1), numpy.intp),
+	2: numpy.stack([numpy.zeros(64, numpy.intp), _bc7_anchors_2], axis=1),
+	3: numpy.concatenate([numpy.zeros((64, 1), numpy.intp), _bc7_anchors_3], axis=1)
+}
+_bc7_weights = {
+	2: numpy.array([0, 21, 43, 64], numpy.int32),
+	3: numpy.array([0, 9, 18, 27, 37, 46, 55, 64], numpy.int32),
+	4: numpy.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64], numpy.int32)
+}
+
+
+def _bc7_bits(halves: numpy.ndarray, offsets: numpy.ndarray, length: int) -> numpy.ndarray:
+	"""Read the length bit values starting at each bit in offsets from 128 bit blocks stored as (N, 2) uint64.
+	offsets is an array of uint64 that broadcasts against (N, 1). numpy shifts of 64 bits or more give 0 so the
+	offsets that wrap around below 0 in the low or high half contribute nothing."""
+	low = halves[:, 0:1]
+	high = halves[:, 1:2]
+	values = (low >> offsets) | (high << (numpy.uint64(64) - offsets)) | (high >> (offsets - numpy.uint64(64)))
+	return (values & numpy.uint64((1 << length) - 1)).astype(numpy.int32)
+
+
+def _bc7_indices(halves: numpy.ndarray, offset: int, index_bits: int, anchors: numpy.ndarray) -> numpy.ndarray:
+	"""Read the 16 indices of each block starting at bit offset. The anchor pixels of each block are one bit shorter."""
+	pixels = numpy.arange(16)
+	# every anchor before a pixel moves it back one bit
+	starts = offset + pixels * index_bits - (anchors[:, :, numpy.newaxis] < pixels).sum(axis=1)
+	values = _bc7_bits(halves, starts.astype(numpy.uint64), index_bits)
+	is_anchor = (anchors[:, :, numpy.newaxis] == pixels).any(axis=1)
+	values[is_anchor] &= (1 << (index_bits - 1)) - 1
+	return values
+
+
+def _bc7_mode(halves: numpy.ndarray, mode: int) -> numpy.ndarray:
+	"""Decode blocks that all use the given mode to (N, 16, 4) uint8."""
+	subsets, partition_bits, rotation_bits, index_selection_bits, colour_bits, alpha_bits, endpoint_p_bits, subset_p_bits, index_bits, index_bits_2 = bc7_modes[mode]
+	count = len(halves)
+	offset = mode + 1
+
+	def field(length: int, values: int = 1) -> numpy.ndarray:
+		nonlocal offset
+		value = _bc7_bits(halves, numpy.uint64(offset) + numpy.arange(values, dtype=numpy.uint64) * numpy.uint64(length), length)
+		offset += length * values
+		return value
+
+	partition = field(partition_bits)[:, 0]
+	rotation = field(rotation_bits)[:, 0]
+	index_selection = field(index_selection_bits)[:, 0]
+
+	endpoint_count = subsets * 2
+	endpoints = numpy.full((count, endpoint_count, 4), 255, numpy.int32)
+	channel_bits = [colour_bits] * 3 + [alpha_bits]
+	channels = 4 if alpha_bits else 3
+	for channel in range(channels):
+		endpoints[:, :, channel] = field(channel_bits[channel], endpoint_count)
+
+	if endpoint_p_bits:
+		p_bits = field(1, endpoint_count)
+	elif subset_p_bits:
+		p_bits = numpy.repeat(field(1, subsets), 2, axis=1)
+	else:
+		p_bits = None
+	if p_bits is not None:
+		endpoints[:, :, :channels] = (endpoints[:, :, :channels] << 1) | p_bits[:, :, numpy.newaxis]
+		channel_bits = [length + 1 for length in channel_bits]
+	for channel in range(channels):
+		length = channel_bits[channel]
+		endpoints[:, :, channel] = (endpoints[:, :, channel] << (8 - length)) | (endpoints[:, :, channel] >> (2 * length - 8))
+
+	anchors = _bc7_anchors[subsets][partition]
+	indices = _bc7_indices(halves, offset, index_bits, anchors)
+	offset += 16 * index_bits - subsets
+	colour_weights = alpha_weights = _bc7_weights[index_bits][indices]
+	if index_bits_2:
+		alpha_weights = _bc7_weights[index_bits_2][_bc7_indices(halves, offset, index_bits_2, anchors)]
+		if index_selection_bits:
+			swap = index_selection.astype(bool)[:, numpy.newaxis]
+			colour_weights, alpha_weights = numpy.where(swap, alpha_weights, colour_weights), numpy.where(swap, colour_weights, alpha_weights)
+
+	pixel_subsets = _bc7_subsets[subsets][partition] * 2
+	rows = numpy.arange(count)[:, numpy.newaxis] * endpoint_count
+	# int16 is enough for the interpolation (at most 64 * 255 + 32) and halves the memory used
+	flat_endpoints = endpoints.astype(numpy.int16).reshape(-1, 4)
+	e0 = flat_endpoints.take(rows + pixel_subsets, axis=0)
+	e1 = flat_endpoints.take(rows + pixel_subsets + 1, axis=0)
+	weights = numpy.empty((count, 16, 4), numpy.int16)
+	weights[:, :, :3] = colour_weights[:, :, numpy.newaxis]
+	weights[:, :, 3] = alpha_weights
+	pixels = (((64 - weights) * e0 + weights * e1 + 32) >> 6).astype(numpy.uint8)
+
+	if rotation_bits:
+		for rotate in (1, 2, 3):
+			rotated = rotation == rotate
+			if rotated.any():
+				pixels[rotated, :, rotate - 1], pixels[rotated, :, 3] = pixels[rotated, :, 3], pixels[rotated, :, rotate - 1].copy()
+	return pixels
+
+
+def decode_bc7(blocks: numpy.ndarray) -> numpy.ndarray:
+	"""Decode BC7 blocks. The blocks are grouped by mode and each mode is decoded for all its blocks at once.
+	Blocks with the reserved mode 8 decode to transparent black."""
+	pixels = numpy.zeros((len(blocks), 16, 4), numpy.uint8)
+	first_byte = blocks[:, 0]
+	modes = numpy.full(len(blocks), 8, numpy.uint8)
+	for mode in range(7, -1, -1):
+		modes[(first_byte & (1 << mode)) != 0] = mode
+	halves = numpy.ascontiguousarray(blocks).view('<u8')
+	for mode in range(8):
+		selection = modes == mode
+		if selection.any():
+			pixels[selection] = _bc7_mode(halves[selection], mode)
+	return pixels
+
+
+decoders: Dict[str, Callable[[numpy.ndarray], numpy.ndarray]] = {
+	'BC1': decode_bc1,
+	'BC2': decode_bc2,
+	'BC3': decode_bc3,
+	'BC4': decode_bc4,
+	'BC5': decode_bc5,
+	'BC7': decode_bc7
+}
+
+
+def mip_levels(width: int, height: int, block_format: str, mip_count: int) -> List[Tuple[int, int, int, int]]:
+	"""The (offset, size, width, height) of each mip map in data containing mip_count of them, largest first.
+	Each level is half the size of the one before (rounded down, at least 1 pixel) and padded to whole blocks."""
+	levels = []
+	offset = 0
+	for _ in range(max(1, mip_count)):
+		size = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_sizes[block_format]
+		levels.append((offset, size, width, height))
+		offset += size
+		if width == 1 and height == 1:
+			break
+		width = max(1, width // 2)
+		height = max(1, height // 2)
+	return levels
+
+
+def decode(buffer: Union[bytes, memoryview], width: int, height: int, block_format: str) -> numpy.ndarray:
+	"""Decode the first (largest) image in buffer to a numpy.uint8 array with shape (height, width, 4).
+
+	:param buffer: the compressed data. Anything after the first image (mip maps) is ignored
+	:param width: width of the image in pixels
+	:param height: height of the image in pixels
+	:param block_format: one of the keys of block_sizes
+	:return: RGBA pixels
+	"""
+	if block_format not in decoders:
+		raise Exception(f'Texture format "{block_format}" is not supported')
+	blocks_x = max(1, (width + 3) // 4)
+	blocks_y = max(1, (height + 3) // 4)
+	block_count = blocks_x * blocks_y
+	block_size = block_sizes[block_format]
+	if len(buffer) < block_count * block_size:
+		raise Exception(f'Expected at least {block_count * block_size} bytes of {block_format} data for a {width}x{height} texture. Got {len(buffer)}')
+	blocks = numpy.frombuffer(buffer, numpy.uint8, block_count * block_size).reshape(block_count, block_size)
+	decoder = decoders[block_format]
+	pixels = numpy.empty((block_count, 16, 4), numpy.uint8)
+	for start in range(0, block_count, decode_chunk_blocks):
+		pixels[start:start + decode_chunk_blocks] = decoder(blocks[start:start + decode_chunk_blocks])
+	# (block y, block x, pixel y, pixel x) to (pixel y in image, pixel x in image)
+	image = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(blocks_y * 4, blocks_x * 4, 4)
+	return image[:height, :width]
+
+
+def benchmark(block_format: str, width: int = 2048, height: int = 2048, repeats: int = 3) -> float:
+	"""Decode random data of the given format and return the best speed in megapixels per second.
+	Random BC7 data uses all of the modes in roughly the proportions 1/2, 1/4 ... 1/256."""
+	buffer = numpy.random.default_rng(0).integers(0, 256, ((width + 3) // 4) * ((height + 3) // 4) * block_sizes[block_format], numpy.uint8).tobytes()
+	best = float('inf')
+	for _ in range(repeats):
+		start = time.perf_counter()
+		decode(buffer, width, height, block_format)
+		best = min(best, time.perf_counter() - start)
+	return width * height / best / 1e6
@@ -1,16 +1,123 @@
+"""
+	Client for sending meshes and bones to Blender running resources/blender_2_7_server.py.
+
+	Each message is sent over a multiprocessing.connection as raw bytes rather than pickled python objects.
+	A message is a header followed by the data of each of its arrays:
+	- the header is magic (b'ACXB'), the protocol version (uint16) and the length of a utf-8 JSON object (uint32)
+		followed by the JSON object. This holds the message type, any small fields (such as names) and the name,
+		dtype and shape of each array.
+	- the data of each array follows in order, split into blocks of at most chunk_size bytes so that large meshes
+		do not need one huge message. The receiver reads the blocks straight into the memory of a numpy array.
+
+	Vertices are sent as little endian float32, faces as uint32 and bone matrices as float32 so nothing has to be
+	converted to python objects on either side.
+
+	>>>	with BlenderClient() as blender:
+	>>>		blender.send_mesh(name, vertices, faces)
+"""
+
+import json
+import struct
+import numpy
 from multiprocessing.connection import Client
-import random
+from typing import Dict, Tuple, List, Iterator
+
+magic = b'ACXB'
+protocol_version = 1
+default_address = ('localhost', 6163)
+# the largest block of array data sent at once
+chunk_size = 16 * 1024 * 1024
+# the colour of skin weight images where no vertex is weighted to the bone
+skin_weight_background = (128, 0, 0)
+
+
+def skin_weight_images(vert_table: numpy.ndarray, bone_count: int, size: int = 1024, radius: int = 5) -> Iterator[Tuple[int, numpy.ndarray]]:
+	"""Draw the weight of each bone at the texture coordinates of the vertices weighted to it.
+
+	Each weighted vertex is drawn as a grey disc of its weight. All the discs of a bone are drawn at once with
+	numpy and the discs with higher weights are drawn over lower ones. One image is made at a time.
+	:param vert_table: the vertex table of a skinned model with the fields 'vt', 'bn' and 'bw'
+	:param bone_count: the number of bones of the model. Weights for bones outside this are ignored
+	:param size: the width and height of the images
+	:param radius: the radius of the disc drawn for each vertex in pixels
+	:return: iterator of (bone index, numpy.uint8 RGB array with shape (size, size, 3))
+	"""
+	weights = vert_table['bw']
+	vertex_index, slot = numpy.nonzero(weights)
+	bone = vert_table['bn'][vertex_index, slot]
+	weight = weights[vertex_index, slot]
+	centres = numpy.rint(vert_table['vt'][vertex_index].astype(numpy.float32) / 2).astype(numpy.int64)
+	order = numpy.lexsort((weight, bone))
+	bone, weight, centres = bone[order], weight[order], centres[order]
+	bone_starts = numpy.searchsorted(bone, numpy.arange(bone_count + 1))
+
+	offset_y, offset_x = numpy.mgrid[-radius:radius + 1, -radius:radius + 1]
+	disc = offset_x ** 2 + offset_y ** 2 <= radius * radius + radius
+	offset_x, offset_y = offset_x[disc], offset_y[disc]
 
-c = Client(('localhost', 6163))
+	for bone_index in range(bone_count):
+		image = numpy.empty((size, size, 3), numpy.uint8)
+		image[:] = skin_weight_background
+		start, end = bone_starts[bone_index], bone_starts[bone_index + 1]
+		if end > start:
+			x = (centres[start:end, 0, numpy.newaxis] + offset_x).ravel()
+			y = (centres[start:end, 1, numpy.newaxis] + offset_y).ravel()
+			value = numpy.repeat(weight[start:end], len(offset_x))
+			inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+			image[y[inside], x[inside]] = value[inside, numpy.newaxis]
+		yield bone_index, image
 
 
-for _ in range(50):
-	c.send({
-		'type': 'MESH',
-		'verts': [
-			(random.random(), random.random(), random.random()) for _ in range(3)
-		],
-		'faces': [
-			(0, 1, 2)
+class BlenderClient:
+	"""A connection to the Blender server. See the top of this module."""
+	def __init__(self, address: Tuple[str, int] = default_address):
+		self._connection = Client(address)
+
+	def send(self, message_type: str, arrays: Dict[str, numpy.ndarray] = None, **fields):
+		"""Send a message with the given arrays and JSON serialisable fields."""
+		arrays = {name: numpy.ascontiguousarray(array) for name, array in (arrays or {}).items()}
+		header = dict(fields)
+		header['type'] = message_type
+		header['arrays'] = [
+			{'name': name, 'dtype': array.dtype.str, 'shape': array.shape} for name, array in arrays.items()
 		]
-	})
+		header = json.dumps(header).encode('utf-8')
+		self._connection.send_bytes(struct.pack('<4sHI', magic, protocol_version, len(header)) + header)
+		for array in arrays.values():
+			data = memoryview(array.reshape(-1).view(numpy.uint8))
+			for start in range(0, len(data), chunk_size):
+				self._connection.send_bytes(data[start:start + chunk_size])
+
+	def send_mesh(self, name: str, vertices: numpy.ndarray, faces: numpy.ndarray):
+		"""Send a triangle mesh. Only the vertices used by the faces are sent.
+
+		:param name: the name of the object in Blender
+		:param vertices: array with shape (N, 3)
+		:param faces: array of indexes into vertices with shape (M, 3)
+		"""
+		used, faces = numpy.unique(faces.ravel(), return_inverse=True)
+		self.send(
+			'MESH',
+			{
+				'verts': vertices[used].astype('<f4'),
+				'faces': faces.reshape(-1, 3).astype('<u4')
+			},
+			name=name
+		)
+
+	def send_bones(self, bone_ids: List[str], matrices: numpy.ndarray):
+		"""Send an armature.
+
+		:param bone_ids: the name of each bone
+		:param matrices: the transformation matrix of each bone with shape (N, 4, 4)
+		"""
+		self.send('BONES', {'mat': numpy.asarray(matrices, '<f4').reshape(-1, 4, 4)}, bone_id=list(bone_ids))
+
+	def close(self):
+		self._connection.close()
+
+	def __enter__(self) -> 'BlenderClient':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
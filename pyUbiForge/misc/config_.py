@@ -21,8 +21,20 @@ class Config:
 
 			"logFile": "ACExplorer.log",
 			"tempFilesMaxMemoryMB": 2048,
+			"parsedFilesMaxMemoryMB": 512,
 			"writeToDisk": False,
-			"dev": False
+			"dev": False,
+			"hotReloadReaders": False,
+			"profileReaders": False,
+			"compactModels": False,
+			"meshCache": True,
+			"meshCacheFolder": "resources/meshCache",
+			"exportThreads": 0,
+			"textureExportProcesses": 0,
+			"thumbnailFolder": "resources/thumbnails",
+			"thumbnailCacheMB": 256,
+			"thumbnailSize": 128,
+			"thumbnailThreads": 2
 		}
 
 		for key, val in default_config.items():
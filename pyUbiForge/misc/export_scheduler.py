@@ -0,0 +1,125 @@
+"""
+	Scheduler for exports that read many files.
+
+	An export of a datablock or fakes file is a tree of dependencies:
+	datablock → entities → visual/LOD selector → mesh instance data → model → materials → textures.
+	Walking this depth first on one thread means each datafile is decompressed the first time something in it is
+	needed and nothing else happens while it is. The exporters instead run the export as stages. Each stage collects
+	and deduplicates every file id it needs and ExportScheduler.map then reads them on a thread pool. The ids are
+	grouped by the datafile containing them so each datafile is decompressed once, by one thread, and the
+	decompression of one datafile (which releases the GIL) overlaps with the reading of others. Results are yielded
+	as they finish so the exporter can write them while the rest are being read.
+
+	>>>	scheduler = ExportScheduler(py_ubi_forge)
+	>>>	with scheduler.stage('entities'):
+	>>>		for file_id, entity in scheduler.map(read_entity, entity_ids):
+	>>>			...  # collect the transformation matrices of each model
+	>>>	scheduler.export_instances(obj_handler, instances)  # models, materials, textures and save
+	>>>	scheduler.log_times()
+
+	The number of threads is "exportThreads" in the config.
+"""
+
+import os
+import time
+import contextlib
+import numpy
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, Tuple, Dict, List, Any, Union
+from pyUbiForge.misc import mesh
+
+
+class ExportScheduler:
+	"""Reads the files needed by an export in parallel. See the top of this module."""
+	def __init__(self, py_ubi_forge, threads: int = None):
+		self.pyUbiForge = py_ubi_forge
+		self.threads = threads or py_ubi_forge.CONFIG.get('exportThreads', 0) or os.cpu_count()
+		self.stage_times: Dict[str, float] = {}     # stage name to the seconds spent in it
+
+	@contextlib.contextmanager
+	def stage(self, name: str):
+		"""Time everything done within the with block as the stage name."""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.stage_times[name] = self.stage_times.get(name, 0.0) + time.perf_counter() - start
+
+	def log_times(self):
+		self.pyUbiForge.log.info(__name__, ', '.join(f'{name} {duration:.2f}s' for name, duration in self.stage_times.items()))
+
+	def _run(self, function: Callable[[int], Any], file_ids: List[int]) -> List[Tuple[int, Any]]:
+		results = []
+		for file_id in file_ids:
+			try:
+				results.append((file_id, function(file_id)))
+			except Exception as e:
+				self.pyUbiForge.log.warn(__name__, f'Failed reading {file_id:016X}: {e}')
+				results.append((file_id, None))
+		return results
+
+	def map(self, function: Callable[[int], Any], file_ids: Iterable[int]) -> Iterator[Tuple[int, Any]]:
+		"""Call function with each unique file id on the thread pool and yield (file_id, result) as each finishes.
+
+		function must be safe to call from several threads. If it raises the error is logged and the result is None.
+		The ids in each datafile are done in order on one thread and the datafiles are done in any order.
+		Only a limited number of datafiles are in flight at once so that the decompressed files are not
+		removed from temp_files before they are read.
+		"""
+		groups: Dict[Tuple[str, int], List[int]] = {}   # (forge file name, datafile id) to file ids
+		for file_id in dict.fromkeys(int(file_id) for file_id in file_ids):
+			groups.setdefault(self.pyUbiForge.temp_files.locate(file_id), []).append(file_id)
+
+		if self.threads <= 1:
+			for group in groups.values():
+				yield from self._run(function, group)
+			return
+
+		groups_iter = iter(groups.values())
+		with ThreadPoolExecutor(self.threads) as executor:
+			pending = set()
+			while True:
+				for group in groups_iter:
+					pending.add(executor.submit(self._run, function, group))
+					if len(pending) >= self.threads * 2:
+						break
+				if not pending:
+					break
+				done, pending = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					yield from future.result()
+
+	def export_instances(self, obj_handler, instances: Dict[int, List[numpy.ndarray]]):
+		"""Export every instance of the models in instances with obj_handler and then save it.
+
+		The models and their materials are read on the thread pool and each model is passed to obj_handler as it is ready.
+		The textures of the materials are then exported with a texture_export.TextureExporter before obj_handler.save_and_close is called.
+		:param obj_handler: one of mesh.ObjMtl, mesh.Collada or mesh.Gltf
+		:param instances: model file id to a list of stacks of transformation matrices with shape (N, 4, 4)
+		"""
+		mtl_handler: mesh.MaterialHandler = obj_handler.mtl_handler
+
+		def read_model(file_id: int) -> Union[mesh.BaseModel, None]:
+			model = self.pyUbiForge.mesh_cache.get(file_id)
+			if model is not None:
+				for material_file_id in model.materials:
+					mtl_handler.get(material_file_id)
+			return model
+
+		with self.stage('models'):
+			for model_file_id, model in self.map(read_model, instances.keys()):
+				if model is None:
+					self.pyUbiForge.log.warn(__name__, f"Failed reading model file {model_file_id:016X}")
+					continue
+				transforms = numpy.concatenate(instances[model_file_id])
+				if isinstance(obj_handler, mesh.ObjMtl):
+					obj_handler.export(model, model.name, transforms)
+				else:
+					obj_handler.export(model_file_id, transformation_matrix=transforms)
+				self.pyUbiForge.log.info(__name__, f'Exported {len(transforms)} instances of {model.name}')
+
+		with self.stage('textures'):
+			mtl_handler.export_textures(mtl_handler.texture_ids(obj_handler.texture_maps), obj_handler.save_folder)
+
+		with self.stage('save'):
+			obj_handler.save_and_close()
@@ -38,6 +38,12 @@ class FileObject:
 		else:
 			raise Exception(f'Unsupported entry: "{length}"')
 
+	def read_view(self, length: int) -> memoryview:
+		"""Like read but returns a memoryview of the data instead of copying it."""
+		data = memoryview(self._data)[self._file_pointer:self._file_pointer + length]
+		self._file_pointer += length
+		return data
+
 	def seek(self, offset: int, whence: int = 0):
 		if whence == 0:
 			self._file_pointer = offset
@@ -67,6 +73,7 @@ class FileObjectDataWrapper:
 		assert endianness in ('<', '>')
 		self.endianness = endianness
 		self.indent_chr = '\t'
+		self.projection = None  # file types to read when parsing. Set by FileReaderHandler.__call__
 
 	@classmethod
 	def from_binary(cls, py_ubi_forge, binary: bytes, endianness: str = '<') -> 'FileObjectDataWrapper':
@@ -82,6 +89,11 @@ class FileObjectDataWrapper:
 	def bind_out_file(self, out_file: IO):
 		self._out_file = out_file
 
+	@property
+	def formatting(self) -> bool:
+		"""True if the data read is being written to an out file."""
+		return self._out_file is not None
+
 	def close(self):
 		self.file_object.close()
 		if self._out_file is not None:
@@ -173,6 +185,17 @@ class FileObjectDataWrapper:
 	def read_bytes(self, chr_len: int) -> bytes:
 		return self._read_struct(f'{chr_len}s')
 
+	def read_view(self, length: int) -> Union[memoryview, bytes]:
+		"""Read length bytes without copying them where possible.
+		Use this for large blocks of data of which only part may be used. The result supports the buffer protocol
+		(numpy.frombuffer, hashlib, slicing) but must be converted with bytes() before it can be pickled."""
+		if self._out_file is not None or not isinstance(self.file_object, FileObject) or not isinstance(self.file_object._data, bytes):
+			return self.read_bytes(length)
+		data = self.file_object.read_view(length)
+		if len(data) != length:
+			raise Exception('Reached End Of File')
+		return data
+
 	def read_id(self) -> int:
 		file_id = self._read_struct(self.pyUbiForge.game_functions.file_id_datatype, False, False)
 		if self._out_file is not None:
@@ -180,16 +203,17 @@ class FileObjectDataWrapper:
 			if data is None:
 				self._out_file.write('\t\tUnknown File ID\n')
 			else:
-				self._out_file.write('\t\t{data.file_name}\t{data.file_type}\n'.format(data=data))
+				self._out_file.write('\t\t{data.file_name}\t{data.file_type:08X}\n'.format(data=data))
 		return file_id
 
-	def read_type(self) -> str:
+	def read_type(self) -> int:
+		"""Read the file type as an integer. Use f'{file_type:08X}' to get the big endian hex representation."""
 		binary = self.file_object.read(self.pyUbiForge.game_functions.file_type_length)
 		if len(binary) != self.pyUbiForge.game_functions.file_type_length:
 			raise Exception('Reached End Of File')
-		file_type = ''.join(f'{b:02X}' for b in binary[::-1])
+		file_type = int.from_bytes(binary, 'little')
 		if self._out_file is not None:
-			self._out_file.write(f'{self._indent_count * self.indent_chr}{hex_string(binary)}\t\t{file_type}\t{self.pyUbiForge.game_functions.file_types.get(file_type, "Undefined")}\n')
+			self._out_file.write(f'{self._indent_count * self.indent_chr}{hex_string(binary)}\t\t{file_type:08X}\t{self.pyUbiForge.game_functions.file_types.get(file_type, "Undefined")}\n')
 		return file_type
 
 	def read_struct(self, data_types: str):
@@ -219,29 +243,34 @@ class FileObjectDataWrapper:
 		return binary
 
 	def clever_format(self):
+		"""Write the rest of the file to the out file, splitting it up wherever a known file type is found.
+
+		Every 4 byte window in the remaining data is checked against the known file types in one vectorised pass.
+		Matches are then consumed from left to right so that overlapping matches are ignored.
+		"""
 		if self._out_file is not None:
-			hex_str = []
-			might_be_a_file_type = ''.join(f'{b:02X}' for b in self.file_object.read(4)[::-1])
-			while len(might_be_a_file_type) == 8:
-				if might_be_a_file_type in self.pyUbiForge.game_functions.file_types:
-					self._out_file.write(f'{self._indent_count * self.indent_chr}{" ".join(hex_str)}\n')
-					self._out_file.write(f'{self._indent_count * self.indent_chr}{might_be_a_file_type}\t\t{self.pyUbiForge.game_functions.file_types.get(might_be_a_file_type)}\n')
-					hex_str = []
-					might_be_a_file_type = ''.join(f'{b:02X}' for b in self.file_object.read(4)[::-1])
-				else:
-					hex_str.append(might_be_a_file_type[6:])
-					next_chr = self.file_object.read(1)
-					if next_chr == b'':
-						might_be_a_file_type = might_be_a_file_type[:6]
-					else:
-						might_be_a_file_type = f'{next_chr[0]:02X}{might_be_a_file_type[:6]}'
-
-			while might_be_a_file_type != '':
-				hex_str.append(might_be_a_file_type[-2:])
-				might_be_a_file_type = might_be_a_file_type[:-2]
-			self._out_file.write(f'{self._indent_count * self.indent_chr}{" ".join(hex_str)}\n')
+			binary = self.file_object.read()
+			signatures = self.pyUbiForge.game_functions.file_type_signatures
+			if len(binary) >= 4:
+				data = numpy.frombuffer(binary, numpy.uint8)
+				window_count = len(data) - 3
+				windows = data[:window_count].astype(numpy.uint32)
+				for shift in range(1, 4):
+					windows |= data[shift:window_count + shift].astype(numpy.uint32) << (8 * shift)
+				candidates = numpy.flatnonzero(numpy.isin(windows, signatures))
+			else:
+				windows = candidates = numpy.empty(0, numpy.uint32)
+			offset = 0
+			for candidate in candidates:
+				if candidate < offset:
+					continue  # overlaps with the previous match
+				file_type = int(windows[candidate])
+				self._out_file.write(f'{self._indent_count * self.indent_chr}{hex_string(binary[offset:candidate])}\n')
+				self._out_file.write(f'{self._indent_count * self.indent_chr}{file_type:08X}\t\t{self.pyUbiForge.game_functions.file_types.get(file_type)}\n')
+				offset = candidate + 4
+			self._out_file.write(f'{self._indent_count * self.indent_chr}{hex_string(binary[offset:])}\n')
 		return
 
 
 def hex_string(binary: bytes) -> str:
-	return ' '.join(f'{b:02X}' for b in binary)
+	return binary.hex(' ').upper()
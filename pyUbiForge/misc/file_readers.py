@@ -1,36 +1,147 @@
+import os
+import re
+import json
+import pickle
 import pkgutil
 import importlib
-from typing import Union, TextIO
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Union, TextIO, Dict, Tuple, Any, Iterable, Iterator, FrozenSet, List, Callable
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
-import time
+from pyUbiForge.misc.tempFiles2 import LastUsed
+from pyUbiForge.misc.profiler import ParseProfiler
+from pyUbiForge.misc.scanner import scan
 
 
 class BaseReader:
 	file_type = None
 
+	@classmethod
+	def skip(cls, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		"""Move file_object_data_wrapper past a file of this type without keeping the result.
+
+		Nested files do not store their size so by default the file is read in full and thrown away.
+		The projection is cleared while it is read because the reader may use the files nested within it.
+		Readers that can find their end more cheaply than this should override it.
+		"""
+		projection = file_object_data_wrapper.projection
+		file_object_data_wrapper.projection = None
+		try:
+			cls(py_ubi_forge, file_object_data_wrapper)
+		finally:
+			file_object_data_wrapper.projection = projection
+
+
+class SkippedFile:
+	"""Returned by get_data_recursive in place of a nested file whose type was not in the projection."""
+	__slots__ = ('file_type',)
+
+	def __init__(self, file_type: int):
+		self.file_type = file_type
+
+
+class BatchItem:
+	"""The result of reading one file with FileReaderHandler.batch.
+
+	If the file was read error is None and value is the parsed file (or what summarise returned for it).
+	Otherwise value is None and error describes what went wrong.
+	"""
+	__slots__ = ('file_id', 'forge_file_name', 'datafile_id', 'file_type', 'value', 'error')
+
+	def __init__(self, file_id: int, forge_file_name: str, datafile_id: int, file_type: int = None, value: Any = None, error: str = None):
+		self.file_id = file_id
+		self.forge_file_name = forge_file_name
+		self.datafile_id = datafile_id
+		self.file_type = file_type
+		self.value = value
+		self.error = error
+
+
+class ParsedFileCache:
+	"""Cache of parsed files so that files used many times (models, materials etc.) are only read once.
+
+	Entries are keyed by (file_id, forge_file_name, datafile_id, projection). Files do not change within a game install
+	so entries never go stale. A file read in full can be used for any projection. The size of the raw file is used as an estimate of the memory used by the
+	parsed object and the least recently used entries are removed when "parsedFilesMaxMemoryMB" is exceeded.
+	"""
+	def __init__(self, py_ubi_forge):
+		self.pyUbiForge = py_ubi_forge
+		self._memory = 0
+		self._parsed_files: Dict[Tuple[int, str, int, Union[FrozenSet[int], None]], Tuple[Any, int]] = {}  # key to (parsed object, raw size)
+		self._file_id_to_keys: Dict[int, list] = {}
+		self._last_used = LastUsed()
+		self._lock = threading.Lock()
+
+	def find(self, file_id: int, forge_file_name: str = None, datafile_id: int = None, projection: FrozenSet[int] = None) -> Union[Tuple[int, str, int, Union[FrozenSet[int], None]], None]:
+		"""Find the key of a cached entry matching the description or None if there is not one."""
+		with self._lock:
+			for key in self._file_id_to_keys.get(file_id, ()):
+				if forge_file_name in (None, key[1]) and datafile_id in (None, key[2]) and key[3] in (None, projection):
+					return key
+
+	def get(self, key: Tuple[int, str, int, Union[FrozenSet[int], None]]) -> Any:
+		"""Get a cached entry. Raises KeyError if key is not cached."""
+		with self._lock:
+			parsed_file = self._parsed_files[key][0]
+			self._last_used.remove(key)
+			self._last_used.append(key)
+		return parsed_file
+
+	def add(self, key: Tuple[int, str, int, Union[FrozenSet[int], None]], parsed_file: Any, raw_size: int):
+		with self._lock:
+			if key in self._parsed_files:
+				self._memory -= self._parsed_files[key][1]
+			else:
+				self._file_id_to_keys.setdefault(key[0], []).append(key)
+			self._parsed_files[key] = (parsed_file, raw_size)
+			self._memory += raw_size
+			self._last_used.remove(key)
+			self._last_used.append(key)
+
+			while self._memory > self.pyUbiForge.CONFIG.get('parsedFilesMaxMemoryMB', 512) * 1000000:
+				remove_key = self._last_used.pop()
+				if remove_key is None:
+					break
+				self._memory -= self._parsed_files.pop(remove_key)[1]
+				self._file_id_to_keys[remove_key[0]].remove(remove_key)
+				if not self._file_id_to_keys[remove_key[0]]:
+					del self._file_id_to_keys[remove_key[0]]
+
+	def clear(self):
+		with self._lock:
+			self._memory = 0
+			self._parsed_files.clear()
+			self._file_id_to_keys.clear()
+			self._last_used.clear()
+
 
 class FileReaderHandler:
 	def __init__(self, py_ubi_forge):
 		self.pyUbiForge = py_ubi_forge
 		self.game_identifier = None
 		self.readers = {}
-		self._time = 0
-		self._wait = True
+		self._registry = {}  # file type to the name of the module containing the reader
+		self._reader_mtimes = {}  # module name to modified time of the module file when it was last loaded
+		self._lock = threading.RLock()
+		self._cache = ParsedFileCache(py_ubi_forge)
+		self.profiler = ParseProfiler(py_ubi_forge)
 
-	def __call__(self, file_object_data_wrapper: FileObjectDataWrapper, out_file: Union[None, FileObjectDataWrapper, TextIO] = None):
+	def __call__(self, file_object_data_wrapper: FileObjectDataWrapper, out_file: Union[None, FileObjectDataWrapper, TextIO] = None, projection: Iterable[int] = None):
 		"""
 		Call this function in the right click methods as the start point
 		Will call get_data_recursive to get the actual data followed by the clever_format method to read the rest of the file
 		:param file_object_data_wrapper: The input raw data
+		:param out_file: file to write the formatted data to
+		:param projection: If given only nested files of these types are read. The others are skipped and
+			returned as SkippedFile. The top level file is always read. Ignored when formatting.
 		:return: objects defined in the plugins
 		"""
-		file_object_data_wrapper.bind_out_file(out_file)
-		self._load_readers()
-		while self._wait:
-			time.sleep(0.1)
-		self._time = time.time()
 		if not isinstance(file_object_data_wrapper, FileObjectDataWrapper):
 			raise Exception('file_object_data_wrapper is not of type FileObjectDataWrapper')
+		file_object_data_wrapper.bind_out_file(out_file)
+		file_object_data_wrapper.projection = None if projection is None else frozenset(projection)
+		self._load_readers()
 		file_object_data_wrapper.read_bytes(self.pyUbiForge.game_functions.pre_header_length)
 		try:
 			data = self.get_data_recursive(file_object_data_wrapper)
@@ -40,53 +151,306 @@ class FileReaderHandler:
 		file_object_data_wrapper.clever_format()
 		return data
 
+	def get(self, file_id: int, forge_file_name: str = None, datafile_id: int = None, projection: Iterable[int] = None) -> Any:
+		"""Read the file with the given id, reusing the parsed object if the file has been read before.
+
+		Use this instead of read_file(temp_files(...).file) when the file may be read many times.
+		The returned object is shared between callers so it must not be modified.
+		Returns None if the file could not be found or read.
+		:param file_id: int
+		:param forge_file_name: str
+		:param datafile_id: int of the containing datafile
+		:param projection: file types to read. See __call__
+		:return: objects defined in the plugins
+		"""
+		self._load_readers()
+		if projection is not None:
+			projection = frozenset(projection)
+		key = self._cache.find(file_id, forge_file_name, datafile_id, projection)
+		if key is not None:
+			try:
+				return self._cache.get(key)
+			except KeyError:  # removed by another thread
+				pass
+		data = self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id)
+		if data is None:
+			self.pyUbiForge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+			return
+		parsed_file = self(data.file, projection=projection)
+		if parsed_file is None:  # not cached so that it is tried again
+			return
+		self._cache.add((data.file_id, data.forge_file, data.datafile_id, projection), parsed_file, data.file_size)
+		return parsed_file
+
+	def batch(
+			self,
+			file_ids: Iterable[int] = None,
+			file_type: int = None,
+			forge_file_name: str = None,
+			summarise: Callable[[Any], Any] = None,
+			projection: Iterable[int] = None,
+			processes: int = None
+	) -> Iterator[BatchItem]:
+		"""Read many files, spreading the decompression and reading over worker processes.
+
+		Give either file_ids or file_type. file_type reads every file of that type found by the scanner.
+		The files are grouped by datafile so that each datafile is only decompressed once. Items are yielded
+		as each datafile is finished so they will not be in the order given. A file that can't be found or
+		read is yielded with an error and the rest of the batch carries on.
+
+		Everything sent back from a worker is pickled. Some parsed files (eg textures) hold a reference to
+		pyUbiForge which can't be pickled so pass summarise to reduce each file to something that can be.
+		When using worker processes summarise must be defined at the top level of a module so that it can be imported.
+		:param file_ids: the files to read
+		:param file_type: read every file of this type
+		:param forge_file_name: only look in this forge file
+		:param summarise: function called on each parsed file in the worker. Its return value is used in place of the parsed file
+		:param projection: file types to read. See __call__
+		:param processes: number of worker processes. Defaults to the number of cpus. 0 reads the files in this process
+		:return: a BatchItem for each file
+		"""
+		if (file_ids is None) == (file_type is None):
+			raise Exception('Exactly one of file_ids and file_type must be given')
+		self._load_readers()
+		if projection is not None:
+			projection = frozenset(projection)
+
+		tasks: Dict[Tuple[str, int], List[int]] = {}  # (forge file name, datafile id) to file ids
+		if file_type is not None:
+			for record in scan(self.pyUbiForge, [file_type], forge_file_name):
+				tasks.setdefault((record.forge_file_name, record.datafile_id), []).append(record.file_id)
+		else:
+			for file_id in file_ids:
+				file_id = int(file_id)
+				location = self.pyUbiForge.temp_files.locate(file_id, forge_file_name)
+				if location[1] is None:
+					yield BatchItem(file_id, forge_file_name, None, error=f'Failed to find file {file_id:016X}')
+				else:
+					tasks.setdefault(location, []).append(file_id)
+
+		if processes is None:
+			processes = os.cpu_count()
+		if processes == 0 or not tasks:
+			for (forge_file_name_, datafile_id), task_file_ids in tasks.items():
+				yield from self._read_datafile(forge_file_name_, datafile_id, task_file_ids, projection, summarise, False)
+			return
+
+		config = dict(self.pyUbiForge.CONFIG.raw)
+		for key, default in (('tempFilesMaxMemoryMB', 2048), ('parsedFilesMaxMemoryMB', 512)):
+			# share the memory limits between the workers
+			config[key] = self.pyUbiForge.CONFIG.get(key, default) / processes
+		executor = ProcessPoolExecutor(
+			processes,
+			mp_context=multiprocessing.get_context('spawn'),
+			initializer=_batch_worker_init,
+			initargs=(self.pyUbiForge.game_identifier, sorted(set(location[0] for location in tasks)), config)
+		)
+		futures = {
+			executor.submit(_batch_worker, forge_file_name_, datafile_id, task_file_ids, projection, summarise): (forge_file_name_, datafile_id, task_file_ids)
+			for (forge_file_name_, datafile_id), task_file_ids in tasks.items()
+		}
+		try:
+			for future in as_completed(futures):
+				forge_file_name_, datafile_id, task_file_ids = futures[future]
+				try:
+					items = future.result()
+				except Exception as e:  # the worker died or the arguments could not be pickled
+					items = [BatchItem(file_id, forge_file_name_, datafile_id, error=f'{type(e).__name__}: {e}') for file_id in task_file_ids]
+				for item in items:
+					if item.error is None:
+						try:
+							item.value = pickle.loads(item.value)
+						except Exception as e:
+							item.value = None
+							item.error = f'{type(e).__name__}: {e}'
+					yield item
+		finally:
+			for future in futures:
+				future.cancel()
+			executor.shutdown()
+
+	def _read_datafile(self, forge_file_name: str, datafile_id: int, file_ids: List[int], projection: Union[FrozenSet[int], None], summarise: Union[Callable[[Any], Any], None], pickle_values: bool) -> List[BatchItem]:
+		"""Read files from one datafile for batch. When run in a worker the values are pickled here so that a value
+		that can't be pickled only fails that item."""
+		self._load_readers()
+		items = []
+		for file_id in file_ids:
+			item = BatchItem(file_id, forge_file_name, datafile_id)
+			try:
+				data = self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id)
+				if data is None:
+					raise Exception(f'Failed to find file {file_id:016X}')
+				item.file_type = data.file_type
+				file_object_data_wrapper = data.file
+				file_object_data_wrapper.projection = projection
+				file_object_data_wrapper.read_bytes(self.pyUbiForge.game_functions.pre_header_length)
+				value = self.get_data_recursive(file_object_data_wrapper)
+				if summarise is not None:
+					value = summarise(value)
+				item.value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL) if pickle_values else value
+			except Exception as e:
+				item.error = f'{type(e).__name__}: {e}'
+			items.append(item)
+		return items
+
+	def get_reader(self, file_type: int) -> type:
+		"""Get the reader class for file_type, importing it if needed. Raises an Exception if there is no reader."""
+		self._load_readers()
+		reader = self.readers.get(file_type, None)
+		if reader is None:
+			reader = self._import_reader(file_type)
+		return reader
+
 	def get_data_recursive(self, file_object_data_wrapper: FileObjectDataWrapper):
 		"""
 		Call this function in file reader methods to access other file types in the same file
+		If the file type is not in the projection passed to __call__ the file is skipped and a SkippedFile is
+		returned instead. Readers that use values from a nested file only get them if its type is in the projection.
 		:param file_object_data_wrapper: The input raw data
 		:return: objects defined in the plugins
 		"""
 
 		file_object_data_wrapper.out_file_write('\n')
-		file_object_data_wrapper.read_id()
+		file_id = file_object_data_wrapper.read_id()
 		file_type = file_object_data_wrapper.read_type()
-		if file_type in self.readers:
-			file_object_data_wrapper.indent()
-			ret = self.readers[file_type](self.pyUbiForge, file_object_data_wrapper)
-			file_object_data_wrapper.indent(-1)
-			return ret
+		reader = self.readers.get(file_type, None)
+		if reader is None:
+			reader = self._import_reader(file_type)
+		profile = self.profiler.enabled
+		projection = file_object_data_wrapper.projection
+		if projection is not None and file_type not in projection and not file_object_data_wrapper.formatting:
+			if profile:
+				self.profiler.skipped(file_type)
+			reader.skip(self.pyUbiForge, file_object_data_wrapper)
+			return SkippedFile(file_type)
+		file_object_data_wrapper.indent()
+		if profile:
+			ret = self.profiler.read(reader, file_object_data_wrapper, file_id)
 		else:
-			raise Exception(f'File type {file_type} does not have a file reader')
+			ret = reader(self.pyUbiForge, file_object_data_wrapper)
+		file_object_data_wrapper.indent(-1)
+		return ret
+
+	def skip_data_recursive(self, file_object_data_wrapper: FileObjectDataWrapper):
+		"""Move past a nested file without reading it. Used by readers that implement skip."""
+		file_object_data_wrapper.read_id()
+		file_type = file_object_data_wrapper.read_type()
+		reader = self.readers.get(file_type, None)
+		if reader is None:
+			reader = self._import_reader(file_type)
+		reader.skip(self.pyUbiForge, file_object_data_wrapper)
 
 	def _load_readers(self):
-		"""Call this method to load plugins from disk. (This method is automatically called by the get method)"""
-		if (self.pyUbiForge.game_identifier != self.game_identifier or self.pyUbiForge.CONFIG.get('dev', False)) and time.time() > self._time + 10:
-			self._time = time.time()
-			self._wait = True
-			self.game_identifier = self.pyUbiForge.game_identifier
-			self.readers = {}
-			for _, name, _ in pkgutil.iter_modules([f'./pyUbiForge/{self.pyUbiForge.game_identifier}/type_readers']):
-				module = importlib.import_module(f'pyUbiForge.{self.pyUbiForge.game_identifier}.type_readers.{name}')
-				importlib.reload(module)
-
-				if not hasattr(module, 'Reader') and issubclass(module.Reader, BaseReader):
-					self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "Reader" was either not defined, not a class or not a subclass of BaseReader')
-					continue
-
-				reader = module.Reader
-
-				if not hasattr(reader, 'file_type'):
-					self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not defined')
-					continue
-				elif not isinstance(reader.file_type, str):
-					self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not a string')
-					continue
-
-				file_type = reader.file_type
-
-				if file_type in self.readers:
-					self.pyUbiForge.log.warn(__name__, f'Skipping plugin "{name}" because a reader for this file type was already found')
-					continue
-				else:
-					self.readers[file_type] = reader
-			self._wait = False
+		"""Make sure the reader registry for the loaded game is set up. (This method is automatically called by __call__)
+
+		Reader modules are not imported here. Each one is imported the first time its file type is read.
+		If "hotReloadReaders" is enabled in the config any reader module that has been modified on disk
+		since it was imported will be reloaded.
+		"""
+		if self.pyUbiForge.game_identifier != self.game_identifier:
+			with self._lock:
+				if self.pyUbiForge.game_identifier != self.game_identifier:  # another thread may have got here first
+					self.readers = {}
+					self._reader_mtimes = {}
+					self._cache.clear()
+					self._registry = dict(self.pyUbiForge.game_functions.reader_registry)
+					self.game_identifier = self.pyUbiForge.game_identifier
+		elif self.pyUbiForge.CONFIG.get('hotReloadReaders', False):
+			self.reload_readers()
+
+	def reload_readers(self):
+		"""Reload any imported reader modules that have been modified on disk since they were imported."""
+		with self._lock:
+			for file_type, reader in list(self.readers.items()):
+				module = importlib.import_module(reader.__module__)
+				mtime = os.path.getmtime(module.__file__)
+				if self._reader_mtimes.get(module.__name__, None) != mtime:
+					self._reader_mtimes[module.__name__] = mtime
+					self._cache.clear()  # the cached objects may have been read differently
+					reader = self._validate_reader(importlib.reload(module))
+					if reader is None:
+						del self.readers[file_type]
+					else:
+						if reader.file_type != file_type:
+							del self.readers[file_type]
+						self.readers[reader.file_type] = reader
+
+	def _import_reader(self, file_type: int) -> 'BaseReader':
+		"""Import the module containing the reader for file_type and register the reader."""
+		with self._lock:
+			if file_type in self.readers:  # another thread may have imported it while we waited
+				return self.readers[file_type]
+			if file_type not in self._registry and self.pyUbiForge.CONFIG.get('hotReloadReaders', False):
+				# a reader may have been added since the registry was generated
+				self._registry = build_reader_registry(self.pyUbiForge.game_identifier)
+			if file_type not in self._registry:
+				raise Exception(f'File type {file_type:08X} does not have a file reader')
+			module = importlib.import_module(f'pyUbiForge.{self.pyUbiForge.game_identifier}.type_readers.{self._registry[file_type]}')
+			self._reader_mtimes[module.__name__] = os.path.getmtime(module.__file__)
+			reader = self._validate_reader(module)
+			if reader is None or reader.file_type != file_type:
+				raise Exception(f'File type {file_type:08X} does not have a valid file reader in {module.__name__}. The reader registry may need regenerating')
+			self.readers[file_type] = reader
+			return reader
+
+	def _validate_reader(self, module) -> Union['BaseReader', None]:
+		"""Check that module defines a usable Reader class. Returns the class or None if it is not valid."""
+		name = module.__name__
+		if not (hasattr(module, 'Reader') and isinstance(module.Reader, type) and issubclass(module.Reader, BaseReader)):
+			self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "Reader" was either not defined, not a class or not a subclass of BaseReader')
+			return
+
+		reader = module.Reader
+
+		if not hasattr(reader, 'file_type'):
+			self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not defined')
+			return
+		elif not isinstance(reader.file_type, int):
+			self.pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not an int')
+			return
+
+		return reader
+
+
+def _batch_worker_init(game_identifier: str, forge_file_names: List[str], config: dict):
+	"""Set up pyUbiForge in a worker process started by FileReaderHandler.batch."""
+	from pyUbiForge import main
+	for key, val in config.items():
+		main.CONFIG[key] = val
+	main.log.open_log_file('a')
+	for _ in main.load_game(game_identifier, forge_file_names):
+		pass
+
+
+def _batch_worker(forge_file_name: str, datafile_id: int, file_ids: List[int], projection: Union[FrozenSet[int], None], summarise: Union[Callable[[Any], Any], None]) -> List[BatchItem]:
+	from pyUbiForge import main
+	return main.read_file._read_datafile(forge_file_name, datafile_id, file_ids, projection, summarise, True)
+
+
+def _reader_folder(game_identifier: str) -> str:
+	return os.path.join(os.path.dirname(os.path.dirname(__file__)), game_identifier, 'type_readers')
+
+
+def build_reader_registry(game_identifier: str) -> Dict[int, str]:
+	"""Scan the reader modules of a game and map each file type to the name of the module that reads it.
+
+	The modules are not imported. The file_type is found in the source code so the class attribute must be
+	written on one line in the form "file_type = 0x415D9568". If more than one module reads the same file type
+	the first alphabetically is used.
+	"""
+	registry = {}
+	reader_folder = _reader_folder(game_identifier)
+	for _, name, _ in pkgutil.iter_modules([reader_folder]):
+		with open(os.path.join(reader_folder, f'{name}.py')) as f:
+			match = re.search(r'^\tfile_type = (0x[0-9A-Fa-f]{8})\s*$', f.read(), re.MULTILINE)
+		if match is not None:
+			registry.setdefault(int(match.group(1), 16), name)
+	return registry
+
+
+def save_reader_registry(game_identifier: str):
+	"""Regenerate readerRegistry.json for a game. Call this after adding, removing or renaming a reader module."""
+	registry = build_reader_registry(game_identifier)
+	with open(os.path.join(os.path.dirname(_reader_folder(game_identifier)), 'readerRegistry.json'), 'w') as f:
+		json.dump({f'{file_type:08X}': name for file_type, name in sorted(registry.items())}, f, indent='\t')
+		f.write('\n')
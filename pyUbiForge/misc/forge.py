@@ -1,4 +1,5 @@
-from typing import Dict, List, Union, TextIO
+import os
+from typing import Dict, List, Tuple, Union, TextIO
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
 
 """All the code needed to access the raw files from a .forge file."""
@@ -29,8 +30,8 @@ class DataFile:
 		return self._file_name
 
 	@property
-	def file_type(self) -> str:
-		"""The name associated with this forge file."""
+	def file_type(self) -> int:
+		"""The numerical file type of the main file in this datafile."""
 		return self._file_type
 
 	@property
@@ -56,6 +57,19 @@ class BaseForge:
 	def decompress_datafile(self, file_id):
 		raise NotImplemented
 
+	def scan_datafile(self, datafile_id: int) -> List[Tuple[int, int, int, str]]:
+		"""Return (file_id, file_type, file_size, file_name) for each file in the datafile without decompressing the data."""
+		raise NotImplementedError
+
+	def datafile_fingerprint(self, datafile_id: int) -> Union[str, None]:
+		"""A string that changes if the data in the given datafile may have changed. None if the datafile is not in this forge file.
+		Used by the caches that store data made from a datafile to tell if it is out of date."""
+		if datafile_id not in self.datafiles:
+			return None
+		datafile = self.datafiles[datafile_id]
+		stat = os.stat(self.path)
+		return f'{self.forge_file_name}:{stat.st_size}:{stat.st_mtime_ns}:{datafile_id:016X}:{datafile.raw_data_offset}:{datafile.raw_data_size}'
+
 	@property
 	def forge_file_name(self) -> str:
 		"""The file name of the forge file."""
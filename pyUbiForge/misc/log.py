@@ -2,9 +2,20 @@ class Logger:
 	"""The logging module. Used to print messages to the console and log to the log file"""
 	def __init__(self, py_ubi_forge):
 		self.pyUbiForge = py_ubi_forge
-		self.logFile = open(py_ubi_forge.CONFIG.get('logFile', "ACExplorer.log"), 'w')
+		self._log_file = None
 		self.buffer = None
 
+	@property
+	def logFile(self):
+		"""The log file. This is opened the first time something is logged."""
+		if self._log_file is None:
+			self.open_log_file()
+		return self._log_file
+
+	def open_log_file(self, mode: str = 'w'):
+		"""Open the log file named in the config. Worker processes use mode 'a' to add to the log of the main process."""
+		self._log_file = open(self.pyUbiForge.CONFIG.get('logFile', "ACExplorer.log"), mode, buffering=1 if mode == 'a' else -1)
+
 	def warn(self, name: str, msg: str):
 		"""Log with the warning prefix"""
 		msg = str(msg)
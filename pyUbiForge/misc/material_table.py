@@ -0,0 +1,120 @@
+"""
+	Persistent table of the textures used by each material.
+
+	Resolving a material means reading the material file and then the texture set it points to. The datablocks
+	of a game share most of their materials so the same chains were read again by every export. The material
+	table stores the texture ids of every material that has been resolved and is saved to
+	./resources/materialTable/{game}.json with the light dictionary so that exporters, in this session and later
+	ones, find a material with a dictionary lookup.
+
+	The table is filled in as materials are resolved. MaterialTable.build fills it for every material in the game
+	at once by scanning for the material files and reading them and their texture sets in a process pool.
+
+	The saved table records the size and modified time of each forge file. If any of them has changed when the
+	table is loaded the table is thrown away and built again as materials are used.
+
+	>>>	material = py_ubi_forge.material_table.get(file_id)
+	>>>	print(material.name, material.diffuse)
+"""
+
+import os
+import json
+import threading
+from typing import Dict, List, Union
+from pyUbiForge.misc.texture import Material
+
+# the attributes of Material stored in the table after the name
+texture_maps = ('diffuse', 'normal', 'specular', 'height', 'transmission', 'mask1', 'mask2')
+
+
+class MaterialTable:
+	"""Material file id to its name and texture ids. See the top of this module."""
+	def __init__(self, py_ubi_forge):
+		self.pyUbiForge = py_ubi_forge
+		self._materials: Dict[int, List[Union[str, int, None]]] = {}    # material file id to [name, *texture_maps]
+		self._lock = threading.Lock()
+		self.changed = False
+
+	@property
+	def path(self) -> str:
+		return f'./resources/materialTable/{self.pyUbiForge.game_functions.game_identifier}.json'
+
+	def _forge_fingerprint(self) -> Dict[str, List[int]]:
+		fingerprint = {}
+		for forge_file_name, forge_file in self.pyUbiForge.forge_files.items():
+			stat = os.stat(forge_file.path)
+			fingerprint[forge_file_name] = [stat.st_size, stat.st_mtime_ns]
+		return fingerprint
+
+	def __len__(self) -> int:
+		return len(self._materials)
+
+	def get(self, file_id: int) -> Material:
+		"""Get the material with the given id from the table or resolve it with get_material_ids if it is not in it.
+
+		A new Material is returned each time so the caller may modify it.
+		Materials that could not be resolved are returned as missing_no and not added to the table.
+		"""
+		row = self._materials.get(file_id, None)
+		if row is not None:
+			return Material(row[0], False, *row[1:])
+		material = self.pyUbiForge.game_functions.get_material_ids(self.pyUbiForge, file_id)
+		if not material.missing_no:
+			self.add(file_id, material)
+		return material
+
+	def add(self, file_id: int, material: Material):
+		with self._lock:
+			self._materials[file_id] = [material.name] + [
+				None if getattr(material, texture_map) is None else int(getattr(material, texture_map)) for texture_map in texture_maps
+			]
+			self.changed = True
+
+	def build(self, processes: int = None):
+		"""Resolve every material in the game and add it to the table.
+
+		:param processes: number of worker processes to read the files in. See FileReaderHandler.batch
+		"""
+		count = 0
+		for file_id, material in self.pyUbiForge.game_functions.resolve_materials(self.pyUbiForge, processes):
+			self.add(file_id, material)
+			count += 1
+		self.pyUbiForge.log.info(__name__, f'Added {count} materials to the material table')
+
+	def load(self):
+		"""Load the table of the loaded game from disk if it exists and the forge files have not changed."""
+		self.clear()
+		if not os.path.isfile(self.path):
+			return
+		try:
+			with open(self.path) as f:
+				table = json.load(f)
+		except (OSError, ValueError) as e:
+			self.pyUbiForge.log.warn(__name__, f'Failed loading the material table: {e}')
+			return
+		fingerprint = self._forge_fingerprint()
+		if any(fingerprint.get(forge_file_name, value) != value for forge_file_name, value in table['forge_files'].items()):
+			self.pyUbiForge.log.info(__name__, 'The forge files have changed. The material table will be built again.')
+			self.changed = True
+			return
+		self._materials = {int(file_id): row for file_id, row in table['materials'].items()}
+
+	def save(self):
+		"""Save the table back to disk if it has changed."""
+		if not self.changed or self.pyUbiForge.game_functions is None:
+			return
+		with self._lock:
+			table = {
+				'forge_files': self._forge_fingerprint(),
+				'materials': {str(file_id): row for file_id, row in self._materials.items()}
+			}
+			self.changed = False
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		with open(f'{self.path}.tmp', 'w') as f:
+			json.dump(table, f)
+		os.replace(f'{self.path}.tmp', self.path)
+
+	def clear(self):
+		with self._lock:
+			self._materials = {}
+			self.changed = False
@@ -1,10 +1,12 @@
+import io
 import os
+import json
+import struct
 import shutil
 import numpy
-from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
-from pyUbiForge.misc import texture
-from typing import Union, List
+from pyUbiForge.misc import texture, texture_export
+from typing import Union, List, Dict, Iterable
 
 
 class BaseModel:
@@ -50,6 +52,26 @@ class BaseModel:
 		return self._bones
 
 
+# the number of rows of an array formatted at once when writing text formats. This bounds the memory used for large meshes
+write_chunk_rows = 65536
+
+
+def write_rows(file, row_format: str, array: numpy.ndarray, offset: int = 0) -> None:
+	"""Write each row of a 2D array to file using %-style row_format.
+
+	The array is formatted write_chunk_rows rows at a time so the text of the whole array is never held in memory.
+	:param file: the text file to write to
+	:param row_format: the format of one row with one % field per column, ending in a new line
+	:param array: the 2D array to write
+	:param offset: added to every value before formatting
+	"""
+	for start in range(0, len(array), write_chunk_rows):
+		chunk = array[start:start + write_chunk_rows]
+		if offset:
+			chunk = chunk.astype(numpy.int64) + offset
+		file.write((row_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
 class ObjMtl:
 	"""This is a handler to export to the OBJ format with and MTL file for materials
 	This model exporter works by writing the mesh data for each mesh directly to the file as it is given it. (using the .export method).
@@ -57,11 +79,14 @@ class ObjMtl:
 	While this is being done the materials are saved to a buffer.
 	When the .save_and_close method is called these materials are written to the mtl file.
 	"""
+	texture_maps = ('diffuse', 'specular', 'normal', 'height')     # the textures of each material that are exported
+
 	def __init__(self, py_ubi_forge, model_name: str, save_folder: str):
 		self.pyUbiForge = py_ubi_forge
 		self.model_name = model_name
 		self.save_folder = save_folder
 		self.vertex_count = 0   # the number of vertices that have been processed. Used to calculate the vertex offset
+		self.texture_vertex_count = 0   # the same for texture coordinates which are shared between instances
 		self.mtl_handler = MaterialHandler(self.pyUbiForge)      # used when generating the .mtl file
 		self._group_name = {}   # used for getting a unique name for each model
 		self.missing_no_exported = False
@@ -83,33 +108,53 @@ class ObjMtl:
 		self._group_name[name] += 1
 		return f'{name}_{self._group_name[name]}'
 
-	def export(self, model: BaseModel, model_name: str, transformation_matrix: Union[List[numpy.ndarray], numpy.ndarray] = None) -> None:
+	def export(self, model: BaseModel, model_name: str, transformation_matrix: numpy.ndarray = None) -> None:
 		"""
-		when called will export the currently loaded mesh to the obj file
-		when finished will reset all the mesh variables so that things do not persist
+		when called will export the model to the obj file
+		transformation_matrix may be one 4x4 matrix or a stack of them with shape (N, 4, 4) to write N instances of the model.
+		All the instances are transformed in one batched operation and share one set of texture coordinates.
 		:return: None
 		"""
-		if isinstance(transformation_matrix, numpy.ndarray) and transformation_matrix.shape == (4, 4):
-			vertices = numpy.vstack((model.vertices.transpose(), numpy.ones((1, model.vertices.shape[0]))))
-			# vertices[:3, :] *= 0.001
-			vertices = numpy.dot(transformation_matrix, vertices)[:3, :].transpose()
+		vertices = model.vertices
+		if isinstance(transformation_matrix, numpy.ndarray) and transformation_matrix.shape[-2:] == (4, 4):
+			matrices = transformation_matrix.reshape(-1, 4, 4)
+		else:
+			matrices = None
+		instance_count = 1 if matrices is None else len(matrices)
+
+		# write vertices. Enough instances are transformed at once to fill write_chunk_rows
+		if matrices is None:
+			write_rows(self._obj, 'v %.6f %.6f %.6f\n', vertices)
 		else:
-			vertices = model.vertices
-		# write vertices
-		self._obj.write(('v {} {} {}\n' * vertices.shape[0]).format(*vertices.ravel().round(6)))
-		self._obj.write(f'# {len(model.vertices)} vertices\n\n')
+			instances_per_chunk = max(1, write_chunk_rows // max(1, len(vertices)))
+			for start in range(0, instance_count, instances_per_chunk):
+				chunk = matrices[start:start + instances_per_chunk]
+				# (instance, vertex, xyz)
+				instance_vertices = numpy.matmul(vertices, chunk[:, :3, :3].transpose(0, 2, 1)) + chunk[:, numpy.newaxis, :3, 3]
+				write_rows(self._obj, 'v %.6f %.6f %.6f\n', instance_vertices.reshape(-1, 3))
+		self._obj.write(f'# {len(vertices) * instance_count} vertices\n\n')
 
 		# write texture coords
-		self._obj.write(('vt {} {}\n' * model.texture_vertices.shape[0]).format(*model.texture_vertices.ravel().round(6)))
-		self._obj.write(f'# {len(model.texture_vertices)} texture coordinates\n\n')
+		texture_vertices = model.texture_vertices
+		write_rows(self._obj, 'vt %.6f %.6f\n', texture_vertices)
+		self._obj.write(f'# {len(texture_vertices)} texture coordinates\n\n')
 
-		# write faces
+		# write faces. Columns alternate between vertex and texture coordinate indexes
+		meshes = []
 		for mesh_index, mesh in enumerate(model.meshes):
-			self._obj.write(f'g {self.group_name(model_name)}\nusemtl {self.mtl_handler.get(model.materials[mesh_index]).name}\n')
-			self._obj.write(('f {}/{} {}/{} {}/{}\n' * mesh['face_count']).format(*numpy.repeat(model.faces[mesh_index][:mesh['face_count']], 2).astype(numpy.int_) + self.vertex_count + 1))
-			self._obj.write(f'# {mesh["face_count"]} faces\n\n')
-
-		self.vertex_count += len(model.vertices)
+			face_indexes = numpy.repeat(model.faces[mesh_index][:mesh['face_count']], 2, axis=1).astype(numpy.int64)
+			face_indexes[:, 0::2] += self.vertex_count + 1
+			face_indexes[:, 1::2] += self.texture_vertex_count + 1
+			meshes.append((self.mtl_handler.get(model.materials[mesh_index]).name, face_indexes))
+		for _ in range(instance_count):
+			for material_name, face_indexes in meshes:
+				self._obj.write(f'g {self.group_name(model_name)}\nusemtl {material_name}\n')
+				write_rows(self._obj, 'f %d/%d %d/%d %d/%d\n', face_indexes)
+				self._obj.write(f'# {len(face_indexes)} faces\n\n')
+				face_indexes[:, 0::2] += len(vertices)  # move on to the vertices of the next instance
+
+		self.vertex_count += len(vertices) * instance_count
+		self.texture_vertex_count += len(texture_vertices)
 
 	def save_and_close(self) -> None:
 		"""
@@ -122,29 +167,8 @@ class ObjMtl:
 		mtl = open(f'{self.save_folder}{os.sep}{self.model_name}.mtl', 'w')
 		mtl.write('# Material Library\n#Exported by ACExplorer, written by gentlegiantJGC, based on code from ARchive_neXt\n\n')
 
-		with ThreadPoolExecutor(max_workers=10) as executor:
-			fild_ids = [
-				file_id
-				for
-				material in self.mtl_handler.materials.values()
-				if not material.missing_no for
-				map_type, file_id in [
-					['map_Kd', material.diffuse],
-					['map_d', material.diffuse],
-					['map_Ks', material.specular],
-					['map_bump', material.normal],
-					['disp', material.height]
-				]
-				if file_id is not None
-			]
-			materials = list(executor.map(
-				texture.export_dds,
-				[self.pyUbiForge] * len(fild_ids),
-				fild_ids,
-				[self.save_folder] * len(fild_ids)
-			))
-
-		material_counter = 0
+		self.mtl_handler.export_textures(self.mtl_handler.texture_ids(self.texture_maps), self.save_folder)
+
 		for material in self.mtl_handler.materials.values():
 			mtl.write(f'newmtl {material.name}\n')
 			mtl.write('Ka 1.000 1.000 1.000\nKd 1.000 1.000 1.000\nKs 0.000 0.000 0.000\nNs 0.000\n')
@@ -161,8 +185,7 @@ class ObjMtl:
 											['disp', material.height]
 										]:
 					if file_id is not None:
-						image_path = materials[material_counter]
-						material_counter += 1
+						image_path = self.mtl_handler.export_texture(file_id, self.save_folder)
 						if image_path is None:
 							mtl.write(f"{map_type} {os.path.basename(self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png'))}\n")
 							self.export_missing_no()
@@ -182,9 +205,27 @@ class ObjMtl:
 			shutil.copy(self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png'), self.save_folder)
 
 
-def plaintext_array(array):
-	numpy.set_printoptions(threshold=numpy.inf)
-	return numpy.array2string(array.ravel(), formatter={'float': lambda x: ('%.6f' % x).rstrip('0').rstrip('.')}, separator=' ', max_line_width=numpy.inf)[1:-1]
+def write_array(file, array: numpy.ndarray) -> None:
+	"""Write the values of array to file separated by spaces.
+
+	Floats are written to 6 decimal places and everything else as integers. Like write_rows the values are formatted
+	in chunks so the text of the whole array is never held in memory.
+	"""
+	values = array.ravel()
+	value_format = '%.6f ' if values.dtype.kind == 'f' else '%d '
+	chunk_size = write_chunk_rows * 4
+	for start in range(0, len(values), chunk_size):
+		chunk = values[start:start + chunk_size]
+		if start:
+			file.write(' ')
+		file.write((value_format * len(chunk))[:-1] % tuple(chunk.tolist()))
+
+
+def plaintext_array(array: numpy.ndarray) -> str:
+	"""The values of array separated by spaces. Use write_array for large arrays."""
+	text = io.StringIO()
+	write_array(text, array)
+	return text.getvalue()
 
 
 class Collada:
@@ -196,20 +237,24 @@ class Collada:
 	First use .is_exported to check if the model id has been exported.
 		If it hasn't been then read the model file
 	"""
+	texture_maps = ('diffuse',)
+
 	def __init__(self, py_ubi_forge, model_name: str, save_folder: str):
 		self.pyUbiForge = py_ubi_forge
 		self.model_name = model_name
 		self.save_folder = save_folder
 		self._models_exported = {}
-		self._mtl_handler = MaterialHandler(self.pyUbiForge)      # used when generating the .mtl file
+		self.mtl_handler = MaterialHandler(self.pyUbiForge)      # used when generating the .mtl file
 		self._group_name = {}   # used for getting a unique name for each model
-		self._library_visual_scenes = []
 		self.missing_no_exported = False
 
 		# the obj file object
 		if not os.path.isdir(self.save_folder):
 			os.makedirs(self.save_folder)
 		self._dae = open(f'{self.save_folder}{os.sep}{self.model_name}.dae', 'w')
+		# the scene nodes are written to a temporary file and copied into the .dae after the geometry
+		self._scene_path = f'{self.save_folder}{os.sep}{self.model_name}.dae.scene'
+		self._scene = open(self._scene_path, 'w+')
 		self._dae.write('''<?xml version="1.0" encoding="utf-8"?>
 <COLLADA xmlns="http://www.collada.org/2005/11/COLLADASchema" version="1.4.1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
 	<library_geometries>
@@ -230,36 +275,38 @@ class Collada:
 
 	def export(self, model_file_id: int, forge_file_name: str = None, datafile_id: int = None, transformation_matrix: numpy.ndarray = None) -> None:
 		"""
-		when called will load and export the mesh if it hasn't been
+		when called will load and export the mesh if it hasn't been and add an instance of it
+		transformation_matrix may be one 4x4 matrix or a stack of them with shape (N, 4, 4) to add N instances
 		:return: None
 		"""
 
 		if not self.is_exported(model_file_id):
-			data = self.pyUbiForge.temp_files(model_file_id, forge_file_name, datafile_id)
-			if data is None:
-				self.pyUbiForge.log.warn(__name__, f"Failed to find file {model_file_id:016X}")
-				return
-			model = self.pyUbiForge.read_file(data.file)
+			model = self.pyUbiForge.mesh_cache.get(model_file_id, forge_file_name, datafile_id)
 			if model is None:  # sometimes reading the model fails
 				return
 			self._models_exported[model_file_id] = []
 
 			# write models
+			model_vertices = model.vertices
+			model_texture_vertices = model.texture_vertices
+			model_normals = model.normals
 			for mesh_index, mesh in enumerate(model.meshes):
 				faces = model.faces[mesh_index][:mesh['face_count']].ravel()
 				new_value_slice, faces = numpy.unique(faces, return_inverse=True)
-				vertices = model.vertices[new_value_slice]
-				texture_vertices = model.texture_vertices[new_value_slice]
+				vertices = model_vertices[new_value_slice]
+				texture_vertices = model_texture_vertices[new_value_slice]
 
 				geometry_id = f'{model_file_id}-mesh-{mesh_index}'
-				model_name = f'{data.file_name}-{mesh_index}'
-				material_name = f'{self._mtl_handler.get(model.materials[mesh_index]).name}-material'
+				model_name = f'{model.name}-{mesh_index}'
+				material_name = f'{self.mtl_handler.get(model.materials[mesh_index]).name}-material'
 				self._models_exported[model_file_id].append([geometry_id, model_name, material_name])
 
 				self._dae.write(f'''		<geometry id="{model_file_id}-mesh-{mesh_index}" name="{model_name}">
 			<mesh>
 				<source id="{model_file_id}-mesh-positions-{mesh_index}">
-					<float_array id="{model_file_id}-mesh-positions-array-{mesh_index}" count="{vertices.size}">{plaintext_array(vertices)}</float_array>
+					<float_array id="{model_file_id}-mesh-positions-array-{mesh_index}" count="{vertices.size}">''')
+				write_array(self._dae, vertices)
+				self._dae.write(f'''</float_array>
 					<technique_common>
 						<accessor source="#{model_file_id}-mesh-positions-array-{mesh_index}" count="{len(vertices)}" stride="3">
 							<param name="X" type="float"/>
@@ -269,10 +316,12 @@ class Collada:
 					</technique_common>
 				</source>
 ''')
-				if model.normals is not None:
-					normals = model.normals[new_value_slice]
+				if model_normals is not None:
+					normals = model_normals[new_value_slice]
 					self._dae.write(f'''				<source id="{model_file_id}-mesh-normals-{mesh_index}">
-					<float_array id="{model_file_id}-mesh-normals-array-{mesh_index}" count="{normals.size}">{plaintext_array(normals)}</float_array>
+					<float_array id="{model_file_id}-mesh-normals-array-{mesh_index}" count="{normals.size}">''')
+					write_array(self._dae, normals)
+					self._dae.write(f'''</float_array>
 					<technique_common>
 						<accessor source="#{model_file_id}-mesh-normals-array-{mesh_index}" count="{len(normals)}" stride="3">
 							<param name="X" type="float"/>
@@ -283,7 +332,9 @@ class Collada:
 				</source>
 ''')
 				self._dae.write(f'''				<source id="{model_file_id}-mesh-map-0-{mesh_index}">
-					<float_array id="{model_file_id}-mesh-map-0-array-{mesh_index}" count="{texture_vertices.size}">{plaintext_array(texture_vertices)}</float_array>
+					<float_array id="{model_file_id}-mesh-map-0-array-{mesh_index}" count="{texture_vertices.size}">''')
+				write_array(self._dae, texture_vertices)
+				self._dae.write(f'''</float_array>
 					<technique_common>
 						<accessor source="#{model_file_id}-mesh-map-0-array-{mesh_index}" count="{len(texture_vertices)}" stride="2">
 							<param name="S" type="float"/>
@@ -294,25 +345,30 @@ class Collada:
 				<vertices id="{model_file_id}-mesh-vertices-{mesh_index}">
 					<input semantic="POSITION" source="#{model_file_id}-mesh-positions-{mesh_index}"/>
 				</vertices>
-				<triangles material="{material_name}" count="{len(faces)}">
+				<triangles material="{material_name}" count="{len(faces) // 3}">
 					<input semantic="VERTEX" source="#{model_file_id}-mesh-vertices-{mesh_index}" offset="0"/>
 ''')
-				if model.normals is not None:
+				if model_normals is not None:
 					self._dae.write(f'''					<input semantic="NORMAL" source="#{model_file_id}-mesh-normals-{mesh_index}" offset="0"/>
 ''')
 				self._dae.write(f'''					<input semantic="TEXCOORD" source="#{model_file_id}-mesh-map-0-{mesh_index}" offset="0" set="0"/>
-					<p>{plaintext_array(faces)}</p>
+					<p>''')
+				write_array(self._dae, faces)
+				self._dae.write('''</p>
 				</triangles>
 			</mesh>
 		</geometry>
 ''')
 
 		if transformation_matrix is None:
-			transformation_matrix = numpy.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
-		for geometry_id, model_name, material_name in self._models_exported[model_file_id]:
-			self._library_visual_scenes.append(f'''			<node id="{model_name}" name="{model_name}" type="NODE">
-				<matrix sid="transform">{plaintext_array(transformation_matrix)}</matrix>
-				<instance_geometry url="#{geometry_id}" name="{model_name}">
+			transformation_matrix = numpy.identity(4)
+		for matrix in numpy.asarray(transformation_matrix).reshape(-1, 4, 4):
+			matrix = plaintext_array(matrix)
+			for geometry_id, model_name, material_name in self._models_exported[model_file_id]:
+				node_name = self.group_name(model_name)
+				self._scene.write(f'''			<node id="{node_name}" name="{node_name}" type="NODE">
+				<matrix sid="transform">{matrix}</matrix>
+				<instance_geometry url="#{geometry_id}" name="{node_name}">
 					<bind_material>
 						<technique_common>
 							<instance_material symbol="{material_name}" target="#{material_name}"/>
@@ -336,13 +392,19 @@ class Collada:
 		self._dae.write('''	</library_geometries>
 ''')
 
-		self._dae.write(f'''	<library_visual_scenes>
+		self._dae.write('''	<library_visual_scenes>
 		<visual_scene id="Scene" name="Scene">
-{''.join(self._library_visual_scenes)}		</visual_scene>
+''')
+		self._scene.seek(0)
+		shutil.copyfileobj(self._scene, self._dae)
+		self._scene.close()
+		os.remove(self._scene_path)
+		self._dae.write('''		</visual_scene>
 	</library_visual_scenes>
 ''')
 
-		for material in self._mtl_handler.materials.values():
+		self.mtl_handler.export_textures(self.mtl_handler.texture_ids(self.texture_maps), self.save_folder)
+		for material in self.mtl_handler.materials.values():
 			image_path = None
 			material_name = material.name
 			if material.missing_no:
@@ -358,10 +420,11 @@ class Collada:
 				]:
 					if file_id is None:
 						continue
-					image_path = os.path.basename(texture.export_dds(self.pyUbiForge, file_id, self.save_folder))
+					image_path = self.mtl_handler.export_texture(file_id, self.save_folder)
 					if image_path is None:
-						image_path = os.path.basename(self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png'))
+						image_path = self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png')
 						self.export_missing_no()
+					image_path = os.path.basename(image_path)
 					library_images.append(f'''		<image id="{material_name}-{map_type}" name="{material_name}">
 			<init_from>{urllib.parse.quote(image_path)}</init_from>
 		</image>
@@ -440,13 +503,250 @@ class Collada:
 			shutil.copy(self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png'), self.save_folder)
 
 
+class Gltf:
+	"""This is a handler for exporting to the binary glTF 2.0 .glb format.
+	Like Collada each model is only written once and every instance is a node referencing it with a transformation matrix.
+	The vertex and index data is written straight from the arrays as little endian binary to a temporary .bin file as each model is exported.
+	When .save_and_close is called the textures are exported and the json describing the scene is written to the .glb followed by the binary data.
+	Textures are exported as .png by default as these are core glTF images.
+	If mtl_handler.texture_type is set to 'dds' the textures use the MSFT_texture_dds extension which is then required to load the file.
+	"""
+	texture_maps = ('diffuse',)
+
+	def __init__(self, py_ubi_forge, model_name: str, save_folder: str):
+		self.pyUbiForge = py_ubi_forge
+		self.model_name = model_name
+		self.save_folder = save_folder
+		self._models_exported: Dict[int, List[int]] = {}   # model file id to the index of each of its meshes
+		self.mtl_handler = MaterialHandler(self.pyUbiForge)
+		self.mtl_handler.texture_type = 'png'
+		self._materials: Dict[int, int] = {}    # material file id to material index
+		self._nodes = []
+		self._meshes = []
+		self._accessors = []
+		self._buffer_views = []
+		self._bin_length = 0
+		self.missing_no_exported = False
+
+		if not os.path.isdir(self.save_folder):
+			os.makedirs(self.save_folder)
+		self._bin_path = f'{self.save_folder}{os.sep}{self.model_name}.glb.bin'
+		self._bin = open(self._bin_path, 'wb')
+
+	def is_exported(self, file_id: int):
+		return file_id in self._models_exported
+
+	def _add_accessor(self, array: numpy.ndarray, component_type: int, accessor_type: str, target: int, min_max: bool = False) -> int:
+		"""Write array to the binary data and return the index of an accessor describing it."""
+		data = numpy.ascontiguousarray(array)
+		self._bin.write(data.data)
+		self._buffer_views.append({'buffer': 0, 'byteOffset': self._bin_length, 'byteLength': data.nbytes, 'target': target})
+		padding = -data.nbytes % 4
+		self._bin.write(b'\x00' * padding)
+		self._bin_length += data.nbytes + padding
+		accessor = {'bufferView': len(self._buffer_views) - 1, 'componentType': component_type, 'count': len(data), 'type': accessor_type}
+		if min_max:
+			accessor['min'] = data.min(axis=0).tolist()
+			accessor['max'] = data.max(axis=0).tolist()
+		self._accessors.append(accessor)
+		return len(self._accessors) - 1
+
+	def _material(self, material_file_id: int) -> int:
+		if material_file_id not in self._materials:
+			self._materials[material_file_id] = len(self._materials)
+			self.mtl_handler.get(material_file_id)
+		return self._materials[material_file_id]
+
+	def export(self, model_file_id: int, forge_file_name: str = None, datafile_id: int = None, transformation_matrix: numpy.ndarray = None) -> None:
+		"""
+		when called will load and export the mesh if it hasn't been and add an instance of it
+		transformation_matrix may be one 4x4 matrix or a stack of them with shape (N, 4, 4) to add N instances
+		:return: None
+		"""
+		if not self.is_exported(model_file_id):
+			model = self.pyUbiForge.mesh_cache.get(model_file_id, forge_file_name, datafile_id)
+			if model is None:  # sometimes reading the model fails
+				return
+			self._models_exported[model_file_id] = []
+
+			vertices = model.vertices.astype('<f4', copy=False)
+			# glTF texture coordinates start from the top left
+			texture_vertices = (model.texture_vertices * numpy.array([1, -1], numpy.float32)).astype('<f4', copy=False)
+			normals = model.normals
+			for mesh_index, mesh in enumerate(model.meshes):
+				faces = model.faces[mesh_index][:mesh['face_count']].ravel()
+				if len(faces) == 0:
+					continue
+				new_value_slice, faces = numpy.unique(faces, return_inverse=True)
+				attributes = {
+					'POSITION': self._add_accessor(vertices[new_value_slice], 5126, 'VEC3', 34962, True),  # float, array buffer
+					'TEXCOORD_0': self._add_accessor(texture_vertices[new_value_slice], 5126, 'VEC2', 34962)
+				}
+				if normals is not None:
+					attributes['NORMAL'] = self._add_accessor(normals[new_value_slice].astype('<f4', copy=False), 5126, 'VEC3', 34962)
+				if len(new_value_slice) <= 0xFFFF:
+					indices = self._add_accessor(faces.astype('<u2'), 5123, 'SCALAR', 34963)  # unsigned short, element array buffer
+				else:
+					indices = self._add_accessor(faces.astype('<u4'), 5125, 'SCALAR', 34963)  # unsigned int, element array buffer
+				self._meshes.append({
+					'name': f'{model.name}-{mesh_index}',
+					'primitives': [{
+						'attributes': attributes,
+						'indices': indices,
+						'material': self._material(model.materials[mesh_index])
+					}]
+				})
+				self._models_exported[model_file_id].append(len(self._meshes) - 1)
+
+		if transformation_matrix is None:
+			matrices = [None]
+		else:
+			# column major
+			matrices = numpy.asarray(transformation_matrix, numpy.float64).reshape(-1, 4, 4).transpose(0, 2, 1).reshape(-1, 16).tolist()
+		for matrix in matrices:
+			for mesh_index in self._models_exported[model_file_id]:
+				node = {'name': self._meshes[mesh_index]['name'], 'mesh': mesh_index}
+				if matrix is not None:
+					node['matrix'] = matrix
+				self._nodes.append(node)
+
+	def save_and_close(self) -> None:
+		"""
+		when called will export the textures and write the .glb file
+		when finished will close and remove the temporary .bin file
+		:return:
+		"""
+		self._bin.close()
+
+		images = []
+		image_indexes = {}  # image path to index
+		textures = []
+		materials = []
+		self.mtl_handler.export_textures(self.mtl_handler.texture_ids(self.texture_maps), self.save_folder)
+		for material_file_id in self._materials:
+			material = self.mtl_handler.get(material_file_id)
+			gltf_material = {'name': material.name, 'pbrMetallicRoughness': {'metallicFactor': 0.0}}
+			image_path = None
+			if material.missing_no:
+				image_path = self.export_missing_no()
+			elif material.diffuse is not None:
+				image_path = self.mtl_handler.export_texture(material.diffuse, self.save_folder)
+				if image_path is None:
+					image_path = self.export_missing_no()
+			if image_path is not None:
+				image_path = os.path.basename(image_path)
+				if image_path not in image_indexes:
+					image_indexes[image_path] = len(images)
+					images.append({'uri': urllib.parse.quote(image_path)})
+					if image_path.endswith('.dds'):
+						textures.append({'extensions': {'MSFT_texture_dds': {'source': image_indexes[image_path]}}})
+					else:
+						textures.append({'source': image_indexes[image_path]})
+				gltf_material['pbrMetallicRoughness']['baseColorTexture'] = {'index': image_indexes[image_path]}
+			materials.append(gltf_material)
+
+		# the game is z up and glTF is y up
+		root = {'name': self.model_name, 'matrix': [1, 0, 0, 0, 0, 0, -1, 0, 0, 1, 0, 0, 0, 0, 0, 1], 'children': list(range(len(self._nodes)))}
+		gltf = {
+			'asset': {'version': '2.0', 'generator': 'ACExplorer'},
+			'scene': 0,
+			'scenes': [{'nodes': [len(self._nodes)]}],
+			'nodes': self._nodes + [root]
+		}
+		for key, value in (
+			('meshes', self._meshes),
+			('materials', materials),
+			('textures', textures),
+			('images', images),
+			('accessors', self._accessors),
+			('bufferViews', self._buffer_views)
+		):
+			if value:
+				gltf[key] = value
+		if any('extensions' in tex for tex in textures):
+			# there is no fallback image so viewers without the extension can not load the file
+			gltf['extensionsUsed'] = ['MSFT_texture_dds']
+			gltf['extensionsRequired'] = ['MSFT_texture_dds']
+		if self._bin_length:
+			gltf['buffers'] = [{'byteLength': self._bin_length}]
+
+		json_data = json.dumps(gltf, separators=(',', ':')).encode()
+		json_data += b' ' * (-len(json_data) % 4)
+		glb_length = 12 + 8 + len(json_data)
+		if self._bin_length:
+			glb_length += 8 + self._bin_length
+		with open(f'{self.save_folder}{os.sep}{self.model_name}.glb', 'wb') as glb:
+			glb.write(struct.pack('<4sII', b'glTF', 2, glb_length))
+			glb.write(struct.pack('<I4s', len(json_data), b'JSON'))
+			glb.write(json_data)
+			if self._bin_length:
+				glb.write(struct.pack('<I4s', self._bin_length, b'BIN\x00'))
+				with open(self._bin_path, 'rb') as bin_file:
+					shutil.copyfileobj(bin_file, glb)
+		os.remove(self._bin_path)
+
+	def export_missing_no(self) -> str:
+		"""
+		Call this to copy over the missingNo image if it has not already been copied over
+		:return: the path to the missingNo image
+		"""
+		if not self.missing_no_exported:
+			self.missing_no_exported = True
+			shutil.copy(self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png'), self.save_folder)
+		return self.pyUbiForge.CONFIG.get('missingNo', 'resources/missingNo.png')
+
+
+# the "Texture Type" plugin option to the file extension the textures are exported as
+texture_types = {
+	'DirectDraw Surface (.dds)': 'dds',
+	'Portable Network Graphics (.png)': 'png'
+}
+
+
+def texture_type_options(export_method: str) -> List[str]:
+	"""The "Texture Type" options for an "Export Method" with the default first. glTF defaults to .png (see Gltf)."""
+	options = list(texture_types)
+	if export_method == 'Binary glTF (.glb)':
+		options.remove('Portable Network Graphics (.png)')
+		options.insert(0, 'Portable Network Graphics (.png)')
+	return options
+
+
 class MaterialHandler:
 	def __init__(self, py_ubi_forge):
 		self.pyUbiForge = py_ubi_forge
 		self.materials = {}
+		self.texture_paths: Dict[int, Union[str, None]] = {}     # texture file id to the path it was exported to
+		self.texture_type = 'dds'   # one of the values of texture_types
 		self.name = 'Unknown'
 
 	def get(self, file_id: int):
 		if file_id not in self.materials:
-			self.materials[file_id] = self.pyUbiForge.game_functions.get_material_ids(self.pyUbiForge, file_id)
+			self.materials[file_id] = self.pyUbiForge.material_table.get(file_id)
 		return self.materials[file_id]
+
+	def texture_ids(self, texture_maps: Iterable[str] = ('diffuse', 'specular', 'normal', 'height')) -> List[int]:
+		"""The ids of the textures used by the materials so far. texture_maps are the Material attributes to include."""
+		return list(dict.fromkeys(
+			getattr(material, texture_map)
+			for material in list(self.materials.values())
+			if not material.missing_no
+			for texture_map in texture_maps
+			if getattr(material, texture_map) is not None
+		))
+
+	def export_textures(self, file_ids: Iterable[int], save_folder: str):
+		"""Export the textures that have not already been exported with a TextureExporter.
+		Textures already in save_folder from earlier exports are not written again."""
+		file_ids = [file_id for file_id in file_ids if file_id not in self.texture_paths]
+		if file_ids:
+			self.texture_paths.update(texture_export.TextureExporter(self.pyUbiForge, save_folder, self.texture_type).export(file_ids))
+
+	def export_texture(self, file_id: int, save_folder: str) -> Union[str, None]:
+		"""Export a texture used by the materials to save_folder if it has not already been and return its path (None if it failed)."""
+		if file_id not in self.texture_paths:
+			if self.texture_type == 'png':
+				self.texture_paths[file_id] = texture.export_png(self.pyUbiForge, file_id, save_folder)
+			else:
+				self.texture_paths[file_id] = texture.export_dds(self.pyUbiForge, file_id, save_folder)
+		return self.texture_paths[file_id]
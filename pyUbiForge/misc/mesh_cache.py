@@ -0,0 +1,253 @@
+"""
+	Persistent cache of decoded models.
+
+	Exporting a model means decompressing its datafile and reading the model file, which is repeated every
+	time the same model is exported. The mesh cache saves the decoded arrays of each model (vertices, texture
+	vertices, normals, faces, mesh table, materials and bones) to an uncompressed .npz file in "meshCacheFolder"
+	so that later exports can load them directly without touching the forge file.
+
+	If the model was read with "compactModels" enabled only its int16 vertex table is stored and the vertices,
+	texture vertices and normals are converted to float32 when they are accessed, as the model reader does.
+	Each cache file is named after the model, the forge file and the datafile it came from.
+
+	Each cache file stores a fingerprint of where the model came from (the size and modified time of the forge
+	file and the location of the datafile within it). When the forge file changes the fingerprint no longer
+	matches so the model is read again and the cache file is replaced.
+
+	>>>	model = py_ubi_forge.mesh_cache.get(file_id)
+	>>>	if model is not None:
+	>>>		print(model.name, model.vertices.shape)
+"""
+
+import os
+import numpy
+from typing import Union, List, Dict, Callable
+from pyUbiForge.misc.mesh import BaseModel
+from pyUbiForge.misc.file_readers import ParsedFileCache
+
+# increase this when what is stored changes or the model reader output changes so that old cache files are read again
+mesh_cache_version = 2
+
+
+class CachedBone:
+	__slots__ = ('bone_id', 'transformation_matrix')
+
+	def __init__(self, bone_id: str, transformation_matrix: numpy.ndarray):
+		self.bone_id = bone_id
+		self.transformation_matrix = transformation_matrix
+
+
+class CachedModel(BaseModel):
+	"""A model made from the arrays of another model so that it can be saved to and loaded from the mesh cache.
+
+	vert_table is kept for skinned models as it is needed for the bone weights.
+	If the model is compact (vertices is None when created) vert_table is always kept and the vertices,
+	texture vertices and normals are dequantised by reader each time they are accessed so callers should
+	keep the returned array rather than accessing the property repeatedly.
+	"""
+	def __init__(
+			self,
+			name: str,
+			vertices: numpy.ndarray,
+			texture_vertices: numpy.ndarray,
+			normals: Union[numpy.ndarray, None],
+			faces: List[numpy.ndarray],
+			meshes: numpy.ndarray,
+			materials: numpy.ndarray,
+			bones: List[CachedBone],
+			vert_table: numpy.ndarray = None,
+			reader: type = None
+	):
+		self._name = name
+		self._vertices = vertices
+		self._texture_vertices = texture_vertices
+		self._normals = normals
+		self._faces = faces
+		self._meshes = meshes
+		self._materials = materials
+		self._bones = bones
+		self.vert_table = vert_table
+		self._reader = reader   # the model reader with the dequantize methods. Only needed if compact
+
+	@property
+	def compact(self) -> bool:
+		"""True if only the vertex table is stored."""
+		return self._vertices is None and self.vert_table is not None
+
+	@property
+	def vertices(self) -> numpy.ndarray:
+		if self.compact:
+			return self._reader.dequantize_vertices(self.vert_table)
+		return self._vertices
+
+	@property
+	def texture_vertices(self) -> numpy.ndarray:
+		if self.compact:
+			return self._reader.dequantize_texture_vertices(self.vert_table)
+		return self._texture_vertices
+
+	@property
+	def normals(self) -> numpy.ndarray:
+		if self.compact:
+			return self._reader.dequantize_normals(self.vert_table)
+		return self._normals
+
+	@property
+	def nbytes(self) -> int:
+		"""The memory used by the arrays of this model."""
+		return sum(
+			array.nbytes for array in (self._vertices, self._texture_vertices, self._normals, self._meshes, self._materials, self.vert_table) + tuple(self._faces)
+			if array is not None
+		)
+
+	@classmethod
+	def from_model(cls, model: BaseModel, name: str) -> 'CachedModel':
+		"""Make a cached model from a parsed model. A model read with "compactModels" enabled stays compact."""
+		bones = [CachedBone(bone.bone_id, numpy.asarray(bone.transformation_matrix, numpy.float32)) for bone in model.bones or ()]
+		vert_table = getattr(model, 'vert_table', None)
+		if model._vertices is None and vert_table is not None:
+			return cls(
+				name, None, None, None,
+				list(model.faces),
+				model.meshes,
+				numpy.asarray(model.materials, numpy.uint64),
+				bones,
+				vert_table,
+				type(model)
+			)
+		return cls(
+			name,
+			model.vertices,
+			model.texture_vertices,
+			model.normals,
+			list(model.faces),
+			model.meshes,
+			numpy.asarray(model.materials, numpy.uint64),
+			bones,
+			vert_table if bones else None
+		)
+
+	@classmethod
+	def load(cls, path: str, fingerprint: str, get_reader: Callable[[int], type]) -> Union['CachedModel', None]:
+		"""Load a model saved with save. Returns None if the fingerprint does not match the one saved.
+		get_reader is FileReaderHandler.get_reader which is used to find the reader of compact models."""
+		with numpy.load(path, allow_pickle=False) as data:
+			if str(data['fingerprint']) != fingerprint:
+				return None
+			return cls(
+				str(data['name']),
+				data['vertices'] if 'vertices' in data else None,
+				data['texture_vertices'] if 'texture_vertices' in data else None,
+				data['normals'] if 'normals' in data else None,
+				numpy.split(data['faces'], numpy.cumsum(data['face_counts'])[:-1]),
+				data['meshes'],
+				data['materials'],
+				[CachedBone(str(bone_id), matrix) for bone_id, matrix in zip(data['bone_ids'], data['bone_matrices'])],
+				data['vert_table'] if 'vert_table' in data else None,
+				get_reader(int(data['file_type'])) if 'file_type' in data else None
+			)
+
+	def save(self, path: str, fingerprint: str):
+		"""Save the model to path with the given fingerprint. The file is written next to path and then moved over it."""
+		arrays: Dict[str, numpy.ndarray] = {
+			'fingerprint': numpy.array(fingerprint),
+			'name': numpy.array(self._name),
+			'faces': numpy.concatenate(self._faces) if self._faces else numpy.zeros((0, 3), numpy.uint32),
+			'face_counts': numpy.array([len(faces) for faces in self._faces], numpy.int64),
+			'meshes': self._meshes,
+			'materials': self._materials,
+			'bone_ids': numpy.array([bone.bone_id for bone in self._bones], str),
+			'bone_matrices': numpy.array([bone.transformation_matrix for bone in self._bones], numpy.float32).reshape(-1, 4, 4)
+		}
+		for key, array in (('vertices', self._vertices), ('texture_vertices', self._texture_vertices), ('normals', self._normals)):
+			if array is not None:
+				arrays[key] = array
+		if self.compact:
+			arrays['file_type'] = numpy.array(self._reader.file_type, numpy.uint64)
+		if self.vert_table is not None:
+			arrays['vert_table'] = self.vert_table
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(f'{path}.tmp', 'wb') as f:
+			numpy.savez(f, **arrays)
+		os.replace(f'{path}.tmp', path)
+
+
+class MeshCache:
+	"""Persistent cache of decoded models. See the top of this module.
+
+	Models are also kept in memory once loaded, up to "parsedFilesMaxMemoryMB", so models used many times in one export are only loaded once.
+	The cache files are only written and read if "meshCache" is enabled in the config.
+	"""
+	def __init__(self, py_ubi_forge):
+		self.pyUbiForge = py_ubi_forge
+		self._models = ParsedFileCache(py_ubi_forge)
+
+	@property
+	def enabled(self) -> bool:
+		return self.pyUbiForge.CONFIG.get('meshCache', True)
+
+	@property
+	def folder(self) -> str:
+		"""The directory containing the cache files for the loaded game."""
+		return os.path.join(self.pyUbiForge.CONFIG.get('meshCacheFolder', 'resources/meshCache'), self.pyUbiForge.game_identifier)
+
+	def fingerprint(self, forge_file_name: str, datafile_id: int) -> Union[str, None]:
+		"""A string that changes if the data in the given datafile may have changed. None if the datafile is not known."""
+		forge_file = self.pyUbiForge.forge_files.get(forge_file_name, None)
+		fingerprint = None if forge_file is None else forge_file.datafile_fingerprint(datafile_id)
+		if fingerprint is None:
+			return None
+		return f'{mesh_cache_version}:{fingerprint}'
+
+	def get(self, file_id: int, forge_file_name: str = None, datafile_id: int = None) -> Union[CachedModel, None]:
+		"""Get the model with the given id from memory, the cache files or by reading it.
+
+		The returned model is shared between callers so it must not be modified.
+		Returns None if the model could not be found or read or has no geometry.
+		:param file_id: int
+		:param forge_file_name: str
+		:param datafile_id: int of the containing datafile
+		:return: CachedModel
+		"""
+		forge_file_name, datafile_id = self.pyUbiForge.temp_files.locate(file_id, forge_file_name, datafile_id)
+		if datafile_id is None:
+			self.pyUbiForge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+			return
+		key = (file_id, forge_file_name, datafile_id, None)
+		try:
+			return self._models.get(key)
+		except KeyError:
+			pass
+
+		model = None
+		fingerprint = path = None
+		if self.enabled:
+			fingerprint = self.fingerprint(forge_file_name, datafile_id)
+			path = os.path.join(self.folder, f'{os.path.splitext(forge_file_name)[0]}_{datafile_id:016X}_{file_id:016X}.npz')
+			if fingerprint is not None and os.path.isfile(path):
+				try:
+					model = CachedModel.load(path, fingerprint, self.pyUbiForge.read_file.get_reader)
+				except Exception as e:
+					self.pyUbiForge.log.warn(__name__, f'Failed loading cached model {file_id:016X}: {e}')
+
+		if model is None:
+			data = self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id)
+			if data is None:
+				self.pyUbiForge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+				return
+			parsed_model: BaseModel = self.pyUbiForge.read_file(data.file)
+			if parsed_model is None or (parsed_model._vertices is None and getattr(parsed_model, 'vert_table', None) is None):
+				return
+			model = CachedModel.from_model(parsed_model, data.file_name)
+			if fingerprint is not None:
+				try:
+					model.save(path, fingerprint)
+				except OSError as e:
+					self.pyUbiForge.log.warn(__name__, f'Failed saving cached model {file_id:016X}: {e}')
+
+		self._models.add(key, model, model.nbytes)
+		return model
+
+	def clear(self):
+		"""Remove the models held in memory. The cache files are kept."""
+		self._models.clear()
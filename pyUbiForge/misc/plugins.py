@@ -26,7 +26,7 @@ class PluginHandler:
 	>>>	class Plugin(BasePlugin):
 	>>>		plugin_name = 'Plugin Name' # the name shown to the user an used as a UUID
 	>>>		plugin_level = 4            # see plugin_level below
-	>>>		file_type = '00000000'      # big endian hex representation of the file type (only needed if plugin_level == 4)
+	>>>		file_type = 0x00000000      # integer file type, '*' for all file types (only needed if plugin_level == 4)
 	>>>
 	>>>		def run(self, py_ubi_forge, file_id: Union[str, int], forge_file_name: str, datafile_id: int, options: list = None):
 	>>>			# the method that is called to run the plugin
@@ -39,8 +39,8 @@ class PluginHandler:
 		2 - the forge file
 		3 - the datafile (for plugins specific to a certain file type use 4, those will appear here as well)
 		4 - the specific file in the datafile and the parent datafile with the same id
-			if plugin_level == 4 then the big endian hex string representation of the file type must be given
-			file_type = '415D9568'
+			if plugin_level == 4 then the integer file type (or '*' for every file type) must be given
+			file_type = 0x415D9568
 
 	Options: The options function should return a dictionary for the next screen in the following format.
 	If there are no more screens to display (or none at all) return None
@@ -101,7 +101,7 @@ class PluginHandler:
 			3: {}, 
 			4: {
 				'*': {}
-				'FFFFFFFF': {
+				0xFFFFFFFF: {
 					"plugin_name_2": plugin_module
 				}
 			}
@@ -197,8 +197,8 @@ class PluginHandler:
 					self._pyUbiForge.log.warn(__name__, f'Failed loading {name} because "plugin_level" was not an int in [1,2,3,4]')
 					continue
 				if plugin.plugin_level == 4:
-					if not isinstance(plugin.file_type, str):
-						self._pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not defined or was not a string')
+					if not (isinstance(plugin.file_type, int) or plugin.file_type == '*'):
+						self._pyUbiForge.log.warn(__name__, f'Failed loading {name} because "file_type" was not defined or was not an int')
 						continue
 
 				# The plugin name is used as a UUID so make sure that it is unique
@@ -0,0 +1,176 @@
+"""
+	Per file type statistics for the type readers.
+
+	When "profileReaders" is enabled in the config every file read through FileReaderHandler.get_data_recursive
+	is timed and the results are grouped by file type. This is used to find which readers are slow or failing
+	so that they can be optimised or fixed first.
+
+	Times are inclusive of any nested files read. self_time excludes the time spent in nested files.
+	The percentiles are estimated from a random sample of at most sample_size times per file type so the memory
+	used does not grow with the number of files read.
+	A failure is counted against the file type whose reader raised the exception, not the files containing it.
+"""
+
+import json
+import time
+import array
+import random
+import threading
+import numpy
+from typing import Dict, List, Any
+
+# the columns of the report. key to (heading, width)
+report_columns = {
+	'file_type': ('File Type', 10),
+	'name': ('Name', 40),
+	'calls': ('Calls', 10),
+	'total_time': ('Total (s)', 12),
+	'self_time': ('Self (s)', 12),
+	'p50': ('p50 (ms)', 10),
+	'p99': ('p99 (ms)', 10),
+	'bytes': ('Bytes', 14),
+	'max_depth': ('Depth', 6),
+	'skipped': ('Skipped', 8),
+	'failures': ('Failures', 9)
+}
+# the number of times kept per file type to estimate the percentiles from
+sample_size = 1024
+
+
+class _FileTypeStats:
+	__slots__ = ('calls', 'total_time', 'self_time', 'times', 'bytes', 'max_depth', 'skipped', 'failures', 'first_failure')
+
+	def __init__(self):
+		self.calls = 0
+		self.total_time = 0.0
+		self.self_time = 0.0
+		self.times = array.array('d')
+		self.bytes = 0
+		self.max_depth = 0
+		self.skipped = 0
+		self.failures = 0
+		self.first_failure = None
+
+
+class ParseProfiler:
+	"""Records how long each file type takes to read and where readers fail. See the top of this module."""
+	def __init__(self, py_ubi_forge):
+		self.pyUbiForge = py_ubi_forge
+		self._stats: Dict[int, _FileTypeStats] = {}
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	@property
+	def enabled(self) -> bool:
+		return self.pyUbiForge.CONFIG.get('profileReaders', False)
+
+	def _stack(self) -> List[float]:
+		"""Time spent in nested files for each file currently being read by this thread."""
+		if not hasattr(self._local, 'stack'):
+			self._local.stack = []
+		return self._local.stack
+
+	def read(self, reader, file_object_data_wrapper, file_id: int) -> Any:
+		"""Call reader as get_data_recursive would and record the statistics."""
+		stack = self._stack()
+		depth = len(stack)
+		stack.append(0.0)
+		start_offset = file_object_data_wrapper.file_object.tell()
+		failure = None
+		start = time.perf_counter()
+		try:
+			return reader(self.pyUbiForge, file_object_data_wrapper)
+		except Exception as e:
+			if not getattr(e, '_profiled', False):
+				# only count the failure against the reader that raised it
+				e._profiled = True
+				failure = {
+					'file_id': f'{file_id:016X}',
+					'start_offset': start_offset,
+					'offset': file_object_data_wrapper.file_object.tell(),
+					'error': f'{type(e).__name__}: {e}'
+				}
+			raise
+		finally:
+			duration = time.perf_counter() - start
+			nested_time = stack.pop()
+			if stack:
+				stack[-1] += duration
+			with self._lock:
+				stats = self._stats.get(reader.file_type, None)
+				if stats is None:
+					stats = self._stats[reader.file_type] = _FileTypeStats()
+				stats.calls += 1
+				stats.total_time += duration
+				stats.self_time += duration - nested_time
+				if len(stats.times) < sample_size:
+					stats.times.append(duration)
+				else:
+					# reservoir sampling so every call has the same chance of being in the sample
+					index = random.randrange(stats.calls)
+					if index < sample_size:
+						stats.times[index] = duration
+				stats.bytes += file_object_data_wrapper.file_object.tell() - start_offset
+				stats.max_depth = max(stats.max_depth, depth)
+				if failure is not None:
+					stats.failures += 1
+					if stats.first_failure is None:
+						stats.first_failure = failure
+
+	def skipped(self, file_type: int):
+		"""Count a file that was skipped because it was not in the projection."""
+		with self._lock:
+			stats = self._stats.get(file_type, None)
+			if stats is None:
+				stats = self._stats[file_type] = _FileTypeStats()
+			stats.skipped += 1
+
+	def clear(self):
+		with self._lock:
+			self._stats.clear()
+
+	def results(self) -> List[Dict[str, Any]]:
+		"""The statistics for each file type as a list of dictionaries."""
+		file_types = self.pyUbiForge.game_functions.file_types if self.pyUbiForge.game_functions is not None else {}
+		with self._lock:
+			results = []
+			for file_type, stats in self._stats.items():
+				times = numpy.frombuffer(stats.times.tobytes(), numpy.float64) if stats.times else numpy.zeros(1)
+				results.append({
+					'file_type': f'{file_type:08X}',
+					'name': file_types.get(file_type, 'Undefined'),
+					'calls': stats.calls,
+					'total_time': stats.total_time,
+					'self_time': stats.self_time,
+					'p50': float(numpy.percentile(times, 50)) * 1000,
+					'p99': float(numpy.percentile(times, 99)) * 1000,
+					'bytes': stats.bytes,
+					'max_depth': stats.max_depth,
+					'skipped': stats.skipped,
+					'failures': stats.failures,
+					'first_failure': stats.first_failure
+				})
+		return results
+
+	def save_json(self, path: str):
+		with open(path, 'w') as f:
+			json.dump(self.results(), f, indent=4)
+
+	def report(self, sort_by: str = 'total_time', reverse: bool = True) -> str:
+		"""A plain text table of the results sorted by one of the keys in report_columns."""
+		if sort_by not in report_columns:
+			raise Exception(f'Can not sort by "{sort_by}". Expected one of {list(report_columns.keys())}')
+		results = sorted(self.results(), key=lambda result: result[sort_by], reverse=reverse)
+		lines = [''.join(heading.ljust(width) for heading, width in report_columns.values())]
+		for result in results:
+			line = ''
+			for key, (_, width) in report_columns.items():
+				value = result[key]
+				if isinstance(value, float):
+					value = f'{value:.4f}'
+				line += str(value)[:width - 1].ljust(width)
+			lines.append(line)
+			if result['first_failure'] is not None:
+				failure = result['first_failure']
+				lines.append(f"\tfirst failure in {failure['file_id']} at offset {failure['offset']} (started at {failure['start_offset']}): {failure['error']}")
+		return '\n'.join(lines) + '\n'
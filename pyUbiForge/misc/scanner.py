@@ -0,0 +1,72 @@
+"""
+	Find files by type without decompressing or reading them.
+
+	Every datafile starts with a table of the files it contains and each file has a small header
+	(file_type, file_size, file_name_size) in front of its data. The scanner reads only these headers
+	(see Forge.scan_datafile) so a whole game can be searched for every file of a type much faster than
+	decompressing every datafile.
+
+	>>>	from pyUbiForge.misc.scanner import scan
+	>>>	for record in scan(py_ubi_forge, [0x415D9568]):  # models
+	>>>		print(record.file_id, record.file_size, record.forge_file_name, record.datafile_id)
+
+	The datafiles are scanned in a thread pool (the decompression releases the GIL) and the records are
+	yielded as each datafile is finished. The location of each file found is added to the light dictionary
+	so that temp_files can find it by id afterwards.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator, NamedTuple
+
+
+class FileRecord(NamedTuple):
+	file_id: int
+	file_type: int
+	file_size: int
+	forge_file_name: str
+	datafile_id: int
+	file_name: str
+
+
+def scan(py_ubi_forge, file_types: Iterable[int] = None, forge_file_name: str = None, threads: int = None) -> Iterator[FileRecord]:
+	"""Yield a FileRecord for every file of the given types.
+
+	:param py_ubi_forge: pyUbiForge main
+	:param file_types: the file types to find. None for every file
+	:param forge_file_name: only scan this forge file
+	:param threads: number of datafiles to scan at once. Defaults to the number of cpus
+	:return: FileRecord for each file found
+	"""
+	if file_types is not None:
+		file_types = set(file_types)
+	if forge_file_name is None:
+		forge_files = py_ubi_forge.forge_files.items()
+	else:
+		forge_files = [(forge_file_name, py_ubi_forge.forge_files[forge_file_name])]
+	datafiles = ((forge_file_name_, forge_file, datafile_id) for forge_file_name_, forge_file in forge_files for datafile_id in forge_file.datafiles.keys())
+
+	threads = threads or os.cpu_count()
+	with ThreadPoolExecutor(threads) as executor:
+		pending = {}
+		# keep a limited number of datafiles in flight so that the raw data of the whole game is not held in memory
+		while True:
+			for forge_file_name_, forge_file, datafile_id in datafiles:
+				pending[executor.submit(forge_file.scan_datafile, datafile_id)] = (forge_file_name_, datafile_id)
+				if len(pending) >= threads * 2:
+					break
+			if not pending:
+				break
+			done, _ = wait(pending, return_when=FIRST_COMPLETED)
+			for future in done:
+				forge_file_name_, datafile_id = pending.pop(future)
+				try:
+					files = future.result()
+				except Exception as e:
+					py_ubi_forge.log.warn(__name__, f'Failed scanning datafile {datafile_id:016X} in {forge_file_name_}: {e}')
+					continue
+				for file_id, file_type, file_size, file_name in files:
+					if file_id != datafile_id:
+						py_ubi_forge.temp_files.light_dictionary.add(file_id, forge_file_name_, datafile_id)
+					if file_types is None or file_type in file_types:
+						yield FileRecord(file_id, file_type, file_size, forge_file_name_, datafile_id, file_name)
@@ -0,0 +1,342 @@
+"""
+	Declarative layouts for type readers.
+
+	Many readers are a straight sequence of fixed size reads with the odd nested file.
+	Instead of writing these out by hand a reader can subclass SchemaReader and describe the layout in schema.
+	The schema is compiled once into a list of steps where each run of fixed size fields is read with a single
+	struct unpack. When a file is being formatted the fields are read one at a time through FileObjectDataWrapper
+	so the format output is the same as it would be for a hand written reader.
+
+	>>>	class Reader(SchemaReader):
+	>>>		file_type = 0x228F402A
+	>>>		schema = (
+	>>>			Skip(29),
+	>>>			Id(),
+	>>>			Skip(17),
+	>>>			Matrix('transformation_matrix')
+	>>>		)
+
+	Each named field is set as an attribute on the reader. Unnamed fields are read and discarded.
+	When a schema reader is skipped (see FileReaderHandler projection) the fixed size runs are seeked over
+	rather than read so skipping is cheap.
+"""
+
+import struct
+import numpy
+from typing import Union, Tuple, List, Dict, Any
+from pyUbiForge.misc.file_object import FileObjectDataWrapper
+from pyUbiForge.misc.file_readers import BaseReader
+
+# struct format to the FileObjectDataWrapper method that reads it (used when formatting)
+_read_methods = {
+	'?': 'read_bool',
+	'b': 'read_int_8',
+	'B': 'read_uint_8',
+	'h': 'read_int_16',
+	'H': 'read_uint_16',
+	'i': 'read_int_32',
+	'I': 'read_uint_32',
+	'f': 'read_float_32',
+	'q': 'read_int_64',
+	'Q': 'read_uint_64'
+}
+
+
+class Field:
+	"""Base class for all schema fields.
+
+	Fixed size fields return their struct format from fmt. Fields that return None from fmt are read by read_compiled.
+	"""
+	def __init__(self, name: str = None):
+		self.name = name
+
+	def fmt(self, game_functions) -> Union[str, None]:
+		return None
+
+	def convert(self, values: tuple) -> Any:
+		"""Convert the values unpacked for this field to the value to store."""
+		return values[0]
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Any:
+		"""Read the field one call at a time. This is used when formatting."""
+		raise NotImplementedError
+
+	def read_compiled(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Any:
+		"""Read a field that is not fixed size."""
+		return self.read(py_ubi_forge, file_object_data_wrapper)
+
+	def skip(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		"""Move past a field that is not fixed size without keeping the value."""
+		self.read_compiled(py_ubi_forge, file_object_data_wrapper)
+
+
+class Skip(Field):
+	"""A number of bytes that are not used."""
+	def __init__(self, length: int):
+		Field.__init__(self)
+		self.length = length
+
+	def fmt(self, game_functions) -> str:
+		return f'{self.length}x'
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		file_object_data_wrapper.read_bytes(self.length)
+
+
+class Text(Field):
+	"""Text written to the format output to label or separate the fields. Nothing is read."""
+	def __init__(self, text: str):
+		Field.__init__(self)
+		self.text = text
+
+	def fmt(self, game_functions) -> str:
+		return ''
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		file_object_data_wrapper.out_file_write(self.text)
+
+
+class Value(Field):
+	"""A single value of the given struct format eg 'I' or '4s'."""
+	def __init__(self, fmt: str, name: str = None):
+		Field.__init__(self, name)
+		self._fmt = fmt
+
+	def fmt(self, game_functions) -> str:
+		return self._fmt
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Any:
+		if self._fmt in _read_methods:
+			return getattr(file_object_data_wrapper, _read_methods[self._fmt])()
+		return file_object_data_wrapper.read_struct(self._fmt)[0]
+
+
+class Id(Field):
+	"""A file id."""
+	def fmt(self, game_functions) -> str:
+		return game_functions.file_id_datatype
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> int:
+		return file_object_data_wrapper.read_id()
+
+
+class Type(Field):
+	"""A file type."""
+	def fmt(self, game_functions) -> str:
+		return {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[game_functions.file_type_length]
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> int:
+		return file_object_data_wrapper.read_type()
+
+
+class Matrix(Field):
+	"""A column major 4x4 float32 transformation matrix."""
+	def fmt(self, game_functions) -> str:
+		return '16f'
+
+	def convert(self, values: tuple) -> numpy.ndarray:
+		return numpy.array(values, numpy.float32).reshape((4, 4), order='F')
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> numpy.ndarray:
+		return file_object_data_wrapper.read_numpy(numpy.float32, 64).reshape((4, 4), order='F')
+
+
+class Nested(Field):
+	"""A nested file read through get_data_recursive."""
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Any:
+		return py_ubi_forge.read_file.get_data_recursive(file_object_data_wrapper)
+
+	def skip(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		py_ubi_forge.read_file.skip_data_recursive(file_object_data_wrapper)
+
+
+class Array(Field):
+	"""A repeated item.
+
+	count is either a fixed number of items or the struct format of a count stored before the items.
+	item is a field or a tuple of fields. If it contains a named field the value stored is a list of
+	that field's value for each item. At most one field in item may be named.
+	"""
+	def __init__(self, count: Union[int, str], item: Union[Field, Tuple[Field, ...]], name: str = None):
+		Field.__init__(self, name)
+		self.count = count
+		self.item = item if isinstance(item, tuple) else (item,)
+		item_names = [field.name for field in self.item if field.name is not None]
+		if len(item_names) > 1:
+			raise Exception(f'Array items may only contain one named field. Found {item_names}')
+		self.item_name = next(iter(item_names), None)
+		self._compiled = {}
+
+	def _read_count(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper, compiled: bool) -> int:
+		if isinstance(self.count, int):
+			return self.count
+		elif compiled:
+			fmt = f'{file_object_data_wrapper.endianness}{self.count}'
+			return struct.unpack(fmt, _read_raw(file_object_data_wrapper, struct.calcsize(fmt)))[0]
+		else:
+			return Value(self.count).read(py_ubi_forge, file_object_data_wrapper)
+
+	def read(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Union[List[Any], None]:
+		ret = []
+		for _ in range(self._read_count(py_ubi_forge, file_object_data_wrapper, False)):
+			file_object_data_wrapper.indent()
+			ret.append(_interpret(self.item, py_ubi_forge, file_object_data_wrapper).get(self.item_name, None))
+			file_object_data_wrapper.indent(-1)
+		if self.name is not None:
+			return ret
+
+	def read_compiled(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Union[List[Any], None]:
+		count = self._read_count(py_ubi_forge, file_object_data_wrapper, True)
+		program = self._program(py_ubi_forge, file_object_data_wrapper)
+		if program.fixed_size is not None:
+			# every item is fixed size so read them all at once
+			binary = _read_raw(file_object_data_wrapper, program.fixed_size * count)
+			if self.name is None:
+				return
+			run = program.steps[0]
+			return [run.convert(values).get(self.item_name, None) for values in run.struct.iter_unpack(binary)]
+		ret = []
+		for _ in range(count):
+			ret.append(program.run(py_ubi_forge, file_object_data_wrapper).get(self.item_name, None))
+		if self.name is not None:
+			return ret
+
+	def skip(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		count = self._read_count(py_ubi_forge, file_object_data_wrapper, True)
+		program = self._program(py_ubi_forge, file_object_data_wrapper)
+		if program.fixed_size is not None:
+			_seek_raw(file_object_data_wrapper, program.fixed_size * count)
+		else:
+			for _ in range(count):
+				program.skip(py_ubi_forge, file_object_data_wrapper)
+
+	def _program(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> '_Program':
+		key = (file_object_data_wrapper.endianness, id(py_ubi_forge.game_functions))
+		if key not in self._compiled:
+			self._compiled[key] = _Program(self.item, py_ubi_forge.game_functions, file_object_data_wrapper.endianness)
+		return self._compiled[key]
+
+
+def _read_raw(file_object_data_wrapper: FileObjectDataWrapper, length: int) -> bytes:
+	binary = file_object_data_wrapper.file_object.read(length)
+	if len(binary) != length:
+		raise Exception('Reached End Of File')
+	return binary
+
+
+def _seek_raw(file_object_data_wrapper: FileObjectDataWrapper, length: int):
+	"""Move forward length bytes without reading them. Like _read_raw this fails if it would pass the end of the file."""
+	file_object = file_object_data_wrapper.file_object
+	position = file_object.tell() + length
+	file_object.seek(0, 2)
+	if position > file_object.tell():
+		file_object.seek(position - length)
+		raise Exception('Reached End Of File')
+	file_object.seek(position)
+
+
+class _FixedRun:
+	"""A run of fixed size fields read with one struct.unpack."""
+	def __init__(self, endianness: str):
+		self._endianness = endianness
+		self._fmt = ''
+		self._value_count = 0
+		self.fields: List[Tuple[Field, int, int]] = []  # field, first value index, value count
+		self.struct = None
+
+	def append(self, field: Field, fmt: str):
+		value_count = len(struct.unpack(f'<{fmt}', bytes(struct.calcsize(f'<{fmt}'))))
+		self.fields.append((field, self._value_count, value_count))
+		self._fmt += fmt
+		self._value_count += value_count
+		self.struct = struct.Struct(f'{self._endianness}{self._fmt}')
+
+	def convert(self, values: tuple) -> Dict[str, Any]:
+		return {
+			field.name: field.convert(values[start:start + value_count])
+			for field, start, value_count in self.fields if field.name is not None
+		}
+
+
+class _Program:
+	"""A schema compiled into a list of steps for a given game and endianness."""
+	def __init__(self, schema: Tuple[Field, ...], game_functions, endianness: str):
+		self.steps: List[Union[_FixedRun, Field]] = []
+		for field in schema:
+			fmt = field.fmt(game_functions)
+			if fmt is None:
+				self.steps.append(field)
+			else:
+				if not self.steps or not isinstance(self.steps[-1], _FixedRun):
+					self.steps.append(_FixedRun(endianness))
+				self.steps[-1].append(field, fmt)
+		if len(self.steps) == 1 and isinstance(self.steps[0], _FixedRun):
+			self.fixed_size = self.steps[0].struct.size
+		else:
+			self.fixed_size = None
+
+	def run(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Dict[str, Any]:
+		values = {}
+		for step in self.steps:
+			if isinstance(step, _FixedRun):
+				values.update(step.convert(step.struct.unpack(_read_raw(file_object_data_wrapper, step.struct.size))))
+			else:
+				value = step.read_compiled(py_ubi_forge, file_object_data_wrapper)
+				if step.name is not None:
+					values[step.name] = value
+		return values
+
+	def skip(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		for step in self.steps:
+			if isinstance(step, _FixedRun):
+				_seek_raw(file_object_data_wrapper, step.struct.size)
+			else:
+				step.skip(py_ubi_forge, file_object_data_wrapper)
+
+
+def _interpret(schema: Tuple[Field, ...], py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> Dict[str, Any]:
+	values = {}
+	for field in schema:
+		value = field.read(py_ubi_forge, file_object_data_wrapper)
+		if field.name is not None:
+			values[field.name] = value
+	return values
+
+
+_compiled_schemas = {}
+
+
+def read_schema(reader: type, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper, compiled: bool = None) -> Dict[str, Any]:
+	"""Read the schema of reader from file_object_data_wrapper and return a dictionary of the named values.
+
+	By default the compiled steps are used unless the file is being formatted in which case
+	each field is read individually so that it appears in the output.
+	"""
+	if compiled is None:
+		compiled = not file_object_data_wrapper.formatting
+	if not compiled:
+		return _interpret(reader.schema, py_ubi_forge, file_object_data_wrapper)
+	return _get_program(reader, py_ubi_forge, file_object_data_wrapper).run(py_ubi_forge, file_object_data_wrapper)
+
+
+def _get_program(reader: type, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper) -> _Program:
+	key = (reader, file_object_data_wrapper.endianness, id(py_ubi_forge.game_functions))
+	if key not in _compiled_schemas:
+		_compiled_schemas[key] = _Program(reader.schema, py_ubi_forge.game_functions, file_object_data_wrapper.endianness)
+	return _compiled_schemas[key]
+
+
+class SchemaReader(BaseReader):
+	"""A reader defined by a schema. See the top of this module for more information.
+
+	Subclasses may extend __init__ to derive more attributes after the schema has been read.
+	"""
+	schema: Tuple[Field, ...] = ()
+
+	def __init__(self, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		for name, value in read_schema(type(self), py_ubi_forge, file_object_data_wrapper).items():
+			setattr(self, name, value)
+
+	@classmethod
+	def skip(cls, py_ubi_forge, file_object_data_wrapper: FileObjectDataWrapper):
+		_get_program(cls, py_ubi_forge, file_object_data_wrapper).skip(py_ubi_forge, file_object_data_wrapper)
@@ -1,5 +1,6 @@
 import os
 import json
+import threading
 import numpy
 from typing import Union, Tuple, Dict
 from pyUbiForge.misc.file_object import FileObjectDataWrapper
@@ -55,7 +56,7 @@ lightDictionary
 
 
 class TempFile:
-	def __init__(self, py_ubi_forge, forge_file: str, datafile_id: int, file_id: int, file_type: str, file_name: str, raw_file: bytes):
+	def __init__(self, py_ubi_forge, forge_file: str, datafile_id: int, file_id: int, file_type: int, file_name: str, raw_file: bytes):
 		"""Container for data related to a file.
 		Should help with typing and argument selection compared to the old dictionary method
 		"""
@@ -88,8 +89,8 @@ class TempFile:
 		return self._file_id
 
 	@property
-	def file_type(self) -> str:
-		"""The big endian hexadecimal representation of the file type."""
+	def file_type(self) -> int:
+		"""The numerical file type. Use f'{file_type:08X}' for the big endian hexadecimal representation."""
 		return self._file_type
 
 	@property
@@ -97,6 +98,11 @@ class TempFile:
 		"""The name of the file"""
 		return self._file_name
 
+	@property
+	def file_size(self) -> int:
+		"""The size of the raw file in bytes."""
+		return len(self._raw_file)
+
 	@property
 	def file(self) -> FileObjectDataWrapper:
 		"""The raw data wrapped up in a custom data wrapper.
@@ -283,6 +289,8 @@ class TempFilesContainer:
 		# a dictionary of every file currently loaded into memory
 		self._temp_files = {}
 		self._last_used = LastUsed()
+		# datafiles may be decompressed on several threads at once (see export_scheduler). The decompression is done outside the lock
+		self._lock = threading.RLock()
 
 	@property
 	def light_dict_changed(self) -> bool:
@@ -301,20 +309,21 @@ class TempFilesContainer:
 		:param file_name: str
 		:param raw_file: binary
 		"""
-		if file_id in self._temp_files:
-			self._memory -= len(self._temp_files[file_id][4])
-		self.refresh_usage(file_id)
-		self._temp_files[file_id] = (forge_file_name, datafile_id, file_type, file_name, raw_file)
-		if raw_file is not None:
-			self._memory += len(raw_file)
-
-		while self._memory > self.pyUbiForge.CONFIG.get('tempFilesMaxMemoryMB', 2048)*1000000:
-			remove_entry = self._last_used.pop()
-			self._memory -= len(self._temp_files[remove_entry][4])
-			del self._temp_files[remove_entry]
-
-		if file_id != datafile_id:
-			self.light_dictionary.add(file_id, forge_file_name, datafile_id)
+		with self._lock:
+			if file_id in self._temp_files:
+				self._memory -= len(self._temp_files[file_id][4])
+			self.refresh_usage(file_id)
+			self._temp_files[file_id] = (forge_file_name, datafile_id, file_type, file_name, raw_file)
+			if raw_file is not None:
+				self._memory += len(raw_file)
+
+			while self._memory > self.pyUbiForge.CONFIG.get('tempFilesMaxMemoryMB', 2048)*1000000:
+				remove_entry = self._last_used.pop()
+				self._memory -= len(self._temp_files[remove_entry][4])
+				del self._temp_files[remove_entry]
+
+			if file_id != datafile_id:
+				self.light_dictionary.add(file_id, forge_file_name, datafile_id)
 
 	def __call__(self, file_id: int, forge_file_name: str = None, datafile_id: int = None) -> Union[None, TempFile]:
 		"""Tries to find the file matching the description and return a TempFile class containing the data.
@@ -332,9 +341,41 @@ class TempFilesContainer:
 		if file_id == 0:
 			return
 
+		forge_file_name, datafile_id = self.locate(file_id, forge_file_name, datafile_id)
+		if datafile_id is None:
+			return
+
+		temp_file = self._temp_files.get(file_id, None)
+		if not (temp_file is not None and forge_file_name == temp_file[0] and datafile_id == temp_file[1]):
+			self.pyUbiForge.forge_files[forge_file_name].decompress_datafile(datafile_id)
+		with self._lock:
+			self.refresh_usage(file_id)
+			temp_file = self._temp_files.get(file_id, None)
+		if temp_file is not None and forge_file_name == temp_file[0] and datafile_id == temp_file[1]:
+			return TempFile(
+				self.pyUbiForge,
+				forge_file_name,
+				datafile_id,
+				file_id,
+				temp_file[2],
+				temp_file[3],
+				temp_file[4]
+			)
+		else:
+			return
+
+	def locate(self, file_id: int, forge_file_name: str = None, datafile_id: int = None) -> Union[Tuple[str, int], Tuple[None, None]]:
+		"""Find the forge file and datafile containing a file without decompressing anything.
+		Returns (None, None) if the file could not be found.
+		:param file_id: int
+		:param forge_file_name: str
+		:param datafile_id: int of the containing datafile
+		:return: (forge file name, datafile id)
+		"""
 		if forge_file_name is not None and datafile_id is None:
-			if file_id in self._temp_files and forge_file_name == self._temp_files[file_id][0]:
-				datafile_id = self._temp_files[file_id][1]
+			temp_file = self._temp_files.get(file_id, None)
+			if temp_file is not None and forge_file_name == temp_file[0]:
+				datafile_id = temp_file[1]
 			else:
 				# preferentially use one found in the forgeFile asked but look in others if needed
 				if forge_file_name in self.pyUbiForge.forge_files and file_id in self.pyUbiForge.forge_files[forge_file_name].datafiles:
@@ -347,25 +388,11 @@ class TempFilesContainer:
 			if forge_file_name is None:
 				forge_file_name, datafile_id = self.light_dictionary.get(file_id)
 				if datafile_id is None:
-					return
+					return None, None
 			else:
 				datafile_id = file_id
 
-		if not (file_id in self._temp_files and forge_file_name == self._temp_files[file_id][0] and datafile_id == self._temp_files[file_id][1]):
-			self.pyUbiForge.forge_files[forge_file_name].decompress_datafile(datafile_id)
-		self.refresh_usage(file_id)
-		if file_id in self._temp_files and forge_file_name == self._temp_files[file_id][0] and datafile_id == self._temp_files[file_id][1]:
-			return TempFile(
-				self.pyUbiForge,
-				forge_file_name,
-				datafile_id,
-				file_id,
-				f'{self._temp_files[file_id][2]:08X}',
-				self._temp_files[file_id][3],
-				self._temp_files[file_id][4]
-			)
-		else:
-			return
+		return forge_file_name, datafile_id
 
 	def clear(self):
 		"""Resets the TempFilesContainer class back to its starting state.
@@ -373,16 +400,18 @@ class TempFilesContainer:
 		"""
 		if self.light_dictionary.changed:
 			self.save()
-		self.light_dictionary.clear()
-		self._memory = 0
-		self._temp_files.clear()
-		self._last_used.clear()
+		with self._lock:
+			self.light_dictionary.clear()
+			self._memory = 0
+			self._temp_files.clear()
+			self._last_used.clear()
 
 	def refresh_usage(self, file_id: int):
 		"""Mark file_id as recently used so that it is not unloaded if the memory limit is reached."""
-		if file_id in self._temp_files:
-			self._last_used.remove(file_id)
-		self._last_used.append(file_id)
+		with self._lock:
+			if file_id in self._temp_files:
+				self._last_used.remove(file_id)
+			self._last_used.append(file_id)
 
 	def save(self):
 		self.light_dictionary.save()
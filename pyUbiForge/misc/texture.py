@@ -1,6 +1,9 @@
 import os
 import struct
-from typing import Union
+import numpy
+from PIL import Image
+from typing import Union, List, Tuple
+from pyUbiForge.misc import bcn
 
 
 class BaseTexture:
@@ -41,14 +44,73 @@ class BaseTexture:
 			self.dwDepth + self.dwMipMapCount + self.dwReserved + self.ddspf + self.dwCaps + self.dwCaps2 + \
 			self.dwCaps3 + self.dwCaps4 + self.dwReserved2 + self.DXT10Header + self.buffer
 
+	@property
+	def width(self) -> int:
+		return struct.unpack('<I', self.dwWidth)[0]
+
+	@property
+	def height(self) -> int:
+		return struct.unpack('<I', self.dwHeight)[0]
+
+	@property
+	def block_format(self) -> str:
+		"""The block compression format of the data. One of the keys of bcn.block_sizes."""
+		four_cc = self.ddspf[8:12]
+		if four_cc == b'DX10':
+			dxgi_format = struct.unpack('<I', self.DXT10Header[:4])[0] if self.DXT10Header else None
+			if dxgi_format not in bcn.dxgi_formats:
+				raise Exception(f'imgDXT: "{self.imgDXT}" with DXGI format "{dxgi_format}" is not currently supported')
+			return bcn.dxgi_formats[dxgi_format]
+		if four_cc not in bcn.four_cc_formats:
+			raise Exception(f'Texture format "{four_cc}" is not currently supported')
+		return bcn.four_cc_formats[four_cc]
+
+	@property
+	def mip_count(self) -> int:
+		return max(1, struct.unpack('<I', self.dwMipMapCount)[0])
+
+	@property
+	def mip_levels(self) -> List[Tuple[int, int, int, int]]:
+		"""The (offset, size, width, height) of each mip map in the buffer, largest first.
+		Only the levels that are fully contained in the buffer are included. For cube maps and arrays these are the mip maps of the first face."""
+		return [level for level in bcn.mip_levels(self.width, self.height, self.block_format, self.mip_count) if level[0] + level[1] <= len(self.buffer)]
+
+	def select_mip(self, max_size: int) -> int:
+		"""The index of the largest mip map with a width and height no more than max_size. The smallest mip map if none are."""
+		levels = self.mip_levels
+		for index, (_, _, width, height) in enumerate(levels):
+			if width <= max_size and height <= max_size:
+				return index
+		return max(0, len(levels) - 1)
+
+	def mip_data(self, level: int = 0) -> bytes:
+		"""The compressed data of one mip map."""
+		offset, size, _, _ = self.mip_levels[level]
+		return bytes(self.buffer[offset:offset + size])
+
+	def decode(self, level: int = 0) -> numpy.ndarray:
+		"""Decode a mip map (0 is the largest) to an RGBA numpy.uint8 array with shape (height, width, 4).
+		Only the data of that mip map is read from the buffer."""
+		levels = self.mip_levels
+		if not levels:
+			# the buffer is smaller than the largest mip map. Let bcn.decode raise a useful error
+			return bcn.decode(self.buffer, self.width, self.height, self.block_format)
+		offset, size, width, height = levels[level]
+		return bcn.decode(self.buffer[offset:offset + size], width, height, self.block_format)
+
+	def preview(self, max_size: int = 256) -> numpy.ndarray:
+		"""Decode the largest mip map no bigger than max_size pixels. Much faster than decode for thumbnails."""
+		return self.decode(self.select_mip(max_size))
+
 	def export_dds(self, path):
 		fi = open(path, 'wb')
 		fi.write(self.dds_string)
 		fi.close()
 
-		if self.imgDXT == 8:
-			texconv = f'".\\resources\\texconv.exe" -nologo -fl 9.1 -y -px {self.pyUbiForge.CONFIG.get("dumpFolder", "output")}{os.sep} -f BC3_UNORM {path}'
-			os.system(texconv)
+	def export_png(self, path, max_size: int = None):
+		"""Save the largest mip map as a PNG. If max_size is given the largest mip map no bigger than it is saved instead."""
+		level = 0 if max_size is None else self.select_mip(max_size)
+		Image.fromarray(self.decode(level), 'RGBA').save(path)
 
 
 class Material:
@@ -77,3 +139,23 @@ def export_dds(py_ubi_forge, file_id: int, save_folder: str, forge_file_name: Un
 	tex.export_dds(save_path)
 	py_ubi_forge.log.info(__name__, f'Texture "{data.file_name}" exported')
 	return save_path
+
+
+def export_png(py_ubi_forge, file_id: int, save_folder: str, forge_file_name: Union[None, str]=None, datafile_id: Union[None, int]=None, max_size: Union[None, int]=None):
+	"""Export the texture as a PNG. If max_size is given the largest mip map no bigger than it is exported to {name}_{max_size}.png"""
+	data = py_ubi_forge.temp_files(file_id, forge_file_name, datafile_id)
+	if data is None:
+		py_ubi_forge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+		return
+	save_path = os.path.join(save_folder, f'{data.file_name}.png' if max_size is None else f'{data.file_name}_{max_size}.png')
+	if os.path.isfile(save_path):
+		py_ubi_forge.log.info(__name__, f'Texture "{data.file_name}" already exported')
+		return save_path
+	tex = py_ubi_forge.read_file(data.file)
+	try:
+		tex.export_png(save_path, max_size)
+	except Exception as e:
+		py_ubi_forge.log.warn(__name__, f'Failed to export texture "{data.file_name}": {e}')
+		return
+	py_ubi_forge.log.info(__name__, f'Texture "{data.file_name}" exported')
+	return save_path
@@ -0,0 +1,203 @@
+"""
+	Bulk export of textures.
+
+	Exporting textures one at a time by name writes the same texture again for every id it is stored under.
+	Two different textures with the same name also overwrite each other. TextureExporter.export takes every
+	texture id of an export at once and works in three steps:
+	1. The textures are read on the thread pool of the ExportScheduler.
+	2. Each texture is deduplicated by a hash of its DDS data.
+	3. Each unique texture is written once. PNGs are decoded in a process pool.
+
+	The save folder keeps a manifest (textureManifest.json) with the content hash of each texture id and the file
+	written for each hash. Later exports to the same folder skip the textures already in it. A texture id is
+	skipped without being read if its datafile has not changed since it was recorded.
+
+	>>>	exporter = TextureExporter(py_ubi_forge, save_folder, 'png')
+	>>>	paths = exporter.export(texture_ids)     # texture file id to the path of the file written or None if it failed
+
+	The number of processes is "textureExportProcesses" in the config. 0 uses one per cpu.
+"""
+
+import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Union, Tuple
+from PIL import Image
+from pyUbiForge.misc import bcn
+from pyUbiForge.misc.export_scheduler import ExportScheduler
+
+manifest_name = 'textureManifest.json'
+
+
+def _write_png(path: str, buffer: bytes, width: int, height: int, block_format: str) -> str:
+	"""Decode a texture and save it as a PNG. Run in the worker processes."""
+	Image.fromarray(bcn.decode(buffer, width, height, block_format), 'RGBA').save(f'{path}.tmp', 'PNG')
+	os.replace(f'{path}.tmp', path)
+	return path
+
+
+class TextureExporter:
+	"""Exports many textures to one folder without writing any texture twice. See the top of this module."""
+	def __init__(self, py_ubi_forge, save_folder: str, texture_type: str = 'dds', processes: int = None):
+		"""
+		:param py_ubi_forge: pyUbiForge main
+		:param save_folder: the folder to write the textures and the manifest to
+		:param texture_type: 'dds' or 'png'
+		:param processes: number of processes to decode PNGs in. 0 decodes them in this process
+		"""
+		self.pyUbiForge = py_ubi_forge
+		self.save_folder = save_folder
+		self.texture_type = texture_type
+		if processes is None:
+			processes = py_ubi_forge.CONFIG.get('textureExportProcesses', 0) or os.cpu_count()
+		self.processes = processes
+		self.manifest_path = os.path.join(save_folder, manifest_name)
+		# 'files': texture file id (hex) to [content hash, datafile fingerprint]
+		# 'textures': texture type to content hash to the name of the file written
+		self._manifest = {'files': {}, 'textures': {}}
+		if os.path.isfile(self.manifest_path):
+			try:
+				with open(self.manifest_path) as f:
+					self._manifest = json.load(f)
+			except (OSError, ValueError) as e:
+				self.pyUbiForge.log.warn(__name__, f'Failed loading {self.manifest_path}: {e}')
+		self._files: Dict[str, list] = self._manifest['files']
+		self._textures: Dict[str, str] = self._manifest['textures'].setdefault(texture_type, {})
+		self._names = set(self._textures.values())
+
+	def _fingerprint(self, forge_file_name: str, datafile_id: int) -> Union[str, None]:
+		forge_file = self.pyUbiForge.forge_files.get(forge_file_name, None)
+		return None if forge_file is None else forge_file.datafile_fingerprint(datafile_id)
+
+	def _exported(self, file_id: int) -> Union[str, None]:
+		"""The path of the texture if it was exported by an earlier run and the datafile has not changed since."""
+		known = self._files.get(f'{file_id:016X}', None)
+		if known is None or known[1] is None:
+			return None
+		name = self._textures.get(known[0], None)
+		if name is None or not os.path.isfile(os.path.join(self.save_folder, name)):
+			return None
+		forge_file_name, datafile_id = self.pyUbiForge.temp_files.locate(file_id)
+		if datafile_id is None or self._fingerprint(forge_file_name, datafile_id) != known[1]:
+			return None
+		return os.path.join(self.save_folder, name)
+
+	def _read(self, file_id: int) -> Union[Tuple[str, str, object, Union[str, None]], None]:
+		"""Read a texture and hash it. Run on the scheduler threads."""
+		data = self.pyUbiForge.temp_files(file_id)
+		if data is None:
+			self.pyUbiForge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+			return None
+		tex = self.pyUbiForge.read_file(data.file)
+		content_hash = hashlib.blake2b(tex.dds_string, digest_size=16).hexdigest()
+		return content_hash, data.file_name, tex, self._fingerprint(data.forge_file, data.datafile_id)
+
+	def _name(self, file_name: str, content_hash: str) -> str:
+		"""A file name for a new texture that is not used by a different texture in the manifest."""
+		name = f'{file_name}.{self.texture_type}'
+		if name in self._names:
+			name = f'{file_name}_{content_hash[:8]}.{self.texture_type}'
+		self._names.add(name)
+		return name
+
+	def export(self, file_ids: Iterable[int]) -> Dict[int, Union[str, None]]:
+		"""Export the textures with the given ids that are not already in the save folder.
+
+		:param file_ids: texture file ids. Duplicates are only exported once
+		:return: texture file id to the path of its file or None if it could not be exported
+		"""
+		os.makedirs(self.save_folder, exist_ok=True)
+		paths: Dict[int, Union[str, None]] = {}
+		to_read = []
+		for file_id in dict.fromkeys(int(file_id) for file_id in file_ids):
+			path = self._exported(file_id)
+			if path is None:
+				to_read.append(file_id)
+			else:
+				paths[file_id] = path
+		skipped = len(paths)
+
+		written = deduplicated = 0
+		pending: Dict[str, list] = {}   # content hash to the ids waiting for it to be written
+		futures: Dict[Future, str] = {}   # PNG being written to its content hash
+		executor = None
+		if self.texture_type == 'png' and self.processes > 0 and to_read:
+			executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+		try:
+			for file_id, result in ExportScheduler(self.pyUbiForge).map(self._read, to_read):
+				if result is None:
+					paths[file_id] = None
+					continue
+				content_hash, file_name, tex, fingerprint = result
+				self._files[f'{file_id:016X}'] = [content_hash, fingerprint]
+				if content_hash in pending:
+					pending[content_hash].append(file_id)
+					deduplicated += 1
+					continue
+				name = self._textures.get(content_hash, None)
+				if name is not None and os.path.isfile(os.path.join(self.save_folder, name)):
+					paths[file_id] = os.path.join(self.save_folder, name)
+					deduplicated += 1
+					continue
+
+				if name is None:
+					name = self._name(file_name, content_hash)
+				path = os.path.join(self.save_folder, name)
+				pending[content_hash] = [file_id]
+				try:
+					if self.texture_type == 'png':
+						if executor is None:
+							_write_png(path, tex.mip_data(0), tex.width, tex.height, tex.block_format)
+						else:
+							futures[executor.submit(_write_png, path, tex.mip_data(0), tex.width, tex.height, tex.block_format)] = content_hash
+							if len(futures) >= 2 * self.processes:
+								# wait for some to be written so the undecoded textures of every job are not held at once
+								done, _ = wait(futures, return_when=FIRST_COMPLETED)
+								written += self._collect(done, futures, pending, paths)
+							continue
+					else:
+						tex.export_dds(path)
+				except Exception as e:
+					self.pyUbiForge.log.warn(__name__, f'Failed to export texture "{file_name}": {e}')
+					path = None
+				self._finish(content_hash, path, pending, paths)
+				written += path is not None
+
+			written += self._collect(list(futures), futures, pending, paths)
+		finally:
+			if executor is not None:
+				executor.shutdown()
+			self.save_manifest()
+
+		self.pyUbiForge.log.info(__name__, f'Exported {written} textures. {deduplicated} duplicates and {skipped} already exported textures were skipped')
+		return paths
+
+	def _collect(self, done: Iterable[Future], futures: Dict[Future, str], pending: Dict[str, list], paths: Dict[int, Union[str, None]]) -> int:
+		"""Finish the PNG jobs in done and remove them from futures. Returns the number that were written."""
+		written = 0
+		for future in done:
+			content_hash = futures.pop(future)
+			try:
+				path = future.result()
+			except Exception as e:
+				self.pyUbiForge.log.warn(__name__, f'Failed to export texture {pending[content_hash][0]:016X}: {e}')
+				path = None
+			self._finish(content_hash, path, pending, paths)
+			written += path is not None
+		return written
+
+	def _finish(self, content_hash: str, path: Union[str, None], pending: Dict[str, list], paths: Dict[int, Union[str, None]]):
+		"""Record the result of writing a texture for every id waiting for it."""
+		if path is None:
+			self._textures.pop(content_hash, None)
+		else:
+			self._textures[content_hash] = os.path.basename(path)
+		for file_id in pending.pop(content_hash):
+			paths[file_id] = path
+
+	def save_manifest(self):
+		with open(f'{self.manifest_path}.tmp', 'w') as f:
+			json.dump(self._manifest, f)
+		os.replace(f'{self.manifest_path}.tmp', self.manifest_path)
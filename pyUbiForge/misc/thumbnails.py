@@ -0,0 +1,252 @@
+"""
+	Persistent cache of thumbnails of textures and models for the file tree.
+
+	A thumbnail of a texture is made from the largest mip map that is no bigger than the thumbnail (see
+	BaseTexture.preview) so only a small part of the texture is decoded. A thumbnail of a model is its silhouette
+	looking along the y axis, rasterised with numpy from the vertices and faces given by the mesh cache.
+	The file types that have thumbnails are thumbnail_types in the game package.
+
+	Thumbnails are rendered on a thread pool so the file tree is not blocked while they are made. Thumbnails still
+	waiting to be rendered are cancelled when the game changes or shutdown is called. Each one is saved
+	as a PNG in "thumbnailFolder"/{game} named after the file id and the datafile it came from so that it is made
+	again if the forge file changes. The folder is kept below "thumbnailCacheMB" by deleting the thumbnails that
+	were least recently used when a new one is saved.
+
+	>>>	future = py_ubi_forge.thumbnails.request(file_id, forge_file_name, datafile_id)
+	>>>	future.add_done_callback(lambda f: print(f.result()))  # the path of the PNG or None if there is no thumbnail
+"""
+
+import os
+import hashlib
+import threading
+import numpy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Union
+from PIL import Image
+from pyUbiForge.misc.texture import BaseTexture
+from pyUbiForge.misc.mesh import BaseModel
+
+# the colour of the silhouette of a model
+silhouette_colour = (200, 200, 200, 255)
+# the number of rows of triangles filled at once when rasterising. This bounds the memory used for large meshes
+rasterise_chunk_size = 2 ** 18
+
+
+def texture_thumbnail(texture: BaseTexture, size: int) -> Image.Image:
+	"""The texture scaled to fit in a size by size square, decoded from the smallest suitable mip map."""
+	image = Image.fromarray(texture.preview(size), 'RGBA')
+	image.thumbnail((size, size))
+	return image
+
+
+def rasterise(points: numpy.ndarray, faces: numpy.ndarray, size: int) -> numpy.ndarray:
+	"""Fill the triangles into a size by size boolean mask.
+
+	:param points: float array with shape (N, 2) of x and y in pixels. (0, 0) is the top left corner of the first pixel
+	:param faces: int array with shape (M, 3) of indexes into points
+	:return: bool array with shape (size, size). True where the centre of a pixel is in a triangle or a point is in the pixel
+	"""
+	mask = numpy.zeros((size, size), numpy.bool_)
+	# the points are drawn as well so that triangles thinner than a pixel still leave a mark
+	pixels = numpy.clip(numpy.floor(points).astype(numpy.int64), 0, size - 1)
+	mask[pixels[:, 1], pixels[:, 0]] = True
+	if len(faces) == 0:
+		return mask
+
+	# each triangle is split into the rows of pixels it covers and the span of pixel centres inside it on each
+	# row is found from where the row crosses its sides. The spans are added to a difference array so the work
+	# is proportional to the number of rows covered rather than the area.
+	triangles = points[faces]   # (M, 3, 2)
+	first_row = numpy.clip(numpy.ceil(triangles[:, :, 1].min(1) - 0.5).astype(numpy.int64), 0, size)
+	last_row = numpy.clip(numpy.floor(triangles[:, :, 1].max(1) - 0.5).astype(numpy.int64), -1, size - 1)
+	row_counts = numpy.maximum(last_row - first_row + 1, 0)
+	row_offsets = numpy.cumsum(row_counts) - row_counts
+	spans = numpy.zeros((size, size + 1), numpy.int32)
+	total_rows = int(row_counts.sum())
+	for start in range(0, total_rows, rasterise_chunk_size):
+		row_index = numpy.arange(start, min(start + rasterise_chunk_size, total_rows))
+		triangle_index = numpy.searchsorted(row_offsets, row_index, side='right') - 1
+		y = first_row[triangle_index] + row_index - row_offsets[triangle_index]
+		centre_y = y + 0.5
+		span_start = numpy.full(len(y), numpy.inf)
+		span_end = numpy.full(len(y), -numpy.inf)
+		for first, second in ((0, 1), (1, 2), (2, 0)):
+			start_x, start_y = triangles[triangle_index, first, 0], triangles[triangle_index, first, 1]
+			end_x, end_y = triangles[triangle_index, second, 0], triangles[triangle_index, second, 1]
+			crosses = (numpy.minimum(start_y, end_y) <= centre_y) & (centre_y <= numpy.maximum(start_y, end_y)) & (start_y != end_y)
+			with numpy.errstate(divide='ignore', invalid='ignore'):
+				x = start_x + (centre_y - start_y) * (end_x - start_x) / (end_y - start_y)
+			span_start = numpy.where(crosses, numpy.minimum(span_start, x), span_start)
+			span_end = numpy.where(crosses, numpy.maximum(span_end, x), span_end)
+		valid = numpy.isfinite(span_start) & numpy.isfinite(span_end)
+		first_x = numpy.clip(numpy.ceil(span_start[valid] - 0.5), 0, size).astype(numpy.int64)
+		last_x = numpy.clip(numpy.floor(span_end[valid] - 0.5), -1, size - 1).astype(numpy.int64)
+		y = y[valid]
+		filled = first_x <= last_x
+		numpy.add.at(spans, (y[filled], first_x[filled]), 1)
+		numpy.add.at(spans, (y[filled], last_x[filled] + 1), -1)
+	mask |= numpy.cumsum(spans[:, :size], axis=1) > 0
+	return mask
+
+
+def model_thumbnail(model: BaseModel, size: int) -> Image.Image:
+	"""The silhouette of the model looking along the y axis scaled to fit in a size by size square."""
+	faces = [faces[:mesh['face_count']] for faces, mesh in zip(model.faces, model.meshes)]
+	faces = numpy.concatenate(faces).astype(numpy.int64) if faces else numpy.zeros((0, 3), numpy.int64)
+	vertices = model.vertices
+	faces = faces[(faces < len(vertices)).all(1)]
+	points = numpy.asarray(vertices[:, (0, 2)], numpy.float64)     # x and z. z is up
+	image = numpy.zeros((size, size, 4), numpy.uint8)
+	if len(points) == 0:
+		return Image.fromarray(image, 'RGBA')
+	low = points.min(0)
+	dimensions = points.max(0) - low
+	scale = size / (dimensions.max() or 1.0) * 0.999
+	points = (points - low) * scale + (size - dimensions * scale) / 2
+	points[:, 1] = size - points[:, 1]
+	image[rasterise(points, faces, size)] = silhouette_colour
+	return Image.fromarray(image, 'RGBA')
+
+
+class ThumbnailCache:
+	"""Renders thumbnails in the background and keeps them on disk. See the top of this module."""
+	def __init__(self, py_ubi_forge):
+		self.pyUbiForge = py_ubi_forge
+		self._executor: Union[ThreadPoolExecutor, None] = None
+		self._lock = threading.Lock()
+		self._files: Union[OrderedDict, None] = None     # file name to its size in bytes, least recently used first
+		self._cache_size = 0
+
+	@property
+	def folder(self) -> str:
+		"""The directory containing the thumbnails for the loaded game."""
+		return os.path.join(self.pyUbiForge.CONFIG.get('thumbnailFolder', 'resources/thumbnails'), self.pyUbiForge.game_identifier)
+
+	@property
+	def size(self) -> int:
+		"""The width and height of a thumbnail in pixels."""
+		return self.pyUbiForge.CONFIG.get('thumbnailSize', 128)
+
+	@property
+	def max_cache_size(self) -> int:
+		return self.pyUbiForge.CONFIG.get('thumbnailCacheMB', 256) * 1000000
+
+	def supported(self, file_type: int) -> bool:
+		"""Can a thumbnail be made for files of this type in the loaded game."""
+		return file_type in getattr(self.pyUbiForge.game_functions, 'thumbnail_types', {})
+
+	def _name(self, file_id: int, forge_file_name: str, datafile_id: int) -> Union[str, None]:
+		forge_file = self.pyUbiForge.forge_files.get(forge_file_name, None)
+		fingerprint = None if forge_file is None else forge_file.datafile_fingerprint(datafile_id)
+		if fingerprint is None:
+			return None
+		return f'{file_id:016X}_{hashlib.blake2b(fingerprint.encode(), digest_size=4).hexdigest()}_{self.size}.png'
+
+	def _load_index(self):
+		"""Find the thumbnails already in the folder. Their modified times are the times they were last used."""
+		files = []
+		if os.path.isdir(self.folder):
+			for entry in os.scandir(self.folder):
+				if entry.is_file() and entry.name.endswith('.png'):
+					stat = entry.stat()
+					files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+		self._files = OrderedDict((name, file_size) for _, name, file_size in sorted(files))
+		self._cache_size = sum(self._files.values())
+
+	def _used(self, name: str, file_size: int = None):
+		"""Mark a thumbnail as the most recently used and delete the least recently used ones if the cache is too big."""
+		with self._lock:
+			if self._files is None:
+				self._load_index()
+			if file_size is None and name not in self._files:
+				file_size = os.path.getsize(os.path.join(self.folder, name))
+			if file_size is not None:
+				self._cache_size += file_size - self._files.get(name, 0)
+				self._files[name] = file_size
+			self._files.move_to_end(name)
+			while self._cache_size > self.max_cache_size and len(self._files) > 1:
+				old_name, old_size = self._files.popitem(last=False)
+				self._cache_size -= old_size
+				try:
+					os.remove(os.path.join(self.folder, old_name))
+				except OSError:
+					pass
+
+	def get(self, file_id: int, forge_file_name: str = None, datafile_id: int = None) -> Union[str, None]:
+		"""The path of the thumbnail of a file if it has already been made, otherwise None. Nothing is rendered."""
+		forge_file_name, datafile_id = self.pyUbiForge.temp_files.locate(file_id, forge_file_name, datafile_id)
+		if datafile_id is None:
+			return None
+		name = self._name(file_id, forge_file_name, datafile_id)
+		if name is None:
+			return None
+		path = os.path.join(self.folder, name)
+		if not os.path.isfile(path):
+			return None
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		self._used(name)
+		return path
+
+	def request(self, file_id: int, forge_file_name: str = None, datafile_id: int = None) -> Future:
+		"""Get the thumbnail of a file on the thread pool, rendering it if it has not been made.
+
+		The result of the future is the path of the thumbnail or None if one could not be made.
+		"""
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(self.pyUbiForge.CONFIG.get('thumbnailThreads', 2))
+		return self._executor.submit(self._get, self.pyUbiForge.game_identifier, file_id, forge_file_name, datafile_id)
+
+	def _get(self, game_identifier: str, file_id: int, forge_file_name: Union[str, None], datafile_id: Union[int, None]) -> Union[str, None]:
+		if game_identifier != self.pyUbiForge.game_identifier:
+			return None     # the game was changed after this was requested
+		try:
+			path = self.get(file_id, forge_file_name, datafile_id)
+			if path is None:
+				path = self._render(file_id, forge_file_name, datafile_id)
+			return path
+		except Exception as e:
+			self.pyUbiForge.log.warn(__name__, f'Failed making a thumbnail of {file_id:016X}: {e}')
+
+	def _render(self, file_id: int, forge_file_name: Union[str, None], datafile_id: Union[int, None]) -> Union[str, None]:
+		data = self.pyUbiForge.temp_files(file_id, forge_file_name, datafile_id)
+		if data is None:
+			self.pyUbiForge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+			return None
+		thumbnail_type = getattr(self.pyUbiForge.game_functions, 'thumbnail_types', {}).get(data.file_type, None)
+		if thumbnail_type == 'texture':
+			image = texture_thumbnail(self.pyUbiForge.read_file(data.file), self.size)
+		elif thumbnail_type == 'model':
+			model = self.pyUbiForge.mesh_cache.get(file_id, data.forge_file, data.datafile_id)
+			if model is None:
+				return None
+			image = model_thumbnail(model, self.size)
+		else:
+			return None
+
+		name = self._name(file_id, data.forge_file, data.datafile_id)
+		if name is None:
+			return None
+		path = os.path.join(self.folder, name)
+		os.makedirs(self.folder, exist_ok=True)
+		image.save(f'{path}.tmp', 'PNG')
+		os.replace(f'{path}.tmp', path)
+		self._used(name, os.path.getsize(path))
+		return path
+
+	def shutdown(self, wait: bool = False):
+		"""Cancel the thumbnails that have not started rendering. If wait is True block until the rest have finished.
+		A later request starts a new thread pool."""
+		if self._executor is not None:
+			self._executor.shutdown(wait=wait, cancel_futures=True)
+			self._executor = None
+
+	def clear(self):
+		"""Forget the thumbnails of the loaded game and cancel those not yet rendered. Call when the game changes. The files are kept."""
+		self.shutdown()
+		with self._lock:
+			self._files = None
+			self._cache_size = 0
@@ -0,0 +1,247 @@
+"""
+	Stitching a grid of textures into one image without holding the whole image in memory.
+
+	Maps such as the minimap are stored as a grid of texture tiles. The stitched image of a large map does not fit
+	in memory so it is written one row of tiles (a band) at a time. The tiles of a band are read with an
+	ExportScheduler and decoded on a thread pool while the band before is being written, so only a few bands
+	are in memory at once.
+
+	The image can be written as:
+	- a PNG. The rows are filtered and compressed as they arrive so the PNG file is written as a stream.
+	- a deep zoom image. This is a pyramid of 256 pixel tiles in {name}_files/{level}/{column}_{row}.png with
+		{name}.dzi describing it, which can be opened by deep zoom viewers such as OpenSeadragon. Each level keeps
+		less than one row of tiles in memory before it is written and halved into the level below it.
+
+	>>>	stitch(py_ubi_forge, tile_ids, f'{save_folder}/{file_name}', 'png')    # tile_ids is a list of rows from the top
+"""
+
+import os
+import zlib
+import struct
+import math
+import numpy
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Union, Dict, Tuple
+from PIL import Image
+from pyUbiForge.misc.export_scheduler import ExportScheduler
+
+output_formats = ('png', 'deepzoom')
+deep_zoom_tile_size = 256
+
+
+class PngWriter:
+	"""Write an RGBA PNG one band of rows at a time.
+
+	>>>	with PngWriter(path, width, height) as png:
+	>>>		png.write_rows(rows)     # numpy.uint8 array with shape (rows, width, 4) from the top of the image down
+	"""
+	def __init__(self, path: str, width: int, height: int, compression: int = 6):
+		self.path = path
+		self.width = width
+		self.height = height
+		self._rows_written = 0
+		self._compressor = zlib.compressobj(compression)
+		self._file = open(f'{path}.tmp', 'wb')
+		self._file.write(b'\x89PNG\r\n\x1a\n')
+		self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))  # 8 bit RGBA
+
+	def _chunk(self, chunk_type: bytes, data: bytes):
+		self._file.write(struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+	def write_rows(self, rows: numpy.ndarray):
+		if self._rows_written + len(rows) > self.height:
+			raise Exception('More rows written than the height of the PNG')
+		# the sub filter (each byte minus the same channel of the pixel to the left) compresses much better than none
+		filtered = numpy.empty((len(rows), self.width * 4 + 1), numpy.uint8)
+		filtered[:, 0] = 1
+		flat = rows.reshape(len(rows), -1)
+		filtered[:, 1:5] = flat[:, :4]
+		numpy.subtract(flat[:, 4:], flat[:, :-4], out=filtered[:, 5:])
+		compressed = self._compressor.compress(filtered.tobytes())
+		if compressed:
+			self._chunk(b'IDAT', compressed)
+		self._rows_written += len(rows)
+
+	def close(self):
+		if self._rows_written != self.height:
+			raise Exception(f'Only {self._rows_written} of {self.height} rows were written to the PNG')
+		self._chunk(b'IDAT', self._compressor.flush())
+		self._chunk(b'IEND', b'')
+		self._file.close()
+		os.replace(f'{self.path}.tmp', self.path)
+
+	def __enter__(self) -> 'PngWriter':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if exc_type is None:
+			self.close()
+		else:
+			self._file.close()
+			os.remove(f'{self.path}.tmp')
+
+
+class _DeepZoomLevel:
+	"""One level of a deep zoom pyramid. Rows are collected until there is a row of tiles to write."""
+	def __init__(self, folder: str, level: int, width: int, height: int):
+		self.folder = os.path.join(folder, str(level))
+		self.width = width
+		self.height = height
+		self._rows: List[numpy.ndarray] = []
+		self._row_count = 0
+		self._tile_row = 0
+		os.makedirs(self.folder, exist_ok=True)
+		self.next = None if level == 0 else _DeepZoomLevel(folder, level - 1, (width + 1) // 2, (height + 1) // 2)
+
+	def push(self, rows: numpy.ndarray):
+		self._rows.append(rows)
+		self._row_count += len(rows)
+		while self._row_count >= deep_zoom_tile_size:
+			self._write(self._take(deep_zoom_tile_size))
+
+	def _take(self, count: int) -> numpy.ndarray:
+		rows = numpy.concatenate(self._rows) if len(self._rows) > 1 else self._rows[0]
+		self._rows = [rows[count:]] if len(rows) > count else []
+		self._row_count -= count
+		return rows[:count]
+
+	def _write(self, rows: numpy.ndarray):
+		for column, start in enumerate(range(0, self.width, deep_zoom_tile_size)):
+			Image.fromarray(rows[:, start:start + deep_zoom_tile_size], 'RGBA').save(os.path.join(self.folder, f'{column}_{self._tile_row}.png'))
+		self._tile_row += 1
+		if self.next is not None:
+			self.next.push(_half(rows))
+
+	def finish(self):
+		if self._row_count:
+			self._write(self._take(self._row_count))
+		if self.next is not None:
+			self.next.finish()
+
+
+def _half(rows: numpy.ndarray) -> numpy.ndarray:
+	"""Halve the width and height of an image by averaging each 2x2 block. Odd sizes repeat the last row or column.
+	The colours are weighted by alpha so that transparent pixels (such as missing tiles) do not darken their neighbours."""
+	if len(rows) % 2:
+		rows = numpy.concatenate([rows, rows[-1:]])
+	if rows.shape[1] % 2:
+		rows = numpy.concatenate([rows, rows[:, -1:]], 1)
+	blocks = rows.reshape(rows.shape[0] // 2, 2, rows.shape[1] // 2, 2, 4).astype(numpy.uint32)
+	alpha = blocks[..., 3].sum((1, 3))
+	colour = (blocks[..., :3] * blocks[..., 3:]).sum((1, 3))
+	half = numpy.empty(alpha.shape + (4,), numpy.uint8)
+	half[..., :3] = (colour + alpha[..., numpy.newaxis] // 2) // numpy.maximum(alpha, 1)[..., numpy.newaxis]
+	half[..., 3] = (alpha + 2) // 4
+	return half
+
+
+class DeepZoomWriter:
+	"""Write an image one band of rows at a time as a deep zoom pyramid. Used like PngWriter.
+
+	path is the .dzi file. The tiles are written to the folder next to it with _files in place of .dzi
+	"""
+	def __init__(self, path: str, width: int, height: int):
+		self.path = path
+		self.width = width
+		self.height = height
+		self.folder = f'{os.path.splitext(path)[0]}_files'
+		max_level = math.ceil(math.log2(max(width, height, 1)))
+		self._top = _DeepZoomLevel(self.folder, max_level, width, height)
+
+	def write_rows(self, rows: numpy.ndarray):
+		self._top.push(rows)
+
+	def close(self):
+		self._top.finish()
+		with open(self.path, 'w') as f:
+			f.write(
+				'<?xml version="1.0" encoding="UTF-8"?>\n'
+				f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="png" Overlap="0" TileSize="{deep_zoom_tile_size}">\n'
+				f'\t<Size Width="{self.width}" Height="{self.height}"/>\n'
+				'</Image>\n'
+			)
+
+	def __enter__(self) -> 'DeepZoomWriter':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if exc_type is None:
+			self.close()
+
+
+def _read_tile(py_ubi_forge, file_id: int):
+	data = py_ubi_forge.temp_files(file_id)
+	if data is None:
+		py_ubi_forge.log.warn(__name__, f"Failed to find file {file_id:016X}")
+		return None
+	return py_ubi_forge.read_file(data.file)
+
+
+def _tile_size(py_ubi_forge, tile_ids: List[List[Union[int, None]]]) -> Union[Tuple[int, int], None]:
+	"""The width and height of the first tile that can be read."""
+	for row in tile_ids:
+		for file_id in row:
+			if file_id is not None:
+				texture = _read_tile(py_ubi_forge, file_id)
+				if texture is not None:
+					return texture.width, texture.height
+
+
+def stitch(py_ubi_forge, tile_ids: List[List[Union[int, None]]], path: str, output_format: str = 'png') -> Union[str, None]:
+	"""Stitch a grid of textures into one image. See the top of this module.
+
+	:param py_ubi_forge: pyUbiForge main
+	:param tile_ids: texture file ids as a list of rows from the top of the image. None or a missing file leaves the tile transparent
+	:param path: the path of the output without an extension
+	:param output_format: one of output_formats
+	:return: the path of the image written or None if there were no tiles
+	"""
+	tile_size = _tile_size(py_ubi_forge, tile_ids)
+	if tile_size is None:
+		return None
+	tile_width, tile_height = tile_size
+	columns = max(len(row) for row in tile_ids)
+	width, height = tile_width * columns, tile_height * len(tile_ids)
+	if output_format == 'png':
+		path = f'{path}.png'
+		writer = PngWriter(path, width, height)
+	elif output_format == 'deepzoom':
+		path = f'{path}.dzi'
+		writer = DeepZoomWriter(path, width, height)
+	else:
+		raise ValueError(f'Unknown output format "{output_format}"')
+
+	scheduler = ExportScheduler(py_ubi_forge)
+
+	def decode(texture) -> numpy.ndarray:
+		return texture.decode()[:tile_height, :tile_width]
+
+	def read_band(row: List[Union[int, None]]) -> Dict[Future, int]:
+		"""Read the tiles of a row and start decoding them. Returns the decoding future to the file id."""
+		futures = {}
+		for file_id, texture in scheduler.map(lambda file_id: _read_tile(py_ubi_forge, file_id), [file_id for file_id in row if file_id is not None]):
+			if texture is not None:
+				futures[executor.submit(decode, texture)] = file_id
+		return futures
+
+	with writer, ThreadPoolExecutor(scheduler.threads) as executor:
+		band_futures = read_band(tile_ids[0])
+		for row_index, row in enumerate(tile_ids):
+			futures = band_futures
+			if row_index + 1 < len(tile_ids):
+				# start the next band decoding so it overlaps with this one being written
+				band_futures = read_band(tile_ids[row_index + 1])
+			band = numpy.zeros((tile_height, width, 4), numpy.uint8)
+			for future, file_id in futures.items():
+				try:
+					pixels = future.result()
+				except Exception as e:
+					py_ubi_forge.log.warn(__name__, f'Failed to decode tile {file_id:016X}: {e}')
+					continue
+				for column, tile_id in enumerate(row):
+					if tile_id == file_id:
+						band[:pixels.shape[0], column * tile_width:column * tile_width + pixels.shape[1]] = pixels
+			del futures
+			writer.write_rows(band)
+			py_ubi_forge.log.info(__name__, f'Written {row_index + 1} row of {len(tile_ids)}')
+	return path
@@ -1,8 +1,55 @@
+"""
+	Server run inside Blender 2.7 that receives meshes and bones from the "Send to Blender (experimental)" export method.
+	The messages are binary. See pyUbiForge/misc/blender_client.py for the format.
+"""
+
 from multiprocessing.connection import Listener
 import threading
+import struct
+import json
+import numpy
 import bpy
 import mathutils
 
+magic = b'ACXB'
+protocol_version = 1
+
+
+def receive(client):
+	"""Receive one message. Returns the header dictionary and the arrays by name."""
+	header = client.recv_bytes()
+	message_magic, version, length = struct.unpack('<4sHI', header[:10])
+	if message_magic != magic or version != protocol_version:
+		raise Exception('Unknown message format. Is the server the same version as ACExplorer?')
+	header = json.loads(header[10:10 + length].decode('utf-8'))
+	arrays = {}
+	for array_info in header['arrays']:
+		array = numpy.empty(array_info['shape'], numpy.dtype(array_info['dtype']))
+		data = memoryview(array.reshape(-1).view(numpy.uint8))
+		received = 0
+		while received < len(data):
+			received += client.recv_bytes_into(data[received:])
+		arrays[array_info['name']] = array
+	return header, arrays
+
+
+def add_mesh(name, verts, faces):
+	"""Make a mesh object from float32 vertices with shape (N, 3) and uint32 triangles with shape (M, 3)."""
+	mesh_data = bpy.data.meshes.new(name)
+	mesh_data.vertices.add(len(verts))
+	mesh_data.vertices.foreach_set('co', verts.astype(numpy.float32).ravel())
+	mesh_data.loops.add(faces.size)
+	mesh_data.loops.foreach_set('vertex_index', faces.astype(numpy.int32).ravel())
+	mesh_data.polygons.add(len(faces))
+	mesh_data.polygons.foreach_set('loop_start', numpy.arange(0, faces.size, 3, dtype=numpy.int32))
+	mesh_data.polygons.foreach_set('loop_total', numpy.full(len(faces), 3, numpy.int32))
+	mesh_data.update(calc_edges=True)
+	mesh_data.validate()
+
+	obj = bpy.data.objects.new(name, mesh_data)
+	scene = bpy.context.scene
+	scene.objects.link(obj)
+
 
 class Server(threading.Thread):
 	def __init__(self, address):
@@ -35,21 +82,11 @@ class Child(threading.Thread):
 		self.connected = True
 		while self.connected:
 			try:
-				msg = client.recv()
-				if isinstance(msg, dict) and msg.get('type', None) == 'MESH':
-					verts = msg.get('verts', [])
-					faces = msg.get('faces', [])
-					mesh_data = bpy.data.meshes.new("cube_mesh_data")
-					mesh_data.from_pydata(verts, [], faces)
-					mesh_data.update()
-
-					obj = bpy.data.objects.new("My_Object", mesh_data)
-
-					scene = bpy.context.scene
-					scene.objects.link(obj)
-					# obj.select = True
+				msg, arrays = receive(client)
+				if msg['type'] == 'MESH':
+					add_mesh(msg.get('name', 'mesh'), arrays['verts'], arrays['faces'])
 
-				elif isinstance(msg, dict) and msg.get('type', None) == 'BONES':
+				elif msg['type'] == 'BONES':
 					bpy.context.scene.cursor_location = (0.0, 0.0, 0.0)
 					if bpy.ops.object.mode_set.poll():
 						bpy.ops.object.mode_set(mode='OBJECT')
@@ -62,7 +99,7 @@ class Child(threading.Thread):
 					for bone in armature.edit_bones:
 						armature.edit_bones.remove(bone)
 
-					for bone_id, transformation_matrix in zip(msg['bone_id'], msg['mat']):
+					for bone_id, transformation_matrix in zip(msg['bone_id'], arrays['mat']):
 						edit_bone = armature.edit_bones.new(bone_id)
 						edit_bone.tail = (1, 0, 0)
 
@@ -85,7 +122,7 @@ class Child(threading.Thread):
 						bpy.ops.object.mode_set(mode='OBJECT')
 
 				else:
-					print('{}\n{}'.format(type(msg), msg))
+					print('Unknown message type {}'.format(msg['type']))
 			except EOFError:
 				self.connected = False
 